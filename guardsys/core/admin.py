@@ -1,12 +1,24 @@
 from django.contrib import admin
 
-from .models import Organization, GuardedObject, AuditLog
+from . import bulk
+from .models import AuditArchive, AuditLog, GuardedObject, Organization
+
+
+def _report(modeladmin, request, outcomes):
+    done = sum(1 for outcome in outcomes.values() if outcome == bulk.OK)
+    modeladmin.message_user(request, f"Обработано: {done} из {len(outcomes)}")
 
 
 @admin.register(Organization)
 class OrganizationAdmin(admin.ModelAdmin):
     list_display = ("name", "inn", "kpp")
     search_fields = ("name", "inn", "kpp")
+    actions = ["archive_objects"]
+
+    @admin.action(description="Архивировать все объекты организации")
+    def archive_objects(self, request, queryset):
+        ids = list(GuardedObject.objects.filter(organization__in=queryset).values_list("pk", flat=True))
+        _report(self, request, bulk.archive_objects(request.user, ids, "Организация выведена из обслуживания"))
 
 
 @admin.register(GuardedObject)
@@ -15,6 +27,20 @@ class GuardedObjectAdmin(admin.ModelAdmin):
     list_filter = ("status", "is_deleted", "organization")
     search_fields = ("name", "address")
     autocomplete_fields = ("organization", "main_responsible", "deputy_responsible")
+    actions = ["archive_selected", "restore_selected", "mark_done_selected"]
+
+    @admin.action(description="Переместить в архив")
+    def archive_selected(self, request, queryset):
+        ids = list(queryset.values_list("pk", flat=True))
+        _report(self, request, bulk.archive_objects(request.user, ids, "Архивировано через админку"))
+
+    @admin.action(description="Восстановить из архива")
+    def restore_selected(self, request, queryset):
+        _report(self, request, bulk.restore_objects(request.user, list(queryset.values_list("pk", flat=True))))
+
+    @admin.action(description="Отметить ТО пройдено")
+    def mark_done_selected(self, request, queryset):
+        _report(self, request, bulk.mark_done(request.user, list(queryset.values_list("pk", flat=True))))
 
 
 @admin.register(AuditLog)
@@ -22,5 +48,12 @@ class AuditLogAdmin(admin.ModelAdmin):
     list_display = ("timestamp", "action", "entity", "entity_id", "user")
     list_filter = ("entity", "action")
     search_fields = ("message", "entity_id")
+    show_full_result_count = False
+
+
+@admin.register(AuditArchive)
+class AuditArchiveAdmin(admin.ModelAdmin):
+    list_display = ("month", "entries", "size", "first_timestamp", "last_timestamp", "path")
+    readonly_fields = ("month", "path", "entries", "size", "first_timestamp", "last_timestamp")
 
 # Register your models here.
@@ -0,0 +1,329 @@
+"""Read-only JSON API for objects, maintenance events and documents.
+
+Common query parameters:
+
+* filters of the resource's ``FilterSet`` (django-filter);
+* ``fields=id,name,...`` — sparse fieldsets; rows are fetched with
+  ``values()`` for exactly those columns (heavy ``equipment``/``notes`` are
+  not in the defaults);
+* ``ids=1,2,3`` — batched lookup of up to ``MAX_IDS`` rows;
+* ``cursor=`` / ``limit=`` — keyset pagination by ``id``.
+
+Responses carry an ETag derived from the row count and the newest
+version timestamps of the filtered set (one aggregate query); a matching
+``If-None-Match`` returns 304 before any row is fetched or serialized.
+Names joined from other tables (``organization_name``, ``periodicity_name``)
+do not move those timestamps: they are left out of the defaults and, when
+requested, the ETag also includes the ``refdata`` version of their table.
+"""
+import datetime
+import hashlib
+import json
+
+import django_filters
+from django.contrib.auth.decorators import login_required
+from django.db.models import Count, Max
+from django.http import Http404, JsonResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_http_methods, require_POST
+
+from guardsys.documents.models import Document
+from guardsys.maintenance.models import MaintenanceEvent
+from . import bulk, refdata, sync
+from .models import GuardedObject
+from .pagination import InvalidCursor, paginate
+from .permissions import visible_objects
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+MAX_IDS = 500
+MAX_SYNC_ACTIONS = 1000
+INVALID = 'invalid'
+
+
+class GuardedObjectFilter(django_filters.FilterSet):
+    updated_since = django_filters.IsoDateTimeFilter(field_name='updated_at', lookup_expr='gte')
+
+    class Meta:
+        model = GuardedObject
+        fields = ['organization', 'main_responsible', 'deputy_responsible', 'status', 'is_deleted']
+
+
+class MaintenanceEventFilter(django_filters.FilterSet):
+    due_before = django_filters.DateFilter(field_name='next_due_at', lookup_expr='lt')
+    due_after = django_filters.DateFilter(field_name='next_due_at', lookup_expr='gte')
+    updated_since = django_filters.IsoDateTimeFilter(field_name='updated_at', lookup_expr='gte')
+
+    class Meta:
+        model = MaintenanceEvent
+        fields = ['object', 'periodicity', 'is_overdue']
+
+
+class DocumentFilter(django_filters.FilterSet):
+    uploaded_since = django_filters.IsoDateTimeFilter(field_name='uploaded_at', lookup_expr='gte')
+    updated_since = django_filters.IsoDateTimeFilter(field_name='updated_at', lookup_expr='gte')
+
+    class Meta:
+        model = Document
+        fields = ['object', 'content_type']
+
+
+class Resource:
+    """What the API exposes of one model: field name -> ORM path."""
+
+    def __init__(self, model, filterset, fields, default_fields, version_fields, visibility_prefix,
+                 related_versions=None):
+        self.model = model
+        self.filterset = filterset
+        self.fields = fields
+        self.default_fields = default_fields
+        self.version_fields = version_fields
+        self.visibility_prefix = visibility_prefix
+        self.related_versions = related_versions or {}  # field -> refdata table
+
+    def queryset(self, user):
+        return self.model._default_manager.filter(visible_objects(user, self.visibility_prefix))
+
+
+OBJECTS = Resource(
+    GuardedObject, GuardedObjectFilter,
+    fields={
+        'id': 'id', 'name': 'name', 'address': 'address', 'organization': 'organization_id',
+        'organization_name': 'organization__name', 'equipment': 'equipment',
+        'main_responsible': 'main_responsible_id', 'deputy_responsible': 'deputy_responsible_id',
+        'status': 'status', 'is_deleted': 'is_deleted', 'notes': 'notes',
+        'created_at': 'created_at', 'updated_at': 'updated_at',
+    },
+    default_fields=['id', 'name', 'address', 'organization', 'main_responsible',
+                    'deputy_responsible', 'status', 'is_deleted', 'updated_at'],
+    version_fields=('updated_at',), visibility_prefix='',
+    related_versions={'organization_name': refdata.ORGANIZATIONS},
+)
+MAINTENANCE = Resource(
+    MaintenanceEvent, MaintenanceEventFilter,
+    fields={
+        'id': 'id', 'object': 'object_id', 'periodicity': 'periodicity_id', 'periodicity_name': 'periodicity__name',
+        'last_done_at': 'last_done_at', 'next_due_at': 'next_due_at', 'is_overdue': 'is_overdue',
+        'updated_at': 'updated_at',
+    },
+    default_fields=['id', 'object', 'periodicity', 'last_done_at', 'next_due_at', 'is_overdue', 'updated_at'],
+    version_fields=('updated_at',), visibility_prefix='object__',
+    related_versions={'periodicity_name': refdata.PERIODICITIES},
+)
+DOCUMENTS = Resource(
+    Document, DocumentFilter,
+    fields={
+        'id': 'id', 'object': 'object_id', 'original_name': 'original_name', 'content_type': 'content_type',
+        'digest': 'blob_id', 'uploaded_at': 'uploaded_at', 'processed_at': 'processed_at',
+        'extracted_text': 'extracted_text', 'updated_at': 'updated_at',
+    },
+    default_fields=['id', 'object', 'original_name', 'content_type', 'digest', 'uploaded_at', 'updated_at'],
+    version_fields=('updated_at',), visibility_prefix='object__',
+)
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def _csv(value):
+    return [part.strip() for part in value.split(',') if part.strip()]
+
+
+def _fields(resource, request):
+    requested = _csv(request.GET.get('fields', ''))
+    if not requested:
+        return resource.default_fields
+    unknown = [name for name in requested if name not in resource.fields]
+    if unknown:
+        raise BadRequest(f"Неизвестные поля: {', '.join(unknown)}")
+    return list(dict.fromkeys(['id', *requested]))
+
+
+def _ids(request):
+    try:
+        ids = [int(part) for part in _csv(request.GET.get('ids', ''))]
+    except ValueError:
+        raise BadRequest("ids должен быть списком целых чисел")
+    if len(ids) > MAX_IDS:
+        raise BadRequest(f"Не больше {MAX_IDS} ids за запрос")
+    return ids
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise BadRequest("limit должен быть числом")
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def _etag(request, count, versions, resource=None, names=()):
+    basis = f'{request.user.pk}:{request.GET.urlencode()}:{count}:' + ','.join(
+        version.isoformat() if version else '' for version in versions
+    )
+    if resource is not None:
+        kinds = sorted({resource.related_versions[name] for name in names if name in resource.related_versions})
+        basis += ':' + ','.join(refdata.version(kind) for kind in kinds)
+    return '"%s"' % hashlib.md5(basis.encode()).hexdigest()
+
+
+def _respond(request, etag, build):
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is None:
+        try:
+            response = JsonResponse(build(), json_dumps_params={'ensure_ascii': False})
+        except BadRequest as exc:
+            return JsonResponse({'error': str(exc)}, status=400)
+    else:
+        response = not_modified
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    patch_vary_headers(response, ['Cookie'])
+    return response
+
+
+def _rows(queryset, resource, names):
+    paths = [resource.fields[name] for name in names]
+    for row in queryset.values(*paths):
+        yield {name: row[path] for name, path in zip(names, paths)}
+
+
+def collection(request, resource):
+    try:
+        names = _fields(resource, request)
+        ids = _ids(request)
+        limit = _limit(request)
+    except BadRequest as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    filterset = resource.filterset(request.GET, queryset=resource.queryset(request.user))
+    if not filterset.is_valid():
+        return JsonResponse({'errors': filterset.errors.get_json_data()}, status=400)
+    queryset = filterset.qs.order_by()
+    if ids:
+        queryset = queryset.filter(pk__in=ids)
+
+    stats = queryset.aggregate(
+        count=Count('pk'), **{f'max_{name}': Max(name) for name in resource.version_fields}
+    )
+    etag = _etag(request, stats['count'], [stats[f'max_{name}'] for name in resource.version_fields],
+                 resource, names)
+
+    def build():
+        paths = [resource.fields[name] for name in names]
+        try:
+            page = paginate(queryset.values(*paths), cursor=request.GET.get('cursor'), per_page=limit,
+                            ordering=['id'])
+        except InvalidCursor:
+            raise BadRequest("Некорректный курсор страницы")
+        results = [{name: row[path] for name, path in zip(names, paths)} for row in page.object_list]
+        return {
+            'count': stats['count'],
+            'results': results,
+            'next_cursor': page.next_cursor,
+            'prev_cursor': page.prev_cursor,
+        }
+
+    return _respond(request, etag, build)
+
+
+def detail(request, resource, pk):
+    try:
+        names = _fields(resource, request)
+    except BadRequest as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    queryset = resource.queryset(request.user).filter(pk=pk)
+    versions = queryset.values_list(*resource.version_fields).first()
+    if versions is None:
+        raise Http404("Не найдено")
+    etag = _etag(request, 1, versions, resource, names)
+    return _respond(request, etag, lambda: next(_rows(queryset, resource, names)))
+
+
+@login_required
+@require_http_methods(['GET', 'HEAD'])
+def api_objects(request):
+    return collection(request, OBJECTS)
+
+
+@login_required
+@require_http_methods(['GET', 'HEAD'])
+def api_object(request, pk):
+    return detail(request, OBJECTS, pk)
+
+
+@login_required
+@require_http_methods(['GET', 'HEAD'])
+def api_maintenance(request):
+    return collection(request, MAINTENANCE)
+
+
+@login_required
+@require_http_methods(['GET', 'HEAD'])
+def api_documents(request):
+    return collection(request, DOCUMENTS)
+
+
+@login_required
+@require_http_methods(['GET'])
+@gzip_page
+def api_sync(request):
+    """Change feed for offline clients, see ``guardsys.core.sync``."""
+    try:
+        limit = max(1, min(int(request.GET.get('limit', sync.DEFAULT_LIMIT)), sync.MAX_LIMIT))
+    except ValueError:
+        return JsonResponse({'error': "limit должен быть числом"}, status=400)
+    try:
+        data = sync.changes(request.GET.get('token') or None, limit=limit)
+    except InvalidCursor:
+        return JsonResponse({'error': "Некорректный токен синхронизации"}, status=400)
+    response = JsonResponse(data, json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')})
+    response['Cache-Control'] = 'private, no-store'
+    return response
+
+
+def _sync_action(action, today):
+    """``(client id, object id, date)`` of an offline mark-done action; raises ValueError."""
+    if not isinstance(action, dict):
+        raise ValueError(action)
+    when = datetime.date.fromisoformat(str(action.get('done_at') or today.isoformat()))
+    if when > today:
+        raise ValueError(when)
+    return str(action.get('id', action.get('object'))), int(action['object']), when
+
+
+@login_required
+@require_POST
+def api_sync_mark_done(request):
+    """Replay maintenance marked done offline.
+
+    Body: ``{"actions": [{"id": "<client id>", "object": 12, "done_at": "2026-10-17"}, ...]}``.
+    Several actions for one object collapse into the latest date; everything
+    is applied in one ``bulk.mark_done_on`` call. The response maps every
+    client id to ``ok``, ``skipped`` (already done on that date or later),
+    ``forbidden``, ``not_found`` or ``invalid``.
+    """
+    try:
+        actions = json.loads(request.body or b'{}').get('actions') or []
+    except (ValueError, AttributeError):
+        return JsonResponse({'error': "Ожидается JSON с полем actions"}, status=400)
+    if not isinstance(actions, list) or len(actions) > MAX_SYNC_ACTIONS:
+        return JsonResponse({'error': f"Не больше {MAX_SYNC_ACTIONS} действий за запрос"}, status=400)
+
+    today = timezone.localdate()
+    results, clients, dates = {}, [], {}
+    for position, action in enumerate(actions):
+        try:
+            client_id, object_id, when = _sync_action(action, today)
+        except (KeyError, TypeError, ValueError):
+            results[str(action.get('id', position)) if isinstance(action, dict) else str(position)] = INVALID
+            continue
+        clients.append((client_id, object_id))
+        dates[object_id] = max(when, dates.get(object_id, when))
+    outcomes = bulk.mark_done_on(request.user, dates) if dates else {}
+    for client_id, object_id in clients:
+        results[client_id] = outcomes.get(object_id, bulk.NOT_FOUND)
+    return JsonResponse({'results': results})
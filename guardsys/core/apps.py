@@ -6,4 +6,4 @@ class CoreConfig(AppConfig):
     name = 'guardsys.core'
 
     def ready(self):
-        from . import signals  # noqa: F401
+        from . import checks, signals  # noqa: F401
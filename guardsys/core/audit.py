@@ -0,0 +1,115 @@
+"""Buffered audit log writer.
+
+Changes are diffed against the values the instance was loaded with
+(``GuardedObject.from_db`` keeps them), so no extra SELECT is needed before
+a save. Entries are collected per transaction (per savepoint, so a rolled back
+inner ``atomic`` block takes its entries with it) and written with
+``bulk_create`` when the transaction commits; outside of a transaction they
+are written right away.
+"""
+import threading
+
+from django.db import transaction
+
+from .models import AuditLog
+
+IGNORED_FIELDS = {'updated_at', 'next_due_at'}
+BATCH_SIZE = 500
+
+
+def snapshot(instance):
+    """Current field values keyed by attname; deferred fields are skipped."""
+    deferred = instance.get_deferred_fields()
+    return {
+        field.attname: getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+        if field.attname not in deferred
+    }
+
+
+def _by_name(instance, values):
+    names = {field.attname: field.name for field in instance._meta.concrete_fields}
+    return {names[attname]: value for attname, value in values.items()}
+
+
+def change_entry(instance, entity, created=False, action=None, user=None, message=''):
+    """Build an unsaved AuditLog for ``instance`` or None if nothing changed.
+
+    Only changed fields end up in ``before``/``after``; the loaded state is
+    moved forward by ``GuardedObject.save()`` once all receivers have run.
+    """
+    current = snapshot(instance)
+    loaded = None if created else getattr(instance, '_loaded_values', None)
+    if loaded is None:
+        before, after = None, current
+    else:
+        changed = [
+            attname for attname, value in current.items()
+            if attname in loaded and attname not in IGNORED_FIELDS and loaded[attname] != value
+        ]
+        if not changed:
+            return None
+        before = {attname: loaded[attname] for attname in changed}
+        after = {attname: current[attname] for attname in changed}
+    return AuditLog(
+        action=action or ('created' if created else 'updated'),
+        entity=entity,
+        entity_id=str(instance.pk),
+        user=user,
+        message=message,
+        before=_by_name(instance, before) if before is not None else None,
+        after=_by_name(instance, after),
+    )
+
+
+class _Batch(list):
+    """Entries buffered at one savepoint level; written by its on_commit hook."""
+
+    def __call__(self):
+        if self:
+            AuditLog.objects.bulk_create(self, batch_size=BATCH_SIZE)
+            self.clear()
+
+
+class AuditBuffer:
+    def __init__(self, using=None):
+        self.using = using
+        self._local = threading.local()
+
+    def add(self, *entries):
+        connection = transaction.get_connection(self.using)
+        if not connection.in_atomic_block:
+            AuditLog.objects.bulk_create(entries, batch_size=BATCH_SIZE)
+            return
+        # One batch per savepoint: rolling a savepoint back drops the hooks
+        # registered inside it, and with them the entries of that batch.
+        batches = getattr(self._local, 'batches', None)
+        if batches is None:
+            batches = self._local.batches = {}
+        key = tuple(connection.savepoint_ids)
+        batch = batches.get(key)
+        if batch is None or not self._scheduled(connection, batch):
+            self._prune(connection, batches)
+            batch = batches[key] = _Batch()
+            transaction.on_commit(batch, using=self.using)
+        batch.extend(entries)
+
+    @staticmethod
+    def _scheduled(connection, batch):
+        return any(func is batch for _, func, _ in connection.run_on_commit)
+
+    def _prune(self, connection, batches):
+        # batches of committed or rolled back transactions
+        for key, batch in list(batches.items()):
+            if not self._scheduled(connection, batch):
+                del batches[key]
+
+
+buffer = AuditBuffer()
+
+
+def record(*entries):
+    """Queue AuditLog instances; ``None`` entries are ignored."""
+    entries = [entry for entry in entries if entry is not None]
+    if entries:
+        buffer.add(*entries)
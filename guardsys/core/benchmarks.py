@@ -0,0 +1,85 @@
+"""Benchmark harness for the hot paths.
+
+Each scenario is timed ``repeat`` times against a dataset produced by
+``synthetic.generate``; the median, min and max wall time and the number of
+queries of the last run are reported. Results are plain dicts so they can be
+dumped to JSON and compared between runs.
+"""
+import statistics
+import time
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import GuardedObject
+
+
+def _scenarios(admin, responsible, obj):
+    admin_client = Client()
+    admin_client.force_login(admin)
+    responsible_client = Client()
+    responsible_client.force_login(responsible)
+    list_url = reverse('object_list')
+
+    def get(client, url):
+        def run():
+            response = client.get(url)
+            assert response.status_code == 200, (url, response.status_code)
+        return run
+
+    def archive_restore():
+        admin_client.post(reverse('object_archive', args=[obj.pk]), {'reason': 'benchmark'})
+        admin_client.post(reverse('object_restore', args=[obj.pk]))
+
+    return {
+        'list': get(admin_client, list_url),
+        'list_search': get(admin_client, list_url + '?q=склад моск'),
+        'list_my': get(responsible_client, list_url + '?my=1'),
+        'list_overdue': get(admin_client, list_url + '?overdue=1'),
+        'detail': get(admin_client, reverse('object_detail', args=[obj.pk])),
+        'dashboard': get(responsible_client, reverse('maintenance_dashboard')),
+        'archive_restore': archive_restore,
+        'daily_report': lambda: call_command('send_daily_report', stdout=StringIO()),
+        'export_csv': lambda: call_command('export_monthly_csv', stdout=StringIO()),
+    }
+
+
+def run_scenarios(repeat=5, only=None):
+    User = get_user_model()
+    admin = User.objects.filter(is_superuser=True).first() or User.objects.create_superuser(
+        'benchmark-admin', 'benchmark@example.com', None, role=User.Roles.ADMIN
+    )
+    obj = GuardedObject.objects.filter(is_deleted=False).order_by('pk').first()
+    responsible = obj.main_responsible
+    results = {}
+    for name, scenario in _scenarios(admin, responsible, obj).items():
+        if only and name not in only:
+            continue
+        timings = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                scenario()
+                timings.append((time.perf_counter() - start) * 1000)
+        results[name] = {
+            'median_ms': round(statistics.median(timings), 2),
+            'min_ms': round(min(timings), 2),
+            'max_ms': round(max(timings), 2),
+            'queries': len(captured),
+        }
+    return results
+
+
+def compare(previous, current):
+    """Yield ``(size, scenario, before_ms, after_ms, ratio)`` for scenarios in both runs."""
+    for size, scenarios in current.get('sizes', {}).items():
+        for name, result in scenarios.items():
+            before = previous.get('sizes', {}).get(size, {}).get(name)
+            if before:
+                ratio = result['median_ms'] / before['median_ms'] if before['median_ms'] else None
+                yield size, name, before['median_ms'], result['median_ms'], ratio
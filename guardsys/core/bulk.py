@@ -0,0 +1,167 @@
+"""Bulk archive / restore / mark-done.
+
+The single-object views do a lookup, a permission check and a save per
+object. Here permissions for the whole list are answered from
+``permission_scope`` plus one ``values`` query, changes are applied with
+set-based UPDATEs and the audit entries go through ``audit.record`` (one
+``bulk_create``). Signals do not fire, so the fragment cache and the
+dashboard summary are refreshed explicitly.
+
+Every function returns ``{id: outcome}`` with one of ``OK``, ``NOT_FOUND``,
+``FORBIDDEN`` or ``SKIPPED`` (nothing to do, e.g. already archived or the
+maintenance already done on that date or later).
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from guardsys.documents.models import Document
+from guardsys.maintenance import summary
+from guardsys.maintenance.models import MaintenanceEvent, PeriodicityTemplate
+from guardsys.maintenance.scheduling import BusinessCalendar, next_date, update_object_due_dates
+from . import audit, fragments
+from .models import AuditLog, GuardedObject
+from .permissions import object_permissions
+
+OK = 'ok'
+NOT_FOUND = 'not_found'
+FORBIDDEN = 'forbidden'
+SKIPPED = 'skipped'
+
+OBJECT_FIELDS = ('pk', 'is_deleted', 'status', 'deleted_at', 'deleted_reason', 'main_responsible_id',
+                 'organization_id')
+
+
+def parse_ids(values):
+    ids = []
+    for value in values:
+        try:
+            ids.append(int(value))
+        except (TypeError, ValueError):
+            continue
+    return list(dict.fromkeys(ids))
+
+
+def _load(ids):
+    return {row['pk']: row for row in GuardedObject.objects.filter(pk__in=ids).values(*OBJECT_FIELDS)}
+
+
+def _outcomes(ids, rows, allowed, applicable):
+    outcomes = {}
+    for pk in ids:
+        row = rows.get(pk)
+        if row is None:
+            outcomes[pk] = NOT_FOUND
+        elif pk not in allowed:
+            outcomes[pk] = FORBIDDEN
+        elif not applicable(row):
+            outcomes[pk] = SKIPPED
+        else:
+            outcomes[pk] = OK
+    return outcomes
+
+
+def _refresh(rows, ids):
+    fragments.bump(ids)
+    summary.refresh(
+        {rows[pk]['main_responsible_id'] for pk in ids},
+        {rows[pk]['organization_id'] for pk in ids},
+    )
+
+
+def _set_status(user, ids, rows, outcomes, values, action, message=''):
+    ok = [pk for pk, outcome in outcomes.items() if outcome == OK]
+    if not ok:
+        return outcomes
+    with transaction.atomic():
+        GuardedObject.objects.filter(pk__in=ok).update(updated_at=timezone.now(), **values)
+        audit.record(*[
+            AuditLog(
+                action=action, entity=AuditLog.Entity.OBJECT, entity_id=str(pk), user=user, message=message,
+                before={name: rows[pk][name] for name in values},
+                after=values,
+            )
+            for pk in ok
+        ])
+        _refresh(rows, ok)
+    return outcomes
+
+
+def archive_objects(user, ids, reason=''):
+    rows = _load(ids)
+    _, archivable = object_permissions(user, rows)
+    outcomes = _outcomes(ids, rows, archivable, lambda row: not row['is_deleted'])
+    values = {
+        'is_deleted': True, 'status': GuardedObject.Status.ARCHIVED,
+        'deleted_at': timezone.now(), 'deleted_reason': reason,
+    }
+    return _set_status(user, ids, rows, outcomes, values, 'archived', reason)
+
+
+def restore_objects(user, ids):
+    rows = _load(ids)
+    # same rule as object_restore: superusers only
+    allowed = set(rows) if user.is_superuser else set()
+    outcomes = _outcomes(ids, rows, allowed, lambda row: row['is_deleted'])
+    values = {'is_deleted': False, 'status': GuardedObject.Status.ACTIVE, 'deleted_at': None}
+    outcomes = _set_status(user, ids, rows, outcomes, values, 'restored')
+    restored = [pk for pk, outcome in outcomes.items() if outcome == OK]
+    if restored:
+        # back into the sync change feed, as in GuardedObject.restore()
+        now = timezone.now()
+        MaintenanceEvent.objects.filter(object__in=restored).update(updated_at=now)
+        Document.objects.filter(object__in=restored).update(updated_at=now)
+    return outcomes
+
+
+def mark_done(user, ids, when=None):
+    """Mark the maintenance of the given objects done on ``when`` (today)."""
+    when = when or timezone.localdate()
+    return mark_done_on(user, {pk: when for pk in ids})
+
+
+def mark_done_on(user, dates):
+    """Mark maintenance done per object: ``dates`` maps object id -> date.
+
+    Events already done on that date or later are left alone, so replaying a
+    batch (offline clients retry) does not move the schedule again.
+    """
+    today = timezone.localdate()
+    ids = list(dates)
+    rows = _load(ids)
+    editable, _ = object_permissions(user, rows)
+    events = [
+        event for event in MaintenanceEvent.objects.filter(object__in=editable)
+        .values('pk', 'object_id', 'periodicity_id', 'last_done_at', 'next_due_at')
+        if event['last_done_at'] is None or event['last_done_at'] < dates[event['object_id']]
+    ]
+    with_events = {event['object_id'] for event in events}
+    outcomes = _outcomes(ids, rows, editable, lambda row: row['pk'] in with_events)
+    if not events:
+        return outcomes
+
+    calendar = BusinessCalendar.load()
+    templates = PeriodicityTemplate.objects.in_bulk({event['periodicity_id'] for event in events})
+    groups = {}
+    for event in events:
+        groups.setdefault((event['periodicity_id'], dates[event['object_id']]), []).append(event)
+    entries = []
+    now = timezone.now()
+    with transaction.atomic():
+        # one UPDATE per (periodicity template, date): they all get the same due date
+        for (template_id, when), selected in groups.items():
+            due = next_date(templates[template_id], when, calendar)
+            MaintenanceEvent.objects.filter(pk__in=[event['pk'] for event in selected]).update(
+                last_done_at=when, next_due_at=due, is_overdue=due < today, updated_at=now,
+            )
+            entries.extend(
+                AuditLog(
+                    action='done', entity=AuditLog.Entity.MAINTENANCE, entity_id=str(event['pk']), user=user,
+                    before={'last_done_at': event['last_done_at'], 'next_due_at': event['next_due_at']},
+                    after={'last_done_at': when, 'next_due_at': due},
+                )
+                for event in selected
+            )
+        update_object_due_dates(with_events)
+        audit.record(*entries)
+        _refresh(rows, with_events)
+    return outcomes
@@ -0,0 +1,69 @@
+"""System checks for the caches the app relies on for invalidation.
+
+Fragment and reference data versions are invalidated by writing to a cache.
+With a per-process backend (locmem, dummy) a write from another worker or
+from a management command (``recalc_overdue``, ``import_objects``…) never
+reaches the process that serves the page. (Permission scopes are simply not
+cached across requests in that case, see ``permissions``.)
+
+Version tokens are ordinary entries, so a backend that culls at Django's
+default ``MAX_ENTRIES`` (300) drops them all the time and the cache never
+hits.
+"""
+from django.conf import settings
+from django.core.checks import Warning, register
+
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+# backends that cull at OPTIONS['MAX_ENTRIES']
+CULLING_BACKENDS = (
+    'django.core.cache.backends.filebased.FileBasedCache',
+    'django.core.cache.backends.db.DatabaseCache',
+)
+DEFAULT_MAX_ENTRIES = 300
+
+
+def is_process_local(alias):
+    return settings.CACHES.get(alias, {}).get('BACKEND') in PROCESS_LOCAL_BACKENDS
+
+
+def shared_aliases():
+    return {
+        'FRAGMENT_CACHE_ALIAS': getattr(settings, 'FRAGMENT_CACHE_ALIAS', 'default'),
+        'REFDATA_CACHE_ALIAS': getattr(settings, 'REFDATA_CACHE_ALIAS', 'default'),
+    }
+
+
+@register()
+def check_shared_caches(app_configs, **kwargs):
+    if settings.DEBUG:
+        return []
+    return [
+        Warning(
+            f"{setting} использует кэш '{alias}' с локальным для процесса бэкендом",
+            hint="Сброс кэша из других процессов и команд не будет виден; "
+                 "настройте общий бэкенд (FileBasedCache, DatabaseCache, Redis, Memcached).",
+            id='guardsys.W001',
+        )
+        for setting, alias in shared_aliases().items()
+        if is_process_local(alias)
+    ]
+
+
+@register()
+def check_cache_size(app_configs, **kwargs):
+    messages = []
+    for alias in sorted(set(shared_aliases().values()) | {'default'}):
+        config = settings.CACHES.get(alias, {})
+        if config.get('BACKEND') not in CULLING_BACKENDS:
+            continue
+        if config.get('OPTIONS', {}).get('MAX_ENTRIES', DEFAULT_MAX_ENTRIES) <= DEFAULT_MAX_ENTRIES:
+            messages.append(Warning(
+                f"Кэш '{alias}' ограничен {DEFAULT_MAX_ENTRIES} записями",
+                hint="Версии фрагментов и справочников будут постоянно вытесняться; "
+                     "задайте OPTIONS['MAX_ENTRIES'] с запасом на все объекты.",
+                id='guardsys.W002',
+            ))
+    return messages
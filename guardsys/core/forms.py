@@ -1,9 +1,39 @@
 from django import forms
+from django.urls import reverse_lazy
+
+from . import refdata
 from .models import GuardedObject
 
 
+class AutocompleteSelect(forms.Select):
+    """Select that renders only the chosen option and loads the rest from
+    the ``autocomplete`` endpoint; the label comes from ``refdata``."""
+
+    template_name = 'core/widgets/autocomplete.html'
+
+    def __init__(self, kind, attrs=None):
+        super().__init__(attrs)
+        self.kind = kind
+
+    def optgroups(self, name, value, attrs=None):
+        selected = [v for v in value if v not in (None, '')]
+        options = [self.create_option(name, '', '—', not selected, 0)]
+        for index, pk in enumerate(selected, start=1):
+            options.append(self.create_option(name, pk, refdata.label(self.kind, pk) or pk, True, index))
+        return [(None, options, 0)]
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['url'] = reverse_lazy('autocomplete', args=[self.kind])
+        return context
+
+
 class GuardedObjectForm(forms.ModelForm):
     class Meta:
         model = GuardedObject
         fields = ['name', 'address', 'organization', 'equipment', 'main_responsible', 'deputy_responsible', 'notes']
-
+        widgets = {
+            'organization': AutocompleteSelect(refdata.ORGANIZATIONS),
+            'main_responsible': AutocompleteSelect(refdata.USERS),
+            'deputy_responsible': AutocompleteSelect(refdata.USERS),
+        }
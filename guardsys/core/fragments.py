@@ -0,0 +1,108 @@
+"""Versioned fragment cache for the object detail page.
+
+Every ``GuardedObject`` has a version token in the cache; cache keys of its
+page fragments include the token, so invalidation is a single ``set`` and
+stale fragments simply expire. Signals bump the token when the object, its
+maintenance events or its documents change. Set-based UPDATEs bypass
+signals, so they call ``bump_all()``, which changes a global generation that
+is part of every version.
+
+The backend is ``caches[settings.FRAGMENT_CACHE_ALIAS]`` — any Django cache
+(locmem, file, db, memcached, redis) works.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+GLOBAL_KEY = 'fragments:generation'
+
+
+def get_cache():
+    return caches[getattr(settings, 'FRAGMENT_CACHE_ALIAS', 'default')]
+
+
+def timeout():
+    return getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 3600)
+
+
+def _object_key(pk):
+    return f'fragments:object:{pk}'
+
+
+def _token():
+    return uuid.uuid4().hex[:12]
+
+
+def version(pk):
+    """Current version of an object's fragments, created on first use."""
+    cache = get_cache()
+    keys = [GLOBAL_KEY, _object_key(pk)]
+    values = cache.get_many(keys)
+    missing = {key: _token() for key in keys if key not in values}
+    for key, token in missing.items():
+        # add() keeps a token another process has just created
+        if not cache.add(key, token, None):
+            token = cache.get(key, token)
+        values[key] = token
+    return f'{values[GLOBAL_KEY]}.{values[_object_key(pk)]}'
+
+
+async def aversion(pk):
+    """Async ``version()``."""
+    cache = get_cache()
+    keys = [GLOBAL_KEY, _object_key(pk)]
+    values = await cache.aget_many(keys)
+    for key in keys:
+        if key not in values:
+            token = _token()
+            if not await cache.aadd(key, token, None):
+                token = await cache.aget(key, token)
+            values[key] = token
+    return f'{values[GLOBAL_KEY]}.{values[_object_key(pk)]}'
+
+
+def _bump_now(keys):
+    get_cache().set_many({key: _token() for key in keys}, None)
+
+
+def _bump(keys):
+    # Once now and once after commit: a page rendered between the two from
+    # not yet committed data must not stay cached.
+    _bump_now(keys)
+    transaction.on_commit(lambda: _bump_now(keys))
+
+
+def bump(object_ids):
+    """Invalidate the fragments of the given objects."""
+    keys = [_object_key(pk) for pk in set(object_ids) if pk]
+    if keys:
+        _bump(keys)
+
+
+def bump_all():
+    """Invalidate the fragments of every object."""
+    _bump([GLOBAL_KEY])
+
+
+def cached_object(pk, version, loader):
+    """The object for the detail page, cached under ``version``."""
+    cache = get_cache()
+    key = f'fragments:detail:{pk}:{version}'
+    obj = cache.get(key)
+    if obj is None:
+        obj = loader()
+        cache.set(key, obj, timeout())
+    return obj
+
+
+async def acached_object(pk, version, loader):
+    """Async ``cached_object()``; ``loader`` is a coroutine function."""
+    cache = get_cache()
+    key = f'fragments:detail:{pk}:{version}'
+    obj = await cache.aget(key)
+    if obj is None:
+        obj = await loader()
+        await cache.aset(key, obj, timeout())
+    return obj
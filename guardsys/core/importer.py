@@ -0,0 +1,308 @@
+"""Bulk import of organizations, objects and maintenance schedules.
+
+Rows come from CSV or XLSX (read with ``openpyxl``) and are processed in
+batches: every batch is validated against lookup maps built once (users by
+username/e-mail, organizations by INN/name, periodicity templates by name)
+and inserted with ``bulk_create`` in its own transaction. Signals do not
+fire for bulk inserts, so the search index, the dashboard summary and the
+permission caches are updated explicitly, and the audit entries for all
+created objects are written as one batch at the end.
+
+Columns (header names, case-insensitive; Russian aliases are accepted):
+``organization``, ``inn``, ``name``, ``address``, ``equipment``,
+``main_responsible``, ``deputy_responsible``, ``notes``, ``periodicity``,
+``last_done_at``, ``next_due_at``.
+"""
+import csv
+import datetime
+import io
+
+import openpyxl
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from guardsys.maintenance import summary
+from guardsys.maintenance.models import MaintenanceEvent, PeriodicityTemplate
+from guardsys.maintenance.scheduling import BusinessCalendar, next_date
+from . import audit, refdata, search
+from .models import AuditLog, GuardedObject, Organization
+from .permissions import invalidate_permissions
+
+COLUMNS = {
+    'organization': 'organization', 'организация': 'organization',
+    'inn': 'inn', 'инн': 'inn',
+    'name': 'name', 'название': 'name',
+    'address': 'address', 'адрес': 'address',
+    'equipment': 'equipment', 'оборудование': 'equipment',
+    'main_responsible': 'main_responsible', 'ответственный': 'main_responsible',
+    'deputy_responsible': 'deputy_responsible', 'заместитель': 'deputy_responsible',
+    'notes': 'notes', 'примечания': 'notes',
+    'periodicity': 'periodicity', 'периодичность': 'periodicity',
+    'last_done_at': 'last_done_at', 'последнее то': 'last_done_at',
+    'next_due_at': 'next_due_at', 'следующее то': 'next_due_at',
+}
+REQUIRED = ('organization', 'name', 'address', 'main_responsible')
+DATE_FORMATS = ('%Y-%m-%d', '%d.%m.%Y')
+MAX_LENGTH = 255
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.organizations = 0
+        self.objects = 0
+        self.events = 0
+        self.errors = []  # (line, message)
+
+    def error(self, line, message):
+        self.errors.append((line, message))
+
+
+def _header(names):
+    return [COLUMNS.get(str(name or '').strip().lower()) for name in names]
+
+
+def read_csv(fileobj):
+    """Yield ``(line, row)`` from a binary CSV file (UTF-8; ``;``, tab or ``,``)."""
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    first = text.readline()
+    # the delimiter is taken from the header: the sniffer guesses wrong on
+    # addresses full of commas
+    delimiter = next((d for d in (';', '\t') if d in first), ',')
+    header = _header(next(csv.reader([first], delimiter=delimiter), []))
+    reader = csv.reader(text, delimiter=delimiter)
+    for line, values in enumerate(reader, start=2):
+        if any(values):
+            yield line, {key: value for key, value in zip(header, values) if key}
+
+
+def read_xlsx(fileobj):
+    """Yield ``(line, row)`` from the first sheet of an XLSX workbook."""
+    workbook = openpyxl.load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = _header(next(rows, ()))
+        for line, values in enumerate(rows, start=2):
+            if any(value not in (None, '') for value in values):
+                yield line, {key: value for key, value in zip(header, values) if key}
+    finally:
+        workbook.close()
+
+
+def read_rows(fileobj, name):
+    if name.lower().endswith('.xlsx'):
+        return read_xlsx(fileobj)
+    if name.lower().endswith('.csv'):
+        return read_csv(fileobj)
+    raise ImportFormatError("Поддерживаются только файлы CSV и XLSX")
+
+
+def _text(row, key):
+    value = row.get(key)
+    return '' if value is None else str(value).strip()
+
+
+def _date(row, key):
+    value = row.get(key)
+    if value in (None, ''):
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(str(value).strip(), fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"некорректная дата в поле {key}: {value}")
+
+
+class Importer:
+    def __init__(self, user=None, batch_size=1000, dry_run=False):
+        self.user = user
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.today = timezone.localdate()
+        self.result = ImportResult()
+        self.audit_entries = []
+        self.touched_users = set()
+        self.touched_orgs = set()
+        self.existing = set()  # (organization, name, address) already in the database
+        self.loaded_orgs = set()
+        self.seen = set()  # the same for rows accepted so far
+
+        User = get_user_model()
+        self.users = {}
+        for pk, username, email in User.objects.filter(is_active=True).values_list('pk', 'username', 'email'):
+            self.users[username.lower()] = pk
+            if email:
+                self.users.setdefault(email.lower(), pk)
+        self.orgs_by_inn, self.orgs_by_name = {}, {}
+        for pk, name, inn in Organization._default_manager.values_list('pk', 'name', 'inn'):
+            self.orgs_by_name.setdefault(name.lower(), pk)
+            if inn:
+                self.orgs_by_inn.setdefault(inn, pk)
+        self.periodicities = {t.name.lower(): t for t in PeriodicityTemplate.objects.all()}
+        self.calendar = BusinessCalendar.load()
+
+    def run(self, rows):
+        batch = []
+        for line, row in rows:
+            self.result.rows += 1
+            batch.append((line, row))
+            if len(batch) >= self.batch_size:
+                self._process(batch)
+                batch = []
+        if batch:
+            self._process(batch)
+        self._finish()
+        return self.result
+
+    def _user(self, value, field):
+        pk = self.users.get(value.lower())
+        if pk is None:
+            raise ValueError(f"пользователь «{value}» не найден ({field})")
+        return pk
+
+    def _org_key(self, row):
+        name, inn = _text(row, 'organization'), _text(row, 'inn')
+        pk = self.orgs_by_inn.get(inn) if inn else None
+        if pk is None and not inn:
+            pk = self.orgs_by_name.get(name.lower())
+        return pk, (inn or name.lower())
+
+    def _validate(self, line, row):
+        missing = [key for key in REQUIRED if not _text(row, key)]
+        if missing:
+            raise ValueError("не заполнены поля: " + ", ".join(missing))
+        for key in ('organization', 'name', 'address'):
+            if len(_text(row, key)) > MAX_LENGTH:
+                raise ValueError(f"поле {key} длиннее {MAX_LENGTH} символов")
+        main = self._user(_text(row, 'main_responsible'), 'main_responsible')
+        deputy = _text(row, 'deputy_responsible')
+        deputy = self._user(deputy, 'deputy_responsible') if deputy else None
+        periodicity = _text(row, 'periodicity')
+        template = None
+        if periodicity:
+            template = self.periodicities.get(periodicity.lower())
+            if template is None:
+                raise ValueError(f"шаблон периодичности «{periodicity}» не найден")
+        last_done, next_due = _date(row, 'last_done_at'), _date(row, 'next_due_at')
+        if (last_done or next_due) and template is None:
+            raise ValueError("даты ТО указаны без периодичности")
+        org_pk, org_key = self._org_key(row)
+        return {
+            'line': line, 'org_pk': org_pk, 'org_key': org_key,
+            'org_name': _text(row, 'organization'), 'inn': _text(row, 'inn'),
+            'name': _text(row, 'name'), 'address': _text(row, 'address'),
+            'equipment': _text(row, 'equipment'), 'notes': _text(row, 'notes'),
+            'main': main, 'deputy': deputy, 'template': template,
+            'last_done': last_done, 'next_due': next_due,
+        }
+
+    def _load_existing(self, items):
+        """Add the objects of organizations not seen before to ``existing``.
+
+        Each organization is read once per import; objects created by the
+        import itself are added as they are inserted.
+        """
+        org_ids = {item['org_pk'] for item in items if item['org_pk']} - self.loaded_orgs
+        if not org_ids:
+            return
+        rows = GuardedObject.objects.filter(organization__in=org_ids).values_list('organization', 'name', 'address')
+        self.existing.update((org, name.lower(), address.lower()) for org, name, address in rows)
+        self.loaded_orgs |= org_ids
+
+    def _process(self, batch):
+        items = []
+        for line, row in batch:
+            try:
+                items.append(self._validate(line, row))
+            except ValueError as exc:
+                self.result.error(line, str(exc))
+        self._load_existing(items)
+        valid = []
+        for item in items:
+            key = (item['org_pk'] or item['org_key'], item['name'].lower(), item['address'].lower())
+            if key in self.existing or key in self.seen:
+                self.result.error(item['line'], "объект уже существует")
+                continue
+            self.seen.add(key)
+            valid.append(item)
+        if self.dry_run or not valid:
+            return
+        with transaction.atomic():
+            self._create_organizations(valid)
+            self._create_objects(valid)
+
+    def _create_organizations(self, items):
+        new = {}
+        for item in items:
+            if item['org_pk'] is None and item['org_key'] not in new:
+                new[item['org_key']] = Organization(name=item['org_name'], inn=item['inn'])
+        created = Organization._default_manager.bulk_create(new.values())
+        for key, org in zip(new, created):
+            if org.inn:
+                self.orgs_by_inn[org.inn] = org.pk
+            else:
+                self.orgs_by_name[org.name.lower()] = org.pk
+            self.audit_entries.append(audit.change_entry(
+                org, AuditLog.Entity.ORGANIZATION, created=True, user=self.user, message='Импорт'))
+        for item in items:
+            if item['org_pk'] is None:
+                item['org_pk'] = new[item['org_key']].pk
+        self.loaded_orgs.update(org.pk for org in created)
+        self.result.organizations += len(created)
+
+    def _create_objects(self, items):
+        for item in items:
+            template = item['template']
+            if template is not None and item['next_due'] is None:
+                item['next_due'] = next_date(template, item['last_done'] or self.today, self.calendar)
+        objects = GuardedObject.objects.bulk_create([
+            GuardedObject(
+                name=item['name'], address=item['address'], organization_id=item['org_pk'],
+                equipment=item['equipment'], notes=item['notes'],
+                main_responsible_id=item['main'], deputy_responsible_id=item['deputy'],
+                next_due_at=item['next_due'] if item['template'] else None,
+            )
+            for item in items
+        ])
+        events = []
+        for item, obj in zip(items, objects):
+            self.existing.add((item['org_pk'], item['name'].lower(), item['address'].lower()))
+            self.touched_users |= {item['main'], item['deputy']}
+            self.touched_orgs.add(item['org_pk'])
+            self.audit_entries.append(audit.change_entry(
+                obj, AuditLog.Entity.OBJECT, created=True, user=self.user, message='Импорт'))
+            if item['template'] is None:
+                continue
+            events.append(MaintenanceEvent(
+                object=obj, periodicity=item['template'], last_done_at=item['last_done'],
+                next_due_at=item['next_due'], is_overdue=item['next_due'] < self.today,
+            ))
+        MaintenanceEvent.objects.bulk_create(events)
+        search.index_objects(objects)
+        self.result.objects += len(objects)
+        self.result.events += len(events)
+
+    def _finish(self):
+        if self.dry_run:
+            return
+        audit.record(*self.audit_entries)
+        if self.result.organizations:
+            refdata.bump(refdata.ORGANIZATIONS)
+        self.touched_users.discard(None)
+        invalidate_permissions(self.touched_users)
+        summary.refresh(self.touched_users, self.touched_orgs)
+
+
+def import_file(fileobj, name, user=None, batch_size=1000, dry_run=False):
+    """Import an uploaded or opened binary file; returns an ``ImportResult``."""
+    return Importer(user=user, batch_size=batch_size, dry_run=dry_run).run(read_rows(fileobj, name))
@@ -0,0 +1,51 @@
+"""Bulk e-mail delivery over reused SMTP connections.
+
+Messages are split into batches; every worker opens one connection per
+batch and sends the whole batch over it. Messages that fail are put on a
+retry queue and re-sent (again in batches) up to ``retries`` times.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.mail import get_connection
+
+logger = logging.getLogger(__name__)
+
+
+def _send_batch(batch):
+    failed = []
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+        for message in batch:
+            message.connection = connection
+            try:
+                connection.send_messages([message])
+            except Exception as exc:
+                failed.append((message, exc))
+    except Exception as exc:
+        # Could not even connect: the whole batch goes to the retry queue
+        failed = [(message, exc) for message in batch]
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            pass
+    return failed
+
+
+def deliver(messages, workers=1, batch_size=50, retries=2):
+    """Send ``messages``; returns ``(sent_count, [(message, exc), ...])``."""
+    queue = list(messages)
+    total = len(queue)
+    failed = []
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        for attempt in range(retries + 1):
+            if not queue:
+                break
+            batches = [queue[i:i + batch_size] for i in range(0, len(queue), batch_size)]
+            failed = [item for result in pool.map(_send_batch, batches) for item in result]
+            if failed:
+                logger.warning("Mail delivery attempt %d: %d of %d failed", attempt + 1, len(failed), len(queue))
+            queue = [message for message, _ in failed]
+    return total - len(failed), failed
@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from guardsys.core import retention
+from guardsys.core.models import AuditLog
+
+
+class Command(BaseCommand):
+    help = "Переносит старые записи журнала аудита в помесячные сжатые архивы (JSONL.gz)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help="Возраст записей в днях (по умолчанию AUDIT_RETENTION_DAYS)")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Записей за одну транзакцию")
+        parser.add_argument('--dry-run', action='store_true', help="Только посчитать записи")
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else retention.retention_days()
+        older_than = timezone.now() - timedelta(days=days)
+        if options['dry_run']:
+            count = AuditLog.objects.filter(timestamp__lt=older_than).count()
+            self.stdout.write(f"К переносу: {count}")
+            return
+        moved = retention.archive(older_than, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Перенесено в архив: {moved}"))
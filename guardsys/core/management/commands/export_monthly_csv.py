@@ -1,35 +1,37 @@
-import csv
-from datetime import date
-from django.core.management.base import BaseCommand
+import gzip
+
+from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
 
-from guardsys.maintenance.models import MaintenanceEvent
+from guardsys.maintenance.exports import csv_lines, monthly_rows
 
 
 class Command(BaseCommand):
-    help = "Экспорт статистики ТО за месяц по ответственным в CSV (stdout)"
+    help = "Экспорт статистики ТО за месяц по ответственным в CSV (stdout или файл)"
 
     def add_arguments(self, parser):
         parser.add_argument('--year', type=int, default=timezone.now().year)
         parser.add_argument('--month', type=int, default=timezone.now().month)
+        parser.add_argument('--output', help="Путь к файлу; по умолчанию stdout")
+        parser.add_argument('--gzip', action='store_true', help="Сжать файл gzip (требует --output)")
+        parser.add_argument('--chunk-size', type=int, default=2000)
 
     def handle(self, *args, **options):
-        year = options['year']
-        month = options['month']
-        first = date(year, month, 1)
-        if month == 12:
-            last = date(year + 1, 1, 1) - timezone.timedelta(days=1)
-        else:
-            last = date(year, month + 1, 1) - timezone.timedelta(days=1)
-
-        qs = MaintenanceEvent.objects.select_related('object__main_responsible').all()
-        writer = csv.writer(self.stdout)
-        writer.writerow(['Ответственный', 'Объект', 'Следующее ТО', 'Просрочено'])
-        for e in qs:
-            writer.writerow([
-                e.object.main_responsible.get_full_name() or e.object.main_responsible.username,
-                e.object.name,
-                e.next_due_at,
-                'да' if e.is_overdue else 'нет'
-            ])
+        if not 1 <= options['month'] <= 12:
+            raise CommandError("Месяц должен быть от 1 до 12")
+        if options['gzip'] and not options['output']:
+            raise CommandError("--gzip требует --output")
 
+        lines = csv_lines(monthly_rows(options['year'], options['month'], chunk_size=options['chunk_size']))
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+
+        if options['gzip']:
+            fh = gzip.open(options['output'], 'wt', encoding='utf-8', newline='')
+        else:
+            fh = open(options['output'], 'w', encoding='utf-8', newline='')
+        with fh:
+            for line in lines:
+                fh.write(line)
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from guardsys.core.synthetic import generate
+
+
+class Command(BaseCommand):
+    help = "Создаёт синтетические данные (организации, пользователи, объекты, ТО, документы, аудит) для нагрузочных тестов"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--objects', type=int, default=1000)
+        parser.add_argument('--organizations', type=int, default=50)
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--documents-per-object', type=int, default=1)
+        parser.add_argument('--audit-per-object', type=int, default=2)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        counts = generate(
+            organizations=options['organizations'],
+            users=options['users'],
+            objects=options['objects'],
+            documents_per_object=options['documents_per_object'],
+            audit_per_object=options['audit_per_object'],
+            batch_size=options['batch_size'],
+            seed=options['seed'],
+        )
+        summary = ", ".join(f"{name}: {count}" for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Создано — {summary}"))
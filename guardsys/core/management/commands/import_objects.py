@@ -0,0 +1,35 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from guardsys.core.importer import ImportFormatError, import_file
+
+
+class Command(BaseCommand):
+    help = "Массовый импорт организаций, объектов и графиков ТО из CSV/XLSX"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Путь к файлу .csv или .xlsx")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Строк в одной транзакции")
+        parser.add_argument('--dry-run', action='store_true', help="Только проверить строки, ничего не записывать")
+        parser.add_argument('--user', help="Имя пользователя, от которого пишется журнал аудита")
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = get_user_model().objects.get(username=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"Пользователь {options['user']} не найден")
+        try:
+            with open(options['path'], 'rb') as fh:
+                result = import_file(fh, options['path'], user=user, batch_size=options['batch_size'],
+                                     dry_run=options['dry_run'])
+        except (OSError, ImportFormatError) as exc:
+            raise CommandError(str(exc))
+
+        for line, message in result.errors:
+            self.stderr.write(f"Строка {line}: {message}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Строк: {result.rows}; организаций: {result.organizations}; объектов: {result.objects}; "
+            f"графиков ТО: {result.events}; ошибок: {len(result.errors)}"
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from guardsys.core import search
+
+
+class Command(BaseCommand):
+    help = "Полностью перестраивает поисковый индекс по объектам охраны"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if not search.fts_available():
+            self.stdout.write(self.style.WARNING("Полнотекстовый индекс недоступен для этой БД, перестраивать нечего"))
+            return
+        total = search.rebuild_index(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Проиндексировано объектов: {total}"))
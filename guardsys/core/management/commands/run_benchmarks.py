@@ -0,0 +1,62 @@
+import json
+import platform
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from guardsys.core.benchmarks import compare, run_scenarios
+from guardsys.core.synthetic import generate
+
+
+class Command(BaseCommand):
+    help = "Замеряет время ключевых сценариев на синтетических данных разного объёма (в отдельной тестовой БД)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000', help="Количество объектов через запятую")
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--scenario', action='append', help="Запустить только указанные сценарии")
+        parser.add_argument('--output', help="JSON-файл результатов (по умолчанию benchmarks/<дата>.json)")
+        parser.add_argument('--compare', help="JSON предыдущего запуска для сравнения")
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',') if size]
+        report = {
+            'started_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'repeat': options['repeat'],
+            'sizes': {},
+        }
+
+        # Never touch the real database: run against a throwaway test DB
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            for size in sizes:
+                call_command('flush', interactive=False, verbosity=0)
+                self.stdout.write(f"{size} объектов: генерация данных…")
+                generate(objects=size, organizations=max(size // 200, 5), users=max(size // 100, 10))
+                report['sizes'][str(size)] = run_scenarios(repeat=options['repeat'], only=options['scenario'])
+                for name, result in report['sizes'][str(size)].items():
+                    self.stdout.write(f"  {name:16} {result['median_ms']:10.1f} мс  запросов: {result['queries']}")
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        output = Path(options['output'] or Path(settings.BASE_DIR) / 'benchmarks' / f"{timezone.now():%Y%m%d-%H%M%S}.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+        self.stdout.write(self.style.SUCCESS(f"Результаты сохранены в {output}"))
+
+        if options['compare']:
+            previous = json.loads(Path(options['compare']).read_text(encoding='utf-8'))
+            for size, name, before, after, ratio in compare(previous, report):
+                change = f"x{ratio:.2f}" if ratio is not None else "—"
+                self.stdout.write(f"  {size:>7} {name:16} {before:10.1f} → {after:10.1f} мс  {change}")
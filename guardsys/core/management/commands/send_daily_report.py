@@ -1,47 +1,59 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.mail import EmailMessage, send_mail
 from django.core.management.base import BaseCommand
-from django.core.mail import send_mail
-from django.contrib.auth import get_user_model
 from django.utils import timezone
-from django.db.models import Q
 
+from guardsys.core.mail import deliver
 from guardsys.maintenance.models import MaintenanceEvent
+from guardsys.maintenance.overdue import recalc_overdue
 
 
 class Command(BaseCommand):
     help = "Отправляет ежедневный e-mail отчёт по пройденным и просроченным ТО"
 
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=getattr(settings, 'DAILY_REPORT_WORKERS', 4))
+        parser.add_argument('--batch-size', type=int, default=getattr(settings, 'DAILY_REPORT_BATCH_SIZE', 50))
+        parser.add_argument('--retries', type=int, default=getattr(settings, 'DAILY_REPORT_RETRIES', 2))
+
     def handle(self, *args, **options):
         today = timezone.localdate()
+        recalc_overdue(today)
         overdue = MaintenanceEvent.objects.filter(next_due_at__lt=today)
-        normal = MaintenanceEvent.objects.filter(next_due_at__gte=today)
-
-        # Рассылка ответственным (по объектам)
-        for event in overdue.select_related('object__main_responsible'):
-            recipient = event.object.main_responsible.email or None
-            if not recipient:
-                continue
-            subject = f"Просрочено ТО по объекту: {event.object.name}"
-            body = (
-                f"Объект: {event.object.name}\n"
-                f"Адрес: {event.object.address}\n"
-                f"Следующее ТО было: {event.next_due_at}\n"
-            )
-            try:
-                send_mail(subject, body, None, [recipient], fail_silently=False)
-            except Exception as exc:
-                admin_email = [e for _, e in (getattr(__import__('django.conf').conf.settings, 'ADMINS', []) or [])]
-                if admin_email:
-                    send_mail("Ошибка доставки отчёта", str(exc), None, [admin_email[0]], fail_silently=True)
+        admin_email = [e for _, e in (getattr(settings, 'ADMINS', []) or [])]
+
+        # Рассылка ответственным: одно письмо-сводка на получателя
+        digests = defaultdict(list)
+        rows = overdue.order_by('next_due_at', 'pk').values_list(
+            'object__main_responsible__email', 'object__name', 'object__address', 'next_due_at'
+        )
+        for email, name, address, next_due_at in rows.iterator(chunk_size=2000):
+            if email:
+                digests[email].append(f"Объект: {name}\nАдрес: {address}\nСледующее ТО было: {next_due_at}\n")
+
+        messages = [
+            EmailMessage(f"Просрочено ТО по объектам: {len(blocks)}", "\n".join(blocks), None, [recipient])
+            for recipient, blocks in digests.items()
+        ]
+        sent, failed = deliver(
+            messages, workers=options['workers'], batch_size=options['batch_size'], retries=options['retries']
+        )
+        if failed and admin_email:
+            body = "\n".join(f"{message.to[0]}: {exc}" for message, exc in failed)
+            send_mail("Ошибка доставки отчёта", body, None, [admin_email[0]], fail_silently=True)
 
         # Эскалация админу: просрочка >3 дней
         escalation = overdue.filter(next_due_at__lt=today - timezone.timedelta(days=3))
-        if escalation.exists():
+        lines = [
+            f"{name} — просрочено с {next_due_at}"
+            for name, next_due_at in escalation.order_by('next_due_at', 'pk').values_list('object__name', 'next_due_at')
+        ]
+        if lines and admin_email:
             subject = "Эскалация: просрочка ТО более 3 дней"
-            lines = [f"{e.object.name} — просрочено с {e.next_due_at}" for e in escalation]
-            body = "\n".join(lines)
-            admin_email = [e for _, e in (getattr(__import__('django.conf').conf.settings, 'ADMINS', []) or [])]
-            if admin_email:
-                send_mail(subject, body, None, [admin_email[0]], fail_silently=True)
-
-        self.stdout.write(self.style.SUCCESS("Ежедневный отчёт отправлен"))
+            send_mail(subject, "\n".join(lines), None, [admin_email[0]], fail_silently=True)
 
+        self.stdout.write(self.style.SUCCESS(
+            f"Ежедневный отчёт отправлен: писем {sent}, ошибок доставки {len(failed)}"
+        ))
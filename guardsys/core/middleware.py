@@ -0,0 +1,65 @@
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from .querystats import QueryRecorder, RequestStats, budget_violations, collector, current_recorder, install_all
+
+logger = logging.getLogger('guardsys.querystats')
+
+
+class QueryStatsMiddleware:
+    """Records queries, DB time and wall time per view (see ``querystats``)."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.installed = False
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        install_all()
+        recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        self.record(request, response, recorder, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        if not self.installed:
+            # connections opened from now on are covered by connection_created;
+            # existing ones live in the thread the ORM runs in
+            await sync_to_async(install_all)()
+            self.installed = True
+        recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        self.record(request, response, recorder, time.perf_counter() - start)
+        return response
+
+    def record(self, request, response, recorder, wall_time):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else None
+        stats = RequestStats(view, request.method, request.path, response.status_code, recorder.queries, wall_time)
+        request.query_stats = stats
+        if view:
+            collector.add(stats)
+        violations = budget_violations(stats)
+        logger.log(
+            logging.WARNING if violations else logging.INFO,
+            json.dumps({**stats.as_dict(), 'violations': violations}, ensure_ascii=False),
+        )
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+FTS_TABLE = 'core_guardedobject_fts'
+
+
+def create_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "name, address, organization, notes, tokenize='unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE} (rowid, name, address, organization, notes) "
+        "SELECT o.id, REPLACE(REPLACE(o.name, 'ё', 'е'), 'Ё', 'Е'), "
+        "REPLACE(REPLACE(o.address, 'ё', 'е'), 'Ё', 'Е'), "
+        "REPLACE(REPLACE(org.name, 'ё', 'е'), 'Ё', 'Е'), "
+        "REPLACE(REPLACE(o.notes, 'ё', 'е'), 'Ё', 'Е') "
+        "FROM core_guardedobject o JOIN core_organization org ON org.id = o.organization_id"
+    )
+
+
+def drop_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
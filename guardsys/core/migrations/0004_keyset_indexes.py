@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_auditlog_json_encoder'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['timestamp', 'id'], name='auditlog_timestamp_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='guardedobject',
+            index=models.Index(fields=['name', 'id'], name='guardedobject_name_id_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['entity', 'entity_id', 'timestamp'], name='auditlog_entity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='guardedobject',
+            index=models.Index(fields=['is_deleted', 'status'], name='guardedobject_deleted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='guardedobject',
+            index=models.Index(fields=['main_responsible', 'is_deleted'], name='guardedobject_main_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='guardedobject',
+            index=models.Index(fields=['deputy_responsible', 'is_deleted'], name='guardedobject_deputy_idx'),
+        ),
+    ]
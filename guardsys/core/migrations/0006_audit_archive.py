@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True)),
+                ('path', models.CharField(max_length=255)),
+                ('entries', models.PositiveIntegerField(default=0)),
+                ('first_timestamp', models.DateTimeField(null=True)),
+                ('last_timestamp', models.DateTimeField(null=True)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-month'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AuditArchiveEntity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity', models.CharField(choices=[('USER', 'Пользователь'), ('ORGANIZATION', 'Организация'), ('OBJECT', 'Объект'), ('MAINTENANCE', 'ТО'), ('DOCUMENT', 'Документ')], max_length=32)),
+                ('entity_id', models.CharField(max_length=64)),
+                ('entries', models.PositiveIntegerField(default=0)),
+                ('archive', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entities', to='core.auditarchive')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('entity', 'entity_id', 'archive'), name='auditarchiveentity_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_audit_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='guardedobject',
+            index=models.Index(fields=['updated_at', 'id'], name='guardedobject_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:43
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Min, OuterRef, Subquery
+
+
+def backfill_next_due_at(apps, schema_editor):
+    GuardedObject = apps.get_model('core', 'GuardedObject')
+    MaintenanceEvent = apps.get_model('maintenance', 'MaintenanceEvent')
+    earliest = (
+        MaintenanceEvent.objects.filter(object=OuterRef('pk')).order_by()
+        .values('object').annotate(earliest=Min('next_due_at')).values('earliest')
+    )
+    GuardedObject.objects.update(next_due_at=Subquery(earliest))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_sync_indexes'),
+        ('maintenance', '0006_sync_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='guardedobject',
+            name='next_due_at',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_next_due_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='guardedobject',
+            index=models.Index(fields=['next_due_at', 'id'], name='guardedobject_due_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+from django.db import migrations
+
+FTS_TABLE = 'core_guardedobject_fts'
+
+
+def _fold(expression):
+    return f"REPLACE(REPLACE({expression}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def _create(schema_editor, columns, select):
+    schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+        f"{', '.join(columns)}, tokenize='unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(columns)}) "
+        f"SELECT o.id, {', '.join(select)} "
+        "FROM core_guardedobject o JOIN core_organization org ON org.id = o.organization_id"
+    )
+
+
+def add_documents_column(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    documents = (
+        "(SELECT SUBSTR(GROUP_CONCAT(d.extracted_text, CHAR(10)), 1, 1048576) FROM documents_document d "
+        "WHERE d.object_id = o.id AND d.extracted_text != '')"
+    )
+    _create(
+        schema_editor,
+        ['name', 'address', 'organization', 'notes', 'documents'],
+        [_fold('o.name'), _fold('o.address'), _fold('org.name'), _fold('o.notes'), _fold(documents)],
+    )
+
+
+def drop_documents_column(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    _create(
+        schema_editor,
+        ['name', 'address', 'organization', 'notes'],
+        [_fold('o.name'), _fold('o.address'), _fold('org.name'), _fold('o.notes')],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_object_next_due'),
+        ('documents', '0005_document_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_documents_column, drop_documents_column),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
 
 
@@ -42,21 +43,64 @@ class GuardedObject(models.Model):
     deleted_at = models.DateTimeField(null=True, blank=True)
     deleted_reason = models.TextField(blank=True)
     notes = models.TextField(blank=True)
+    # earliest MaintenanceEvent.next_due_at, see maintenance.scheduling.update_object_due_dates
+    next_due_at = models.DateField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["name", "id"], name="guardedobject_name_id_idx"),
+            models.Index(fields=["is_deleted", "status"], name="guardedobject_deleted_idx"),
+            models.Index(fields=["main_responsible", "is_deleted"], name="guardedobject_main_idx"),
+            models.Index(fields=["deputy_responsible", "is_deleted"], name="guardedobject_deputy_idx"),
+            models.Index(fields=["updated_at", "id"], name="guardedobject_updated_idx"),
+            models.Index(fields=["next_due_at", "id"], name="guardedobject_due_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Kept for the audit diff in signals, instead of re-reading the row on save
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        if kwargs.get('update_fields') is None and not self._state.adding:
+            # next_due_at is maintained by set-based UPDATEs; a form save of a
+            # stale instance must not write the old value back
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'next_due_at' and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+        # post_save receivers have seen the old values; move them forward now
+        update_fields = kwargs.get('update_fields')
+        deferred = self.get_deferred_fields()
+        saved = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+            if field.attname not in deferred and (update_fields is None or field.name in update_fields)
+        }
+        self._loaded_values = {**getattr(self, '_loaded_values', {}), **saved}
+
     def archive(self, reason: str, by_user_id: int | None = None) -> None:
         self.is_deleted = True
         self.status = self.Status.ARCHIVED
         self.deleted_at = timezone.now()
         self.deleted_reason = reason
-        self.save(update_fields=["is_deleted", "status", "deleted_at", "deleted_reason"])
+        self.save(update_fields=["is_deleted", "status", "deleted_at", "deleted_reason", "updated_at"])
 
     def restore(self) -> None:
         self.is_deleted = False
         self.status = self.Status.ACTIVE
         self.deleted_at = None
-        self.save(update_fields=["is_deleted", "status", "deleted_at"])
+        self.save(update_fields=["is_deleted", "status", "deleted_at", "updated_at"])
+        # sync clients dropped the object's schedule and documents with its
+        # tombstone; bring them back into the change feed
+        self.maintenances.update(updated_at=self.updated_at)
+        self.documents.update(updated_at=self.updated_at)
 
     def __str__(self) -> str:
         return f"{self.name} — {self.address}"
@@ -76,13 +120,49 @@ class AuditLog(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
     timestamp = models.DateTimeField(auto_now_add=True)
     message = models.TextField(blank=True)
-    before = models.JSONField(null=True, blank=True)
-    after = models.JSONField(null=True, blank=True)
+    before = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    after = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
 
     class Meta:
         ordering = ["-timestamp"]
+        indexes = [
+            models.Index(fields=["timestamp", "id"], name="auditlog_timestamp_id_idx"),
+            models.Index(fields=["entity", "entity_id", "timestamp"], name="auditlog_entity_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.timestamp:%Y-%m-%d %H:%M} {self.action} {self.entity}#{self.entity_id}"
 
+
+class AuditArchive(models.Model):
+    """One month of AuditLog moved to a gzip JSONL file (see ``retention.py``)."""
+
+    month = models.DateField(unique=True)
+    path = models.CharField(max_length=255)
+    entries = models.PositiveIntegerField(default=0)
+    first_timestamp = models.DateTimeField(null=True)
+    last_timestamp = models.DateTimeField(null=True)
+    size = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-month"]
+
+    def __str__(self) -> str:
+        return f"{self.month:%Y-%m}: {self.entries}"
+
+
+class AuditArchiveEntity(models.Model):
+    """Which archive files hold the history of an entity."""
+
+    archive = models.ForeignKey(AuditArchive, on_delete=models.CASCADE, related_name="entities")
+    entity = models.CharField(max_length=32, choices=AuditLog.Entity.choices)
+    entity_id = models.CharField(max_length=64)
+    entries = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["entity", "entity_id", "archive"], name="auditarchiveentity_uniq"),
+        ]
+
 # Create your models here.
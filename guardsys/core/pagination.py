@@ -0,0 +1,182 @@
+"""Keyset (cursor) pagination.
+
+Instead of OFFSET, a page is selected with ``WHERE (a, b) > (last_a, last_b)``
+over the queryset's ordering, so every page costs the same as the first one
+as long as an index covers the ordering. Cursors are opaque URL-safe strings.
+
+An ordering term is a field name (``'-name'``) or an ``OrderBy`` with an
+explicit NULL placement (``F('next_due_at').asc(nulls_last=True)``); only
+the latter may have NULLs in the cursor.
+"""
+import base64
+import datetime
+import json
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, OrderBy, Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder drops microseconds, which would break timestamp keys
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, prev_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def encode_cursor(direction, values):
+    raw = json.dumps([direction, values], cls=CursorEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direction, values = json.loads(raw)
+    except (ValueError, TypeError) as exc:
+        raise InvalidCursor(cursor) from exc
+    if direction not in ('next', 'prev') or not isinstance(values, list):
+        raise InvalidCursor(cursor)
+    return direction, values
+
+
+def _term(item):
+    """``(field, descending, nulls_last)`` of an ordering term; ``nulls_last`` is
+    ``None`` when the NULL placement is left to the database."""
+    if isinstance(item, OrderBy):
+        nulls = True if item.nulls_last else False if item.nulls_first else None
+        return item.expression.name, item.descending, nulls
+    return item.lstrip('-'), item.startswith('-'), None
+
+
+def _order_by(field, descending, nulls_last):
+    if nulls_last is None:
+        return f'-{field}' if descending else field
+    expression = F(field).desc if descending else F(field).asc
+    return expression(nulls_last=True) if nulls_last else expression(nulls_first=True)
+
+
+def _reversed(ordering):
+    terms = [_term(item) for item in ordering]
+    return [_order_by(field, not descending, None if nulls is None else not nulls)
+            for field, descending, nulls in terms]
+
+
+def get_ordering(queryset):
+    """The queryset's ordering as terms (see above), always ending with the pk."""
+    ordering = [
+        item if isinstance(item, OrderBy) else str(item)
+        for item in (queryset.query.order_by or queryset.model._meta.ordering)
+    ]
+    if not ordering or _term(ordering[-1])[0] not in ('pk', 'id'):
+        ordering.append('-pk' if ordering and _term(ordering[-1])[1] else 'pk')
+    return ordering
+
+
+def _to_python(model, name, value):
+    try:
+        field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return value  # annotation, e.g. a search rank
+    return field.to_python(value)
+
+
+def _after(model, ordering, values, reverse=False):
+    """Q selecting rows strictly after ``values`` in ``ordering``."""
+    condition = Q()
+    equal = Q()
+    for item, value in zip(ordering, values):
+        field, descending, nulls_last = _term(item)
+        if reverse:
+            descending = not descending
+            nulls_last = None if nulls_last is None else not nulls_last
+        value = _to_python(model, field, value)
+        if value is None:
+            # only non-NULL rows can follow a NULL, and only when NULLs come first
+            if nulls_last is False:
+                condition |= equal & Q(**{f'{field}__isnull': False})
+            equal &= Q(**{f'{field}__isnull': True})
+            continue
+        after = Q(**{f"{field}__{'lt' if descending else 'gt'}": value})
+        if nulls_last:
+            after |= Q(**{f'{field}__isnull': True})
+        condition |= equal & after
+        equal &= Q(**{field: value})
+    return condition
+
+
+def _key(obj, ordering):
+    names = [_term(item)[0] for item in ordering]
+    if isinstance(obj, dict):  # .values() rows
+        return [obj[name] for name in names]
+    return [getattr(obj, name) for name in names]
+
+
+def _prepare(queryset, cursor, ordering):
+    ordering = list(ordering or get_ordering(queryset))
+    direction, values = decode_cursor(cursor) if cursor else ('next', None)
+    if values is not None and len(values) != len(ordering):
+        raise InvalidCursor(cursor)
+
+    reverse = direction == 'prev'
+    qs = queryset.order_by(*(_reversed(ordering) if reverse else ordering))
+    if values is not None:
+        qs = qs.filter(_after(queryset.model, ordering, values, reverse=reverse))
+    return qs, ordering, reverse, values
+
+
+def _page(rows, per_page, ordering, reverse, values):
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if reverse:
+        rows.reverse()
+    if not rows:
+        return KeysetPage(rows)
+
+    has_next = has_more if not reverse else True
+    has_prev = has_more if reverse else values is not None
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor('next', _key(rows[-1], ordering)) if has_next else None,
+        prev_cursor=encode_cursor('prev', _key(rows[0], ordering)) if has_prev else None,
+    )
+
+
+def paginate(queryset, cursor=None, per_page=50, ordering=None):
+    """Return a ``KeysetPage`` of ``queryset`` starting at ``cursor``.
+
+    Raises ``InvalidCursor`` for malformed or mismatching cursors.
+    """
+    qs, ordering, reverse, values = _prepare(queryset, cursor, ordering)
+    return _page(list(qs[:per_page + 1]), per_page, ordering, reverse, values)
+
+
+async def apaginate(queryset, cursor=None, per_page=50, ordering=None):
+    """Async ``paginate``; prefetches run through ``aiterator``."""
+    qs, ordering, reverse, values = _prepare(queryset, cursor, ordering)
+    rows = [obj async for obj in qs[:per_page + 1].aiterator(chunk_size=per_page + 1)]
+    return _page(rows, per_page, ordering, reverse, values)
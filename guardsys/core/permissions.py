@@ -1,4 +1,9 @@
+from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import PermissionDenied
+from django.db.models import Q, QuerySet
+
+from .checks import is_process_local
 
 
 def check_can_edit_object(user, obj):
@@ -23,3 +28,106 @@ def ensure_can_archive(user, obj):
             return True
     raise PermissionDenied("Недостаточно прав для архивирования объекта")
 
+
+
+# Batch evaluation ---------------------------------------------------------
+#
+# For lists we need the answer for many objects at once. The rules above only
+# depend on the user and on who is responsible for an object, so per user we
+# compute the "scope": the ids the user may edit/archive, or None for "all".
+# It is memoised on the user object (i.e. per request) and, unless
+# PERMISSION_CACHE_TIMEOUT is 0, in the cache; signals drop the cached scope
+# when responsibles, role or can_soft_delete change. That drop has to reach
+# every worker, so with a per-process default cache (locmem) the scope is not
+# cached across requests at all.
+
+def _scope_cache_key(user_id):
+    return f'permission-scope:{user_id}'
+
+
+def _compute_scope(user):
+    if not getattr(user, 'is_authenticated', False):
+        return {'edit': frozenset(), 'archive': frozenset()}
+    if user.is_superuser or getattr(user, 'role', None) == 'ADMIN':
+        return {'edit': None, 'archive': None}
+    is_responsible = getattr(user, 'role', None) == 'RESPONSIBLE'
+    can_soft_delete = getattr(user, 'can_soft_delete', False)
+    own = frozenset()
+    if is_responsible or can_soft_delete:
+        from .models import GuardedObject
+
+        own = frozenset(
+            GuardedObject.objects.filter(Q(main_responsible_id=user.id) | Q(deputy_responsible_id=user.id))
+            .values_list('pk', flat=True)
+        )
+    return {
+        'edit': own if is_responsible else frozenset(),
+        'archive': own if can_soft_delete else frozenset(),
+    }
+
+
+def _cache_timeout():
+    if is_process_local('default'):
+        return 0
+    return getattr(settings, 'PERMISSION_CACHE_TIMEOUT', 300)
+
+
+def permission_scope(user):
+    scope = getattr(user, '_permission_scope', None)
+    if scope is not None:
+        return scope
+    timeout = _cache_timeout()
+    user_id = getattr(user, 'id', None)
+    if timeout and user_id:
+        scope = cache.get(_scope_cache_key(user_id))
+    if scope is None:
+        scope = _compute_scope(user)
+        if timeout and user_id:
+            cache.set(_scope_cache_key(user_id), scope, timeout)
+    user._permission_scope = scope
+    return scope
+
+
+def invalidate_permissions(user_ids):
+    cache.delete_many([_scope_cache_key(user_id) for user_id in user_ids if user_id])
+
+
+def object_permissions(user, objects):
+    """Return ``(editable_ids, archivable_ids)`` for ``objects``.
+
+    ``objects`` may be a queryset (one ``values_list`` query), model
+    instances or plain ids.
+    """
+    if isinstance(objects, QuerySet):
+        ids = set(objects.values_list('pk', flat=True))
+    else:
+        ids = {getattr(obj, 'pk', obj) for obj in objects}
+    scope = permission_scope(user)
+    editable = ids if scope['edit'] is None else ids & scope['edit']
+    archivable = ids if scope['archive'] is None else ids & scope['archive']
+    return editable, archivable
+
+
+def check_can_view_object(user, obj):
+    """Active objects are visible to everyone; archived ones to admins and their responsibles."""
+    if not getattr(user, 'is_authenticated', False):
+        return False
+    if not obj.is_deleted or user.is_superuser or getattr(user, 'role', None) == 'ADMIN':
+        return True
+    return obj.main_responsible_id == user.id or obj.deputy_responsible_id == user.id
+
+
+def visible_objects(user, prefix=''):
+    """Q limiting GuardedObjects (or relations via ``prefix``) to what ``user`` may view."""
+    if user.is_superuser or getattr(user, 'role', None) == 'ADMIN':
+        return Q()
+    return (
+        Q(**{f'{prefix}is_deleted': False})
+        | Q(**{f'{prefix}main_responsible_id': user.id})
+        | Q(**{f'{prefix}deputy_responsible_id': user.id})
+    )
+
+
+def ensure_can_view_object(user, obj):
+    if not check_can_view_object(user, obj):
+        raise PermissionDenied("Недостаточно прав для просмотра объекта")
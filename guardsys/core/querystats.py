@@ -0,0 +1,155 @@
+"""Per-view SQL query statistics.
+
+``QueryStatsMiddleware`` records, for every request, the number of queries,
+the time spent in the database, repeated query signatures (the usual N+1
+symptom) and the wall time. Results are aggregated per URL name in
+``collector`` and can be checked against ``settings.QUERY_BUDGETS``::
+
+    QUERY_BUDGETS = {'object_detail': 8}
+
+``QUERY_DUPLICATE_LIMIT`` is how often one signature may repeat within a
+request before it counts as an N+1 violation. Transaction control
+(``BEGIN``, ``SAVEPOINT`` ...) counts towards the budget but never as a
+duplicate: every write view repeats it.
+"""
+import contextvars
+import re
+import threading
+import time
+from collections import Counter, deque
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+_IN_LIST = re.compile(r'\((?:%s, )+%s\)')
+_SPACES = re.compile(r'\s+')
+_TRANSACTION = re.compile(r'\s*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE)\b', re.IGNORECASE)
+
+
+def signature(sql):
+    """SQL with variable-length IN lists collapsed, to group repeated queries."""
+    return _SPACES.sub(' ', _IN_LIST.sub('(...)', sql)).strip()
+
+
+class QueryRecorder:
+    """``connection.execute_wrapper`` hook collecting ``(sql, seconds)``."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+
+# The recorder of the current request. A context variable instead of
+# per-request ``execute_wrapper`` blocks: async views run their queries in
+# sync_to_async threads, which see the request's context but may use other
+# connection objects than the event loop.
+current_recorder = contextvars.ContextVar('query_recorder', default=None)
+
+
+def _dispatch(execute, sql, params, many, context):
+    recorder = current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install(connection):
+    if _dispatch not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_dispatch)
+
+
+def install_all():
+    for connection in connections.all():
+        install(connection)
+
+
+connection_created.connect(lambda sender, connection, **kwargs: install(connection))
+
+
+class RequestStats:
+    def __init__(self, view, method, path, status, queries, wall_time):
+        self.view = view
+        self.method = method
+        self.path = path
+        self.status = status
+        self.query_count = len(queries)
+        self.db_time = sum(duration for _, duration in queries)
+        self.wall_time = wall_time
+        counts = Counter(signature(sql) for sql, _ in queries if not _TRANSACTION.match(sql))
+        self.duplicates = [(sql, count) for sql, count in counts.most_common() if count > 1]
+
+    def as_dict(self):
+        return {
+            'view': self.view,
+            'method': self.method,
+            'path': self.path,
+            'status': self.status,
+            'queries': self.query_count,
+            'db_ms': round(self.db_time * 1000, 2),
+            'wall_ms': round(self.wall_time * 1000, 2),
+            'duplicates': [{'sql': sql, 'count': count} for sql, count in self.duplicates],
+        }
+
+
+def budget_violations(stats):
+    """Human-readable budget violations for ``stats``; empty when within budget."""
+    violations = []
+    budget = getattr(settings, 'QUERY_BUDGETS', {}).get(stats.view)
+    if budget is not None and stats.query_count > budget:
+        violations.append(f'{stats.view}: {stats.query_count} queries, budget is {budget}')
+    limit = getattr(settings, 'QUERY_DUPLICATE_LIMIT', 3)
+    for sql, count in stats.duplicates:
+        if count > limit:
+            violations.append(f'{stats.view}: query repeated {count} times (N+1?): {sql}')
+    return violations
+
+
+class Collector:
+    def __init__(self, recent=100):
+        self._lock = threading.Lock()
+        self._views = {}
+        self._recent = deque(maxlen=recent)
+
+    def add(self, stats):
+        with self._lock:
+            agg = self._views.setdefault(stats.view, {
+                'requests': 0, 'queries': 0, 'max_queries': 0, 'db_ms': 0.0, 'wall_ms': 0.0, 'n_plus_one': 0,
+            })
+            agg['requests'] += 1
+            agg['queries'] += stats.query_count
+            agg['max_queries'] = max(agg['max_queries'], stats.query_count)
+            agg['db_ms'] += stats.db_time * 1000
+            agg['wall_ms'] += stats.wall_time * 1000
+            agg['n_plus_one'] += bool(stats.duplicates)
+            self._recent.append(stats.as_dict())
+
+    def snapshot(self):
+        with self._lock:
+            views = {}
+            for view, agg in self._views.items():
+                n = agg['requests']
+                views[view] = {
+                    'requests': n,
+                    'avg_queries': round(agg['queries'] / n, 2),
+                    'max_queries': agg['max_queries'],
+                    'avg_db_ms': round(agg['db_ms'] / n, 2),
+                    'avg_wall_ms': round(agg['wall_ms'] / n, 2),
+                    'requests_with_duplicates': agg['n_plus_one'],
+                    'budget': getattr(settings, 'QUERY_BUDGETS', {}).get(view),
+                }
+            return {'views': views, 'recent': list(self._recent)}
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+            self._recent.clear()
+
+
+collector = Collector(recent=getattr(settings, 'QUERY_STATS_RECENT', 100))
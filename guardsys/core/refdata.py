@@ -0,0 +1,141 @@
+"""Cache for small, read-mostly reference tables.
+
+Periodicity templates, organizations and users are read on every object form
+and by the autocomplete endpoint. Each table has a version token in the
+cache and its data is stored under a key containing the token, so a
+save/delete signal only has to replace the token. On top of the shared cache
+every process keeps the last data it loaded per table and re-reads it only
+when the token changes: a hit costs one cache ``get`` and no unpickling.
+
+Bulk inserts (import, synthetic data) do not fire signals and call ``bump``
+themselves. The token lives ``REFDATA_VERSION_TIMEOUT`` seconds, which bounds
+how stale a table can get when a bump is missed (a per-process cache, a raw
+SQL write); a periodicity missing from the cached table is looked up in the
+database before giving up on it.
+"""
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+
+from guardsys.maintenance.models import PeriodicityTemplate
+from .models import Organization
+
+PERIODICITIES = 'periodicities'
+ORGANIZATIONS = 'organizations'
+USERS = 'users'
+
+_local = {}  # kind -> (version, data, {id: label})
+
+
+def get_cache():
+    return caches[getattr(settings, 'REFDATA_CACHE_ALIAS', 'default')]
+
+
+def _version_key(kind):
+    return f'refdata:{kind}:version'
+
+
+def _timeout():
+    return getattr(settings, 'REFDATA_VERSION_TIMEOUT', 300)
+
+
+def user_label(last_name, first_name, username):
+    name = f'{last_name} {first_name}'.strip()
+    return f'{name} ({username})' if name else username
+
+
+def _load(kind):
+    if kind == PERIODICITIES:
+        return list(PeriodicityTemplate.objects.order_by('name', 'pk'))
+    if kind == ORGANIZATIONS:
+        rows = Organization._default_manager.order_by('name', 'pk').values_list('pk', 'name', 'inn')
+        return [(pk, name, f'{name} {inn}'.lower()) for pk, name, inn in rows]
+    if kind == USERS:
+        rows = (
+            get_user_model().objects.filter(is_active=True).order_by('last_name', 'first_name', 'username')
+            .values_list('pk', 'last_name', 'first_name', 'username', 'email')
+        )
+        return [
+            (pk, user_label(last, first, username), f'{last} {first} {username} {email}'.lower())
+            for pk, last, first, username, email in rows
+        ]
+    raise KeyError(kind)
+
+
+def version(kind):
+    """The current version token of ``kind``; changes on every ``bump``."""
+    cache = get_cache()
+    token = cache.get(_version_key(kind))
+    if token is None:
+        token = uuid.uuid4().hex[:12]
+        if not cache.add(_version_key(kind), token, _timeout()):
+            token = cache.get(_version_key(kind), token)
+    return token
+
+
+def _get(kind):
+    token = version(kind)
+    local = _local.get(kind)
+    if local and local[0] == token:
+        return local
+    cache = get_cache()
+    key = f'refdata:{kind}:{token}'
+    data = cache.get(key)
+    if data is None:
+        data = _load(kind)
+        cache.set(key, data, _timeout())
+    if kind == PERIODICITIES:
+        by_id = {str(template.pk): template for template in data}
+    else:
+        by_id = {str(pk): label for pk, label, _ in data}
+    local = _local[kind] = (token, data, by_id)
+    return local
+
+
+def get(kind):
+    """The cached rows of ``kind``: templates, or ``(id, label, search text)``."""
+    return _get(kind)[1]
+
+
+def _bump_now(kinds):
+    get_cache().set_many({_version_key(kind): uuid.uuid4().hex[:12] for kind in kinds}, _timeout())
+
+
+def bump(*kinds):
+    """Invalidate the given tables (now and again after commit, as in ``fragments``)."""
+    _bump_now(kinds)
+    transaction.on_commit(lambda: _bump_now(kinds))
+
+
+def periodicities():
+    return get(PERIODICITIES)
+
+
+def periodicity(pk):
+    """The template with ``pk``, from the database if the cached table misses it."""
+    template = _get(PERIODICITIES)[2].get(str(pk))
+    if template is None and str(pk).isdigit():
+        template = PeriodicityTemplate.objects.filter(pk=pk).first()
+        if template is not None:
+            bump(PERIODICITIES)
+    return template
+
+
+def label(kind, pk):
+    """Label of one organization or user, ``None`` if unknown."""
+    return _get(kind)[2].get(str(pk))
+
+
+def search(kind, query, limit=20):
+    """Rows of ``kind`` whose name/INN/login contains every word of ``query``."""
+    words = query.lower().split()
+    results = []
+    for pk, name, text in get(kind):
+        if all(word in text for word in words):
+            results.append({'id': pk, 'text': name})
+            if len(results) >= limit:
+                break
+    return results
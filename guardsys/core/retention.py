@@ -0,0 +1,145 @@
+"""AuditLog retention: monthly compressed archives.
+
+SQLite has no table partitioning, so time buckets live outside the
+database: ``archive(older_than)`` moves entries older than the retention
+period into one gzip JSONL file per month under
+``settings.AUDIT_ARCHIVE_ROOT`` and deletes them from ``AuditLog``. A later
+run for the same month appends another gzip member to the file.
+``AuditArchive`` indexes the files and ``AuditArchiveEntity`` records which
+files mention an entity, so ``history()`` opens only those.
+
+The file is written before the rows are deleted; if a run dies in between,
+the next run archives the rows again and readers drop the duplicate ids.
+"""
+import datetime
+import gzip
+import json
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import AuditArchive, AuditArchiveEntity, AuditLog
+from .pagination import CursorEncoder
+
+FIELDS = ('id', 'action', 'entity', 'entity_id', 'user_id', 'timestamp', 'message', 'before', 'after')
+
+
+def archive_root():
+    return Path(getattr(settings, 'AUDIT_ARCHIVE_ROOT', settings.BASE_DIR / 'audit_archive'))
+
+
+def retention_days():
+    return getattr(settings, 'AUDIT_RETENTION_DAYS', 365)
+
+
+def _month(timestamp):
+    return timezone.localtime(timestamp).date().replace(day=1)
+
+
+def _append(archive_path, rows):
+    path = archive_root() / archive_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with gzip.open(path, 'at', encoding='utf-8') as fh:
+        for row in rows:
+            fh.write(json.dumps(row, cls=CursorEncoder, ensure_ascii=False, separators=(',', ':')))
+            fh.write('\n')
+    return path.stat().st_size
+
+
+def _store_month(month, rows):
+    archive, _ = AuditArchive.objects.get_or_create(month=month, defaults={'path': f'{month:%Y}/{month:%Y-%m}.jsonl.gz'})
+    size = _append(archive.path, rows)
+    stamps = [row['timestamp'] for row in rows]
+    archive.entries += len(rows)
+    archive.first_timestamp = min(filter(None, [archive.first_timestamp, *stamps]))
+    archive.last_timestamp = max(filter(None, [archive.last_timestamp, *stamps]))
+    archive.size = size
+    archive.save()
+
+    counts = defaultdict(int)
+    for row in rows:
+        counts[(row['entity'], row['entity_id'])] += 1
+    existing = {
+        (e.entity, e.entity_id): e.pk
+        for e in AuditArchiveEntity.objects.filter(archive=archive, entity_id__in={key[1] for key in counts})
+    }
+    AuditArchiveEntity.objects.bulk_create([
+        AuditArchiveEntity(archive=archive, entity=entity, entity_id=entity_id, entries=count)
+        for (entity, entity_id), count in counts.items() if (entity, entity_id) not in existing
+    ])
+    for key, pk in existing.items():
+        AuditArchiveEntity.objects.filter(pk=pk).update(entries=F('entries') + counts[key])
+
+
+def archive(older_than=None, batch_size=5000):
+    """Move entries older than ``older_than`` (a datetime) to the archive.
+
+    Defaults to ``AUDIT_RETENTION_DAYS`` ago. Returns the number of entries
+    moved.
+    """
+    older_than = older_than or timezone.now() - datetime.timedelta(days=retention_days())
+    moved = 0
+    while True:
+        rows = list(
+            AuditLog.objects.filter(timestamp__lt=older_than).order_by('timestamp', 'id').values(*FIELDS)[:batch_size]
+        )
+        if not rows:
+            return moved
+        by_month = defaultdict(list)
+        for row in rows:
+            by_month[_month(row['timestamp'])].append(row)
+        with transaction.atomic():
+            for month, month_rows in sorted(by_month.items()):
+                _store_month(month, month_rows)
+            AuditLog.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+        moved += len(rows)
+
+
+def _read(archive_obj):
+    path = archive_root() / archive_obj.path
+    if not path.exists():
+        return
+    with gzip.open(path, 'rt', encoding='utf-8') as fh:
+        for line in fh:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _to_entry(row):
+    entry = AuditLog(**{name: row[name] for name in FIELDS})
+    entry.timestamp = parse_datetime(row['timestamp'])
+    entry.archived = True
+    return entry
+
+
+def archived_history(entity, entity_id):
+    """Archived entries of one entity, newest first (unsaved AuditLog instances)."""
+    entity_id = str(entity_id)
+    archives = AuditArchive.objects.filter(entities__entity=entity, entities__entity_id=entity_id)
+    seen, entries = set(), []
+    for archive_obj in archives:
+        for row in _read(archive_obj):
+            if row['entity'] == entity and row['entity_id'] == entity_id and row['id'] not in seen:
+                seen.add(row['id'])
+                entries.append(_to_entry(row))
+    users = get_user_model().objects.in_bulk({e.user_id for e in entries if e.user_id})
+    for entry in entries:
+        entry.user = users.get(entry.user_id)
+    entries.sort(key=lambda e: (e.timestamp, e.id), reverse=True)
+    return entries
+
+
+def history(entity, entity_id):
+    """Complete history of an entity: live entries followed by archived ones."""
+    live = list(
+        AuditLog.objects.filter(entity=entity, entity_id=str(entity_id)).select_related('user')
+        .order_by('-timestamp', '-pk')
+    )
+    live_ids = {entry.pk for entry in live}
+    return live + [entry for entry in archived_history(entity, entity_id) if entry.id not in live_ids]
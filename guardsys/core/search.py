@@ -0,0 +1,203 @@
+"""Full-text search over guarded objects.
+
+On SQLite the index is an FTS5 table (``core_guardedobject_fts``) keyed by
+object id and kept in sync from signals; results are ranked with bm25.
+On PostgreSQL the tsvector is built at query time and ranked with
+``SearchRank``. Other backends fall back to ``icontains``.
+
+The text extracted from an object's documents (see
+``guardsys.documents.processing``) is searched too, so an object can be
+found by the contents of its contracts and acts.
+"""
+import re
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import Case, Exists, IntegerField, OuterRef, Q, Subquery, Value, When
+
+from guardsys.documents.models import Document
+from .models import GuardedObject, Organization
+
+FTS_TABLE = 'core_guardedobject_fts'
+FTS_COLUMNS = ('name', 'address', 'organization', 'notes', 'documents')
+DOCUMENT_TEXT_LIMIT = 1024 * 1024  # per object
+
+_fts_ready = {}
+
+
+def max_results():
+    return getattr(settings, 'SEARCH_MAX_RESULTS', 1000)
+
+
+def normalize(text):
+    # unicode61 folds case but treats "ё" as a separate letter
+    return (text or '').replace('ё', 'е').replace('Ё', 'Е')
+
+
+def tokenize(query):
+    return re.findall(r'\w+', normalize(query).lower())
+
+
+def _connection():
+    return connections[router.db_for_write(GuardedObject)]
+
+
+def fts_available(connection=None):
+    connection = connection or _connection()
+    if connection.vendor != 'sqlite':
+        return False
+    if connection.alias not in _fts_ready:
+        with connection.cursor() as cursor:
+            _fts_ready[connection.alias] = FTS_TABLE in connection.introspection.table_names(cursor)
+    return _fts_ready[connection.alias]
+
+
+def _document_texts(object_ids):
+    """``{object id: extracted text of its documents}``, capped per object."""
+    texts = {}
+    rows = (
+        Document.objects.filter(object__in=object_ids).exclude(extracted_text='')
+        .order_by('object', 'pk').values_list('object', 'extracted_text')
+    )
+    for object_id, text in rows.iterator():
+        current = texts.get(object_id, '')
+        if len(current) < DOCUMENT_TEXT_LIMIT:
+            texts[object_id] = (current + '\n' + text)[:DOCUMENT_TEXT_LIMIT]
+    return texts
+
+
+def index_objects(objects):
+    """(Re)index the given GuardedObject instances."""
+    objects = list(objects)
+    connection = _connection()
+    if not objects or not fts_available(connection):
+        return 0
+    org_names = dict(
+        Organization._default_manager.filter(pk__in={o.organization_id for o in objects}).values_list('pk', 'name')
+    )
+    texts = _document_texts([o.pk for o in objects])
+    rows = [
+        (o.pk, normalize(o.name), normalize(o.address), normalize(org_names.get(o.organization_id)),
+         normalize(o.notes), normalize(texts.get(o.pk)))
+        for o in objects
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(row[0],) for row in rows])
+        _insert_rows(cursor, rows)
+    return len(rows)
+
+
+def remove_objects(ids):
+    connection = _connection()
+    if not fts_available(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(pk,) for pk in ids])
+
+
+def rebuild_index(chunk_size=2000):
+    """Drop and refill the whole index. Returns the number of indexed objects."""
+    connection = _connection()
+    if not fts_available(connection):
+        return 0
+    qs = GuardedObject.objects.values_list('pk', 'name', 'address', 'organization__name', 'notes')
+    total = 0
+    batch = []
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        for row in qs.iterator(chunk_size=chunk_size):
+            batch.append(row)
+            if len(batch) >= chunk_size:
+                total += _insert_rows(cursor, _with_documents(batch))
+                batch = []
+        total += _insert_rows(cursor, _with_documents(batch))
+    return total
+
+
+def _with_documents(rows):
+    texts = _document_texts([row[0] for row in rows]) if rows else {}
+    return [(row[0], *(normalize(value) for value in row[1:]), normalize(texts.get(row[0]))) for row in rows]
+
+
+def _insert_rows(cursor, rows):
+    if rows:
+        placeholders = ', '.join(['%s'] * (len(FTS_COLUMNS) + 1))
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, {", ".join(FTS_COLUMNS)}) VALUES ({placeholders})', rows
+        )
+    return len(rows)
+
+
+def search(queryset, query):
+    """Filter ``queryset`` by ``query`` and order it by relevance.
+
+    Apply every other filter first: on SQLite at most ``SEARCH_MAX_RESULTS``
+    of the best matches *within the filtered queryset* are kept.
+
+    Every token is matched as a prefix, so "моск" finds "Москва". The
+    queryset is annotated with ``search_rank`` (lower is better on SQLite,
+    higher is better on PostgreSQL; ordering is applied here either way).
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return queryset
+    connection = connections[queryset.db]
+    if fts_available(connection):
+        return _search_fts(queryset, tokens, connection)
+    if connection.vendor == 'postgresql':
+        return _search_postgres(queryset, tokens)
+    condition = Q()
+    for token in tokens:
+        condition &= (
+            Q(name__icontains=token)
+            | Q(address__icontains=token)
+            | Q(organization__name__icontains=token)
+            | Q(notes__icontains=token)
+            | Exists(Document.objects.filter(object=OuterRef('pk'), extracted_text__icontains=token))
+        )
+    return queryset.filter(condition)
+
+
+def _search_fts(queryset, tokens, connection):
+    match = ' '.join(f'"{token}"*' for token in tokens)
+    # The FTS table is joined into the caller's queryset, so its filters
+    # (archived, "my", overdue) apply before the top SEARCH_MAX_RESULTS are
+    # taken; call search() after all other filters.
+    table = connection.ops.quote_name(GuardedObject._meta.db_table)
+    ids = list(
+        queryset.order_by()
+        .extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = {table}.id', f'{FTS_TABLE} MATCH %s'],
+            params=[match],
+            order_by=[f'{FTS_TABLE}.rank'],
+        )
+        .values_list('pk', flat=True)[:max_results()]
+    )
+    if not ids:
+        return queryset.none()
+    rank = Case(*[When(pk=pk, then=Value(pos)) for pos, pk in enumerate(ids)], output_field=IntegerField())
+    return queryset.filter(pk__in=ids).annotate(search_rank=rank).order_by('search_rank')
+
+
+def _search_postgres(queryset, tokens):
+    from django.contrib.postgres.aggregates import StringAgg
+    from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+    documents = (
+        Document.objects.filter(object=OuterRef('pk')).order_by().values('object')
+        .annotate(text=StringAgg('extracted_text', delimiter=' ')).values('text')
+    )
+    vector = (
+        SearchVector('name', weight='A', config='simple')
+        + SearchVector('address', 'organization__name', weight='B', config='simple')
+        + SearchVector('notes', weight='C', config='simple')
+        + SearchVector(Subquery(documents), weight='D', config='simple')
+    )
+    search_query = SearchQuery(' & '.join(f'{token}:*' for token in tokens), search_type='raw', config='simple')
+    return (
+        queryset.annotate(search_vector=vector)
+        .filter(search_vector=search_query)
+        .annotate(search_rank=SearchRank(vector, search_query))
+        .order_by('-search_rank')
+    )
@@ -1,48 +1,120 @@
-import json
-from django.db.models.signals import pre_save, post_save
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
-from .models import GuardedObject, AuditLog
+from guardsys.documents.models import Document
+from guardsys.maintenance.models import MaintenanceEvent, PeriodicityTemplate
+from .models import GuardedObject, AuditLog, Organization
+from . import audit, fragments, refdata, search, sync
+from .permissions import invalidate_permissions
 
 
-def serialize_instance(instance):
-    data = {}
-    for field in instance._meta.fields:
-        name = field.name
-        try:
-            value = getattr(instance, name)
-            if hasattr(value, 'pk'):
-                data[name] = value.pk
-            else:
-                data[name] = value
-        except Exception:
-            data[name] = None
-    return data
+@receiver(post_save, sender=GuardedObject)
+def guardobj_post_save(sender, instance: GuardedObject, created: bool, **kwargs):
+    audit.record(audit.change_entry(instance, AuditLog.Entity.OBJECT, created=created))
+
+
+@receiver(post_save, sender=GuardedObject)
+def guardobj_search_index(sender, instance: GuardedObject, update_fields=None, **kwargs):
+    if update_fields and not set(update_fields) & set(search.FTS_COLUMNS):
+        return
+    search.index_objects([instance])
+
+
+@receiver(post_delete, sender=GuardedObject)
+def guardobj_search_remove(sender, instance: GuardedObject, **kwargs):
+    search.remove_objects([instance.pk])
+
 
+@receiver(post_save, sender=Document)
+@receiver(post_delete, sender=Document)
+def document_search_index(sender, instance: Document, update_fields=None, **kwargs):
+    if update_fields is not None and 'extracted_text' not in update_fields:
+        return
+    if instance.extracted_text:
+        search.index_objects(GuardedObject.objects.filter(pk=instance.object_id))
 
-@receiver(pre_save, sender=GuardedObject)
-def guardobj_pre_save(sender, instance: GuardedObject, **kwargs):
-    if instance.pk:
-        try:
-            old = sender.objects.get(pk=instance.pk)
-            instance._before_state = serialize_instance(old)
-        except sender.DoesNotExist:
-            instance._before_state = None
-    else:
-        instance._before_state = None
+
+@receiver(post_save, sender=Organization)
+def organization_search_index(sender, instance: Organization, created: bool, **kwargs):
+    if not created:
+        search.index_objects(instance.objects.all())
+
+
+@receiver(post_save, sender=Organization)
+def organization_sync(sender, instance: Organization, created: bool, update_fields=None, **kwargs):
+    if created or (update_fields and 'name' not in update_fields):
+        return
+    sync.touch_organization(instance.pk)
+
+
+@receiver(post_save, sender=PeriodicityTemplate)
+def periodicity_sync(sender, instance: PeriodicityTemplate, created: bool, update_fields=None, **kwargs):
+    if created or (update_fields and 'name' not in update_fields):
+        return
+    sync.touch_periodicity(instance.pk)
 
 
 @receiver(post_save, sender=GuardedObject)
-def guardobj_post_save(sender, instance: GuardedObject, created: bool, **kwargs):
-    before = getattr(instance, '_before_state', None)
-    after = serialize_instance(instance)
-    AuditLog.objects.create(
-        action='created' if created else 'updated',
-        entity=AuditLog.Entity.OBJECT,
-        entity_id=str(instance.pk),
-        user=None,
-        message='',
-        before=before,
-        after=after,
+def guardobj_permissions(sender, instance: GuardedObject, created: bool, **kwargs):
+    loaded = getattr(instance, '_loaded_values', None) or {}
+    before = {loaded.get('main_responsible_id'), loaded.get('deputy_responsible_id')}
+    after = {instance.main_responsible_id, instance.deputy_responsible_id}
+    if created or before != after:
+        invalidate_permissions(before | after)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_permissions(sender, instance, **kwargs):
+    invalidate_permissions([instance.pk])
+
+
+@receiver(post_save, sender=GuardedObject)
+@receiver(post_delete, sender=GuardedObject)
+def guardobj_fragments(sender, instance: GuardedObject, **kwargs):
+    fragments.bump([instance.pk])
+
+
+@receiver(post_save, sender=MaintenanceEvent)
+@receiver(post_delete, sender=MaintenanceEvent)
+@receiver(post_save, sender=Document)
+@receiver(post_delete, sender=Document)
+def related_fragments(sender, instance, **kwargs):
+    fragments.bump([instance.object_id])
+
+
+@receiver(post_save, sender=Organization)
+def organization_fragments(sender, instance: Organization, created: bool, **kwargs):
+    if not created:
+        fragments.bump(instance.objects.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_fragments(sender, instance, created: bool, update_fields=None, **kwargs):
+    if created or (update_fields and set(update_fields) <= {'last_login', 'password'}):
+        return
+    fragments.bump(
+        GuardedObject.objects.filter(Q(main_responsible=instance) | Q(deputy_responsible=instance))
+        .values_list('pk', flat=True)
     )
 
+
+@receiver(post_save, sender=PeriodicityTemplate)
+@receiver(post_delete, sender=PeriodicityTemplate)
+def periodicity_refdata(sender, instance, **kwargs):
+    refdata.bump(refdata.PERIODICITIES)
+
+
+@receiver(post_save, sender=Organization)
+@receiver(post_delete, sender=Organization)
+def organization_refdata(sender, instance, **kwargs):
+    refdata.bump(refdata.ORGANIZATIONS)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def user_refdata(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'last_login', 'password'}:
+        return  # every login saves last_login
+    refdata.bump(refdata.USERS)
@@ -0,0 +1,133 @@
+"""Change feed for offline field clients.
+
+A client keeps an opaque token and asks for everything changed since it.
+Each feed (objects, maintenance events, documents) is read in ``(updated_at,
+id)`` order from its own index and the token stores the last position of
+every feed, so a caught-up client gets a few rows instead of the full list.
+
+Archived objects come back as tombstones (``id`` and ``deleted_at``); the
+client drops them together with their schedules and documents, which are
+not sent for archived objects. ``GuardedObject.restore`` touches those rows
+again so they reappear in the feed. The first sync (no token) skips
+tombstones altogether.
+
+Rows carry the names of their organization and periodicity template, so a
+save of either touches the dependent rows (``touch_organization``,
+``touch_periodicity``) and clients pick up the new name.
+
+Rows updated in the last ``SYNC_SETTLE_SECONDS`` are held back: a
+transaction that commits late may still write an ``updated_at`` older than
+the newest one already handed out.
+"""
+import base64
+import datetime
+import json
+
+from django.conf import settings
+from django.utils import timezone
+
+from guardsys.documents.models import Document
+from guardsys.maintenance.models import MaintenanceEvent
+from .models import GuardedObject
+from .pagination import CursorEncoder, InvalidCursor, _after
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 2000
+ORDERING = ('updated_at', 'id')
+
+OBJECT_FIELDS = {
+    'id': 'id', 'name': 'name', 'address': 'address', 'organization': 'organization_id',
+    'organization_name': 'organization__name', 'main_responsible': 'main_responsible_id',
+    'deputy_responsible': 'deputy_responsible_id', 'status': 'status',
+}
+MAINTENANCE_FIELDS = {
+    'id': 'id', 'object': 'object_id', 'periodicity': 'periodicity_id', 'periodicity_name': 'periodicity__name',
+    'last_done_at': 'last_done_at', 'next_due_at': 'next_due_at', 'is_overdue': 'is_overdue',
+}
+DOCUMENT_FIELDS = {
+    'id': 'id', 'object': 'object_id', 'original_name': 'original_name', 'content_type': 'content_type',
+    'digest': 'blob_id', 'uploaded_at': 'uploaded_at',
+}
+FEEDS = ('objects', 'maintenance', 'documents')
+
+
+def encode_token(positions):
+    raw = json.dumps(positions, cls=CursorEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    try:
+        positions = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (ValueError, TypeError) as exc:
+        raise InvalidCursor(token) from exc
+    if not isinstance(positions, dict) or set(positions) != set(FEEDS):
+        raise InvalidCursor(token)
+    for value in positions.values():
+        if value is not None and not (isinstance(value, list) and len(value) == len(ORDERING)):
+            raise InvalidCursor(token)
+    return positions
+
+
+def _read(queryset, position, until, limit, paths):
+    queryset = queryset.filter(updated_at__lte=until).order_by(*ORDERING)
+    if position is not None:
+        queryset = queryset.filter(_after(queryset.model, ORDERING, position))
+    rows = list(queryset.values(*dict.fromkeys([*paths, *ORDERING]))[:limit + 1])
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if rows:
+        position = [rows[-1][name] for name in ORDERING]
+    return rows, position, more
+
+
+def _compact(row, fields):
+    return {name: row[path] for name, path in fields.items()}
+
+
+def changes(token=None, limit=DEFAULT_LIMIT, now=None):
+    """Rows changed since ``token`` and the token to continue from.
+
+    ``more`` is set when some feed was cut at ``limit`` rows; the client
+    should ask again right away with the new token.
+    """
+    positions = decode_token(token) if token else dict.fromkeys(FEEDS)
+    initial = token is None
+    now = now or timezone.now()
+    until = now - datetime.timedelta(seconds=getattr(settings, 'SYNC_SETTLE_SECONDS', 2))
+    result = {'objects': [], 'deleted': []}
+
+    objects = GuardedObject.objects.all()
+    if initial:
+        objects = objects.filter(is_deleted=False)
+    rows, positions['objects'], more = _read(
+        objects, positions['objects'], until, limit, [*OBJECT_FIELDS.values(), 'is_deleted', 'deleted_at'],
+    )
+    for row in rows:
+        if row['is_deleted']:
+            result['deleted'].append({'id': row['id'], 'deleted_at': row['deleted_at']})
+        else:
+            result['objects'].append(_compact(row, OBJECT_FIELDS))
+
+    for name, model, fields in (('maintenance', MaintenanceEvent, MAINTENANCE_FIELDS),
+                                ('documents', Document, DOCUMENT_FIELDS)):
+        rows, positions[name], cut = _read(
+            model._default_manager.filter(object__is_deleted=False), positions[name], until, limit,
+            list(fields.values()),
+        )
+        result[name] = [_compact(row, fields) for row in rows]
+        more = more or cut
+
+    result['token'] = encode_token(positions)
+    result['more'] = more
+    return result
+
+
+def touch_organization(organization_id):
+    """Send the objects of an organization again (its name is in every row)."""
+    GuardedObject.objects.filter(organization_id=organization_id).update(updated_at=timezone.now())
+
+
+def touch_periodicity(periodicity_id):
+    """Send the maintenance events of a template again (its name is in every row)."""
+    MaintenanceEvent.objects.filter(periodicity_id=periodicity_id).update(updated_at=timezone.now())
@@ -0,0 +1,129 @@
+"""Synthetic dataset for load testing and benchmarks.
+
+Everything is inserted with ``bulk_create`` in batches, so signals do not
+fire; the search index and the dashboard summary are rebuilt once at the
+end instead.
+"""
+import random
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from guardsys.documents.models import Document
+from guardsys.maintenance import summary
+from guardsys.maintenance.models import MaintenanceEvent, PeriodicityTemplate
+from guardsys.maintenance.scheduling import update_object_due_dates
+from . import refdata, search
+from .models import AuditLog, GuardedObject, Organization
+
+CITIES = ['Москва', 'Санкт-Петербург', 'Казань', 'Тверь', 'Екатеринбург', 'Новосибирск', 'Самара']
+STREETS = ['Ленина', 'Мира', 'Советская', 'Садовая', 'Гагарина', 'Пушкина', 'Лесная', 'Заводская']
+KINDS = ['Склад', 'Офис', 'Магазин', 'Банк', 'Аптека', 'Школа', 'Завод', 'Ёлочный базар']
+EQUIPMENT = ['Пульт Орион', 'Датчики движения', 'Видеонаблюдение', 'Тревожная кнопка', 'СКУД']
+
+
+def _batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _bulk(model, rows, batch_size):
+    created = []
+    for batch in _batches(rows, batch_size):
+        created.extend(model._default_manager.bulk_create(batch, batch_size=batch_size))
+    return created
+
+
+def _guarded_object(rng, i, orgs, people):
+    deleted = rng.random() < 0.05
+    return GuardedObject(
+        name=f'{rng.choice(KINDS)} №{i}',
+        address=f'{rng.choice(CITIES)}, ул. {rng.choice(STREETS)}, {rng.randint(1, 200)}',
+        organization=rng.choice(orgs),
+        equipment=', '.join(rng.sample(EQUIPMENT, 2)),
+        main_responsible=rng.choice(people),
+        deputy_responsible=rng.choice(people) if rng.random() < 0.5 else None,
+        notes=rng.choice(['', '', 'Ключи у охраны', 'Въезд со двора']),
+        status=GuardedObject.Status.ARCHIVED if deleted else GuardedObject.Status.ACTIVE,
+        is_deleted=deleted,
+        deleted_at=timezone.now() if deleted else None,
+    )
+
+
+def generate(organizations=10, users=20, objects=1000, documents_per_object=1, audit_per_object=2,
+             batch_size=1000, seed=0):
+    """Create a dataset and return a dict of row counts per model."""
+    rng = random.Random(seed)
+    run = uuid.uuid4().hex[:8]
+    today = timezone.localdate()
+    User = get_user_model()
+    password = make_password(None)
+
+    with transaction.atomic():
+        periodicities = list(PeriodicityTemplate.objects.all()) or _bulk(PeriodicityTemplate, [
+            PeriodicityTemplate(name='Ежемесячно', kind=PeriodicityTemplate.Kind.MONTHLY, interval_days=30),
+            PeriodicityTemplate(name='Ежеквартально', kind=PeriodicityTemplate.Kind.QUARTERLY, interval_days=90),
+            PeriodicityTemplate(name='Раз в две недели', kind=PeriodicityTemplate.Kind.CUSTOM, interval_days=14),
+        ], batch_size)
+
+        orgs = _bulk(Organization, [
+            Organization(name=f'ООО «{rng.choice(KINDS)} {i}»', inn=f'{rng.randrange(10**9, 10**10)}')
+            for i in range(organizations)
+        ], batch_size)
+
+        roles = [User.Roles.RESPONSIBLE] * 6 + [User.Roles.OBSERVER] * 3 + [User.Roles.ADMIN]
+        people = _bulk(User, [
+            User(
+                username=f'synthetic-{run}-{i}',
+                email=f'synthetic-{run}-{i}@example.com',
+                first_name=rng.choice(['Иван', 'Пётр', 'Анна', 'Мария', 'Олег']),
+                last_name=rng.choice(['Иванов', 'Петров', 'Сидорова', 'Кузнецова', 'Смирнов']),
+                role=rng.choice(roles),
+                can_soft_delete=rng.random() < 0.3,
+                password=password,
+            )
+            for i in range(users)
+        ], batch_size)
+
+        counts = {'organizations': len(orgs), 'users': len(people), 'objects': 0,
+                  'maintenance': 0, 'documents': 0, 'audit': 0}
+        for start in range(0, objects, batch_size):
+            chunk = range(start, min(start + batch_size, objects))
+            objs = GuardedObject.objects.bulk_create([_guarded_object(rng, i, orgs, people) for i in chunk])
+            events = []
+            for obj in objs:
+                next_due_at = today + timedelta(days=rng.randint(-60, 90))
+                events.append(MaintenanceEvent(
+                    object=obj,
+                    periodicity=rng.choice(periodicities),
+                    last_done_at=next_due_at - timedelta(days=30),
+                    next_due_at=next_due_at,
+                    is_overdue=next_due_at < today,
+                ))
+            MaintenanceEvent.objects.bulk_create(events)
+            update_object_due_dates([obj.pk for obj in objs])
+            documents = [
+                Document(object=obj, file=f'documents/synthetic/{obj.pk}-{n}.pdf',
+                         original_name=f'Договор {n}.pdf', content_type='application/pdf')
+                for obj in objs for n in range(documents_per_object)
+            ]
+            Document.objects.bulk_create(documents)
+            audit = [
+                AuditLog(action='updated', entity=AuditLog.Entity.OBJECT, entity_id=str(obj.pk),
+                         before={'notes': ''}, after={'notes': obj.notes})
+                for obj in objs for _ in range(audit_per_object)
+            ]
+            AuditLog.objects.bulk_create(audit)
+            counts['objects'] += len(objs)
+            counts['maintenance'] += len(events)
+            counts['documents'] += len(documents)
+            counts['audit'] += len(audit)
+
+    search.rebuild_index()
+    summary.refresh()
+    refdata.bump(refdata.ORGANIZATIONS, refdata.USERS)
+    return counts
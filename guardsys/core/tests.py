@@ -1,3 +1,758 @@
-from django.test import TestCase
+import re
+from datetime import date, timedelta
+from io import BytesIO, StringIO
+from tempfile import TemporaryDirectory
+from unittest import skipUnless
 
-# Create your tests here.
+import openpyxl
+
+from django.contrib.auth import get_user_model
+from django.core import mail as outbox
+from django.core.cache import cache
+from django.core.mail import EmailMessage
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from guardsys.core.models import AuditArchive, AuditLog, GuardedObject, Organization
+from guardsys.core.pagination import paginate
+from guardsys.core import (
+    benchmarks, checks, fragments, importer, mail, refdata, retention, search, synthetic,
+)
+from guardsys.core.permissions import permission_scope
+from guardsys.core.querystats import RequestStats, budget_violations, collector
+from guardsys.documents.models import Document
+from guardsys.maintenance import summary
+from guardsys.maintenance.models import MaintenanceEvent, MaintenanceSummary, PeriodicityTemplate
+from guardsys.maintenance.overdue import recalc_overdue
+
+# "SCAN t" without "USING [COVERING] INDEX" is a full table scan. Tiny
+# bookkeeping tables are not interesting, nor is the LIMITed derived table of
+# a capped count ("subquery").
+FULL_SCAN = re.compile(r'\bSCAN (\w+)$')
+SCAN_ALLOWED = {'django_migrations', 'subquery'}
+
+
+class FixturesMixin:
+    @classmethod
+    def setUpClass(cls):
+        # the shared file cache would outlive the test database
+        cls.enterClassContext(override_settings(
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+        ))
+        cache.clear()
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.admin = User.objects.create_user('admin', 'admin@example.com', 'x', role='ADMIN', is_superuser=True)
+        cls.responsible = User.objects.create_user('resp', 'resp@example.com', 'x', role='RESPONSIBLE')
+        cls.deputy = User.objects.create_user('deputy', 'deputy@example.com', 'x', role='RESPONSIBLE')
+        org = Organization._default_manager.create(name='ООО Охрана')
+        periodicity = PeriodicityTemplate.objects.create(name='Ежемесячно')
+        today = timezone.localdate()
+        cls.objects = [
+            GuardedObject.objects.create(
+                name=f'Объект {i}',
+                address=f'Москва, ул. Ленина, {i}',
+                organization=org,
+                equipment='Пульт',
+                main_responsible=cls.responsible,
+                deputy_responsible=cls.deputy if i % 2 else None,
+            )
+            for i in range(6)
+        ]
+        for i, obj in enumerate(cls.objects):
+            MaintenanceEvent.objects.create(
+                object=obj,
+                periodicity=periodicity,
+                next_due_at=today + timedelta(days=i * 10 - 25),
+                is_overdue=i < 3,
+            )
+        # the counters are refreshed on commit, which never happens in a TestCase
+        summary.refresh()
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN is SQLite specific')
+class QueryPlanTests(FixturesMixin, TestCase):
+    """Every query issued by the hot paths must be served by an index."""
+
+    def assertNoFullScan(self, captured):
+        checked = 0
+        for query in captured:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = [row[-1] for row in cursor.fetchall()]
+            for line in plan:
+                match = FULL_SCAN.search(line)
+                if match and match.group(1) not in SCAN_ALLOWED:
+                    self.fail(f'Full scan of {match.group(1)}:\n{sql}\n' + '\n'.join(plan))
+            checked += 1
+        self.assertGreater(checked, 0)
+
+    def get(self, user, url):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return captured
+
+    def test_object_list(self):
+        self.assertNoFullScan(self.get(self.admin, reverse('object_list')))
+
+    def test_object_list_my(self):
+        self.assertNoFullScan(self.get(self.deputy, reverse('object_list') + '?my=1'))
+
+    def test_object_list_overdue(self):
+        self.assertNoFullScan(self.get(self.admin, reverse('object_list') + '?overdue=1'))
+
+    def test_object_list_by_due_date(self):
+        self.assertNoFullScan(self.get(self.admin, reverse('object_list') + '?sort=due&overdue=1'))
+
+    def test_object_list_search(self):
+        self.assertNoFullScan(self.get(self.admin, reverse('object_list') + '?q=ленин'))
+
+    def test_audit_log_entity(self):
+        url = reverse('audit_log') + f'?entity=OBJECT&entity_id={self.objects[0].pk}'
+        self.assertNoFullScan(self.get(self.admin, url))
+
+    def test_maintenance_dashboard(self):
+        self.assertNoFullScan(self.get(self.admin, reverse('maintenance_dashboard')))
+
+    def test_send_daily_report(self):
+        with CaptureQueriesContext(connection) as captured:
+            call_command('send_daily_report', stdout=StringIO())
+        self.assertNoFullScan(captured)
+
+    def test_export_monthly_csv(self):
+        today = timezone.localdate()
+        with CaptureQueriesContext(connection) as captured:
+            call_command('export_monthly_csv', year=today.year, month=today.month, stdout=StringIO())
+        self.assertNoFullScan(captured)
+
+
+class PaginationTests(FixturesMixin, TestCase):
+    def test_nulls_last_ordering(self):
+        GuardedObject.objects.filter(pk__in=[self.objects[1].pk, self.objects[4].pk]).update(next_due_at=None)
+        queryset = GuardedObject.objects.order_by(F('next_due_at').asc(nulls_last=True), 'pk')
+        expected = list(queryset.values_list('pk', flat=True))
+        self.assertEqual(expected[-2:], [self.objects[1].pk, self.objects[4].pk])
+        pages, cursor = [], None
+        while True:
+            page = paginate(queryset, cursor=cursor, per_page=2)
+            pages.append([obj.pk for obj in page])
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(sum(pages, []), expected)
+        for index in range(len(pages) - 1, 0, -1):
+            page = paginate(queryset, cursor=page.prev_cursor, per_page=2)
+            self.assertEqual([obj.pk for obj in page], pages[index - 1])
+
+    def test_sort_does_not_filter(self):
+        GuardedObject.objects.filter(pk=self.objects[1].pk).update(next_due_at=None)
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('object_list'), {'sort': 'due'})
+        self.assertEqual(len(response.context['object_list']), 6)
+        self.assertEqual(response.context['object_list'][-1], self.objects[1])
+
+
+class QueryBudgetTests(FixturesMixin, TestCase):
+    """Views must stay within settings.QUERY_BUDGETS and free of N+1 patterns."""
+
+    def assertWithinBudget(self, response):
+        self.assertLess(response.status_code, 400)
+        stats = response.wsgi_request.query_stats
+        self.assertEqual(budget_violations(stats), [])
+
+    def test_object_list(self):
+        self.client.force_login(self.admin)
+        self.assertWithinBudget(self.client.get(reverse('object_list')))
+        self.assertWithinBudget(self.client.get(reverse('object_list') + '?my=1&overdue=1'))
+
+    def test_object_detail(self):
+        self.client.force_login(self.admin)
+        self.assertWithinBudget(self.client.get(reverse('object_detail', args=[self.objects[1].pk])))
+
+    def test_maintenance_dashboard(self):
+        self.client.force_login(self.responsible)
+        response = self.client.get(reverse('maintenance_dashboard'))
+        self.assertWithinBudget(response)
+        self.assertContains(response, 'ООО Охрана')
+
+    def test_api_objects(self):
+        self.client.force_login(self.admin)
+        url = reverse('api_objects') + '?fields=name&limit=2'
+        response = self.client.get(url)
+        self.assertWithinBudget(response)
+        data = response.json()
+        self.assertEqual(set(data['results'][0]), {'id', 'name'})
+        self.assertIsNotNone(data['next_cursor'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(reverse('api_objects') + '?fields=bogus').status_code, 400)
+
+    def test_api_etag_follows_joined_names(self):
+        self.client.force_login(self.admin)
+        url = reverse('api_objects') + '?fields=name,organization_name'
+        etag = self.client.get(url)['ETag']
+        organization = self.objects[0].organization
+        organization.name = 'ООО Охрана-2'
+        organization.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['organization_name'], 'ООО Охрана-2')
+        self.assertNotIn('organization_name', self.client.get(reverse('api_objects')).json()['results'][0])
+
+    def test_api_documents_etag_follows_edits(self):
+        self.client.force_login(self.admin)
+        document = Document.objects.create(object=self.objects[0], file='documents/x.pdf', original_name='Акт.pdf')
+        url = reverse('api_documents')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        document.original_name = 'Акт приёмки.pdf'
+        document.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['original_name'], 'Акт приёмки.pdf')
+
+    def test_api_invalid_cursor(self):
+        self.client.force_login(self.admin)
+        for url in (reverse('api_objects'), reverse('api_maintenance'), reverse('api_sync')):
+            response = self.client.get(url, {'cursor': 'bogus', 'token': 'bogus'})
+            self.assertEqual(response.status_code, 400, url)
+            self.assertIn('error', response.json())
+
+    def test_object_edit_form(self):
+        self.client.force_login(self.admin)
+        url = reverse('object_edit', args=[self.objects[1].pk])
+        self.client.get(url)
+        get_user_model().objects.bulk_create([get_user_model()(username=f'user{i}') for i in range(50)])
+        refdata.bump(refdata.USERS)
+        response = self.client.get(url)
+        self.assertWithinBudget(response)
+        # three selects with the empty and the chosen option, plus the periodicity select
+        self.assertEqual(response.content.decode().count('<option'), 8)
+        results = self.client.get(reverse('autocomplete', args=['users']), {'q': 'user4'}).json()['results']
+        self.assertEqual(len(results), 11)
+
+    def test_upload_document(self):
+        self.client.force_login(self.responsible)
+        upload = SimpleUploadedFile('manual.txt', b'manual', content_type='text/plain')
+        url = reverse('upload_document', args=[self.objects[0].pk])
+        with self.settings(MEDIA_ROOT=self.enterContext(TemporaryDirectory())):
+            self.assertWithinBudget(self.client.post(url, {'file': upload}))
+
+    def test_archive_and_restore(self):
+        self.client.force_login(self.admin)
+        url = reverse('object_archive', args=[self.objects[1].pk])
+        self.assertWithinBudget(self.client.post(url, {'reason': 'Снят с охраны'}))
+        self.assertWithinBudget(self.client.post(reverse('object_restore', args=[self.objects[1].pk])))
+
+    def test_stats_endpoint(self):
+        collector.reset()
+        self.client.force_login(self.admin)
+        self.client.get(reverse('object_list'))
+        data = self.client.get(reverse('query_stats')).json()
+        self.assertEqual(data['views']['object_list']['requests'], 1)
+        self.assertEqual(data['views']['object_list']['budget'], 8)
+
+    def test_repeated_queries_are_flagged(self):
+        sql = 'SELECT * FROM "maintenance_maintenanceevent" WHERE "object_id" = %s'
+        stats = RequestStats('object_list', 'GET', '/', 200, [(sql, 0.001)] * 5, 0.01)
+        self.assertEqual(stats.duplicates, [(sql, 5)])
+        self.assertEqual(len(budget_violations(stats)), 1)
+
+    def test_transaction_control_is_not_a_duplicate(self):
+        queries = [('BEGIN', 0), ('SAVEPOINT "s1_x1"', 0), ('RELEASE SAVEPOINT "s1_x1"', 0), ('COMMIT', 0)] * 5
+        stats = RequestStats('object_archive', 'POST', '/', 302, queries, 0.01)
+        self.assertEqual(stats.duplicates, [])
+        self.assertEqual(stats.query_count, 20)
+
+
+class AsyncViewTests(FixturesMixin, TestCase):
+    async def test_object_list_and_detail(self):
+        await self.async_client.aforce_login(self.admin)
+        response = await self.async_client.get(reverse('object_list') + '?overdue=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['objects']), 3)
+        self.assertEqual(response.context['total'], 3)
+        self.assertContains(response, 'Найдено объектов: 3')
+        response = await self.async_client.get(reverse('object_list') + '?cursor=bogus')
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.get(reverse('object_detail', args=[self.objects[2].pk]))
+        self.assertContains(response, self.objects[2].name)
+        response = await self.async_client.get(reverse('object_detail', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_login_required(self):
+        response = await self.async_client.get(reverse('object_list'))
+        self.assertEqual(response.status_code, 302)
+
+
+class RefdataTests(FixturesMixin, TestCase):
+    def test_create_with_template_missing_from_cache(self):
+        self.client.force_login(self.admin)
+        refdata.periodicities()
+        # bulk_create sends no signal, so the cached table is stale
+        template, = PeriodicityTemplate.objects.bulk_create([PeriodicityTemplate(name='Ежеквартально')])
+        response = self.client.post(reverse('object_create'), {
+            'name': 'Новый объект', 'address': 'Москва', 'equipment': 'Пульт',
+            'organization': self.objects[0].organization_id,
+            'main_responsible': self.responsible.pk, 'periodicity_id': template.pk,
+        })
+        self.assertEqual(response.status_code, 302)
+        obj = GuardedObject.objects.get(name='Новый объект')
+        self.assertTrue(MaintenanceEvent.objects.filter(object=obj, periodicity=template).exists())
+        self.assertIn(template, refdata.periodicities())
+
+
+class FragmentCacheTests(FixturesMixin, TestCase):
+    """Repeat object detail views are served from versioned fragments."""
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+        self.url = reverse('object_detail', args=[self.objects[1].pk])
+
+    def get(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_repeat_view_skips_object_queries(self):
+        self.get()
+        with CaptureQueriesContext(connection) as captured:
+            self.get()
+        tables = ('core_guardedobject', 'maintenance_maintenanceevent', 'documents_document')
+        self.assertEqual([q['sql'] for q in captured if any(t in q['sql'] for t in tables)], [])
+
+    def test_invalidated_by_related_changes(self):
+        self.get()
+        obj = self.objects[1]
+        obj.name = 'Переименованный объект'
+        obj.save()
+        self.assertContains(self.get(), 'Переименованный объект')
+        Document.objects.create(object=obj, file='documents/x.pdf', original_name='Акт.pdf')
+        self.assertContains(self.get(), 'Акт.pdf')
+        MaintenanceEvent.objects.filter(object=obj).delete()
+        self.assertNotContains(self.get(), 'В норме')
+
+    def test_invalidated_by_responsible_rename(self):
+        self.get()
+        responsible = self.objects[1].main_responsible
+        responsible.last_name = 'Переименованный'
+        responsible.save()
+        self.assertContains(self.get(), 'Переименованный')
+
+    def test_bulk_updates_bump_every_object(self):
+        before = fragments.version(self.objects[4].pk)
+        MaintenanceEvent.objects.update(is_overdue=False)
+        recalc_overdue(full=True)
+        self.assertNotEqual(fragments.version(self.objects[4].pk), before)
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class SyncFeedTests(FixturesMixin, TestCase):
+    def sync(self, token=''):
+        response = self.client.get(reverse('api_sync'), {'token': token})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_changes_since_token(self):
+        self.client.force_login(self.responsible)
+        data = self.sync()
+        self.assertEqual(len(data['objects']), GuardedObject.objects.filter(is_deleted=False).count())
+        self.assertEqual(self.sync(data['token'])['objects'], [])
+
+        self.objects[1].archive('Снят с охраны')
+        data = self.sync(data['token'])
+        self.assertEqual([row['id'] for row in data['deleted']], [self.objects[1].pk])
+
+        self.objects[1].restore()
+        data = self.sync(data['token'])
+        self.assertEqual([row['id'] for row in data['objects']], [self.objects[1].pk])
+        self.assertEqual([row['object'] for row in data['maintenance']], [self.objects[1].pk])
+
+    def test_renames_resend_dependent_rows(self):
+        self.client.force_login(self.responsible)
+        token = self.sync()['token']
+        organization = self.objects[0].organization
+        organization.name = 'ООО Охрана-2'
+        organization.save()
+        periodicity = PeriodicityTemplate.objects.get()
+        periodicity.name = 'Раз в месяц'
+        periodicity.save()
+        data = self.sync(token)
+        self.assertEqual({row['organization_name'] for row in data['objects']}, {'ООО Охрана-2'})
+        self.assertEqual(len(data['objects']), len(self.objects))
+        self.assertEqual({row['periodicity_name'] for row in data['maintenance']}, {'Раз в месяц'})
+        self.assertEqual(len(data['maintenance']), len(self.objects))
+
+    def test_offline_mark_done_is_idempotent(self):
+        self.client.force_login(self.responsible)
+        done_at = (timezone.localdate() - timedelta(days=1)).isoformat()
+        body = {'actions': [{'id': 'a1', 'object': self.objects[1].pk, 'done_at': done_at},
+                            {'id': 'a2', 'object': 0, 'done_at': done_at}]}
+        url = reverse('api_sync_mark_done')
+        results = self.client.post(url, body, content_type='application/json').json()['results']
+        self.assertEqual(results, {'a1': 'ok', 'a2': 'not_found'})
+        results = self.client.post(url, body, content_type='application/json').json()['results']
+        self.assertEqual(results['a1'], 'skipped')
+
+
+@override_settings(SEARCH_MAX_RESULTS=3)
+class SearchTests(FixturesMixin, TestCase):
+    def found(self, user, query):
+        self.client.force_login(user)
+        response = self.client.get(reverse('object_list') + query)
+        return sorted(obj.pk for obj in response.context['objects'])
+
+    def test_filters_apply_before_the_result_limit(self):
+        for obj in self.objects[:4]:
+            obj.archive('Снят с охраны')
+        self.assertEqual(self.found(self.admin, '?q=ленина'), [self.objects[4].pk, self.objects[5].pk])
+
+    def test_my_objects_within_limit(self):
+        deputy_objects = [obj.pk for obj in self.objects if obj.deputy_responsible_id == self.deputy.pk]
+        self.assertEqual(self.found(self.deputy, '?q=москва&my=1'), deputy_objects)
+
+    def test_prefix_and_yo_folding(self):
+        self.objects[2].name = 'Склад «Берёзка»'
+        self.objects[2].save()
+        self.assertEqual(self.found(self.admin, '?q=березк'), [self.objects[2].pk])
+        self.assertEqual(self.found(self.admin, '?q=несуществующее'), [])
+
+    def test_extracted_document_text(self):
+        document = Document.objects.create(object=self.objects[3], file='documents/x.pdf', original_name='Договор.pdf')
+        document.extracted_text = 'Договор на монтаж извещателей'
+        document.save(update_fields=['extracted_text'])
+        self.assertEqual(self.found(self.admin, '?q=извещател'), [self.objects[3].pk])
+        document.delete()
+        search.rebuild_index()
+        self.assertEqual(self.found(self.admin, '?q=извещател'), [])
+
+
+class ImporterTests(FixturesMixin, TestCase):
+    header = 'organization;inn;name;address;main_responsible;periodicity;next_due_at\n'
+
+    def run_import(self, lines, **kwargs):
+        data = (self.header + '\n'.join(lines)).encode()
+        return importer.import_file(BytesIO(data), 'objects.csv', user=self.admin, batch_size=1, **kwargs)
+
+    def test_organizations_are_matched_by_inn(self):
+        org = self.objects[0].organization
+        Organization._default_manager.filter(pk=org.pk).update(inn='7701000001')
+        result = self.run_import([
+            'Охрана (другое название);7701000001;Склад;Тверь;resp;Ежемесячно;2030-01-31',
+            'ООО Новая;7702000002;Офис;Тула;resp@example.com;;',
+            'ооо новая;7702000002;Офис 2;Тула;resp;;',
+        ])
+        self.assertEqual(result.errors, [])
+        self.assertEqual((result.objects, result.organizations, result.events), (3, 1, 1))
+        self.assertEqual(GuardedObject.objects.get(name='Склад').organization_id, org.pk)
+        self.assertEqual(
+            GuardedObject.objects.get(name='Офис').organization_id,
+            GuardedObject.objects.get(name='Офис 2').organization_id,
+        )
+        self.assertEqual(str(GuardedObject.objects.get(name='Склад').next_due_at), '2030-01-31')
+
+    def test_duplicates_across_batches_and_in_the_database(self):
+        result = self.run_import([
+            'ООО Охрана;;объект 1;москва, ул. ленина, 1;resp;;',
+            'ООО Новая;;Офис;Тула;resp;;',
+            'ООО Новая;;Офис;Тула;resp;;',
+            'ООО Новая;;Склад;Тула;nobody;;',
+        ])
+        self.assertEqual(result.objects, 1)
+        self.assertEqual([line for line, _ in result.errors], [2, 4, 5])
+        self.assertIn('nobody', result.errors[2][1])
+
+    def test_dry_run_writes_nothing(self):
+        before = GuardedObject.objects.count()
+        result = self.run_import([
+            'ООО Новая;;Офис;Тула;resp;;',
+            'ООО Новая;;Офис;Тула;resp;;',
+        ], dry_run=True)
+        self.assertEqual([line for line, _ in result.errors], [3])
+        self.assertEqual(GuardedObject.objects.count(), before)
+        self.assertFalse(Organization._default_manager.filter(name='ООО Новая').exists())
+        self.assertFalse(AuditLog.objects.filter(message='Импорт').exists())
+
+    def test_xlsx(self):
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(['Организация', 'ИНН', 'Название', 'Адрес', 'Ответственный', 'Периодичность', 'Следующее ТО'])
+        sheet.append(['ООО Новая', 7702000002, 'Офис', 'Тула', 'resp', 'Ежемесячно', date(2030, 1, 31)])
+        sheet.append([None] * 7)
+        sheet.append(['ООО Новая', 7702000002, 'Склад', 'Тула', 'nobody', None, None])
+        data = BytesIO()
+        workbook.save(data)
+        data.seek(0)
+        result = importer.import_file(data, 'objects.xlsx', user=self.admin)
+        self.assertEqual((result.objects, result.organizations, result.events), (1, 1, 1))
+        self.assertEqual([line for line, _ in result.errors], [4])
+        obj = GuardedObject.objects.get(name='Офис')
+        self.assertEqual((obj.organization.inn, str(obj.next_due_at)), ('7702000002', '2030-01-31'))
+
+
+class AuditBufferTests(FixturesMixin, TestCase):
+    def rename(self, obj, name):
+        obj.name = name
+        obj.save()
+
+    def logged_names(self):
+        entries = AuditLog.objects.filter(entity=AuditLog.Entity.OBJECT, action='updated').order_by('pk')
+        return [entry.after['name'] for entry in entries]
+
+    def test_inner_rollback_drops_its_entries(self):
+        AuditLog.objects.all().delete()
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            self.rename(self.objects[0], 'Первый')
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.rename(self.objects[1], 'Откат')
+                raise RuntimeError
+            self.rename(self.objects[2], 'Третий')
+            self.assertEqual(AuditLog.objects.count(), 0)
+        self.assertEqual(self.logged_names(), ['Первый', 'Третий'])
+
+    def test_inner_commit_waits_for_the_outer_transaction(self):
+        AuditLog.objects.all().delete()
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            with transaction.atomic():
+                self.rename(self.objects[0], 'Внутри')
+            self.rename(self.objects[1], 'Снаружи')
+        self.assertEqual(self.logged_names(), ['Внутри', 'Снаружи'])
+
+
+class CacheCheckTests(SimpleTestCase):
+    def ids(self, **cache):
+        with self.settings(CACHES={'default': cache}, DEBUG=False):
+            return [message.id for message in checks.check_shared_caches(None) + checks.check_cache_size(None)]
+
+    def test_cache_checks(self):
+        filebased = 'django.core.cache.backends.filebased.FileBasedCache'
+        self.assertEqual(self.ids(BACKEND='django.core.cache.backends.locmem.LocMemCache'), ['guardsys.W001'] * 2)
+        self.assertEqual(self.ids(BACKEND=filebased, LOCATION='/tmp/x'), ['guardsys.W002'])
+        self.assertEqual(self.ids(BACKEND=filebased, LOCATION='/tmp/x', OPTIONS={'MAX_ENTRIES': 50000}), [])
+
+
+class PermissionCacheTests(FixturesMixin, TestCase):
+    def scope_is_cached(self):
+        user = get_user_model().objects.get(pk=self.responsible.pk)
+        permission_scope(user)
+        return cache.get(f'permission-scope:{user.pk}') is not None
+
+    def test_not_cached_in_a_per_process_cache(self):
+        self.assertFalse(self.scope_is_cached())
+
+    def test_cached_and_invalidated_in_a_shared_cache(self):
+        location = self.enterContext(TemporaryDirectory())
+        with self.settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location,
+        }}):
+            self.assertTrue(self.scope_is_cached())
+            self.objects[1].main_responsible = self.admin
+            self.objects[1].save()
+            self.assertIsNone(cache.get(f'permission-scope:{self.responsible.pk}'))
+
+
+class BulkActionTests(FixturesMixin, TestCase):
+    def post(self, name, data, **kwargs):
+        return self.client.post(reverse(name), data, **kwargs)
+
+    def test_mark_done_outcomes(self):
+        self.client.force_login(self.deputy)
+        ids = [self.objects[0].pk, self.objects[1].pk, 99999]
+        response = self.post('objects_bulk_mark_done', {'ids': ','.join(map(str, ids))})
+        self.assertEqual(response.json()['results'], {
+            str(ids[0]): 'forbidden', str(ids[1]): 'ok', '99999': 'not_found',
+        })
+        event = MaintenanceEvent.objects.get(object=self.objects[1])
+        self.assertEqual(event.last_done_at, timezone.localdate())
+        self.assertFalse(event.is_overdue)
+        # replayed batches do not move the schedule again
+        response = self.post('objects_bulk_mark_done', {'ids': ids[1]})
+        self.assertEqual(response.json()['counts'], {'skipped': 1})
+
+    def test_single_view_marks_every_schedule(self):
+        obj = self.objects[0]
+        MaintenanceEvent.objects.create(object=obj, periodicity=PeriodicityTemplate.objects.get(),
+                                        next_due_at=timezone.localdate())
+        self.client.force_login(self.responsible)
+        url = reverse('mark_maintenance_done', args=[obj.pk])
+        self.assertEqual(self.client.get(url).status_code, 405)
+        self.assertRedirects(self.client.post(url), reverse('object_detail', args=[obj.pk]))
+        done = MaintenanceEvent.objects.filter(object=obj).values_list('last_done_at', flat=True)
+        self.assertEqual(list(done), [timezone.localdate()] * 2)
+        self.client.force_login(self.deputy)
+        self.assertEqual(self.client.post(url).status_code, 403)
+
+    def test_archive_organization_and_restore(self):
+        self.client.force_login(self.admin)
+        organization = self.objects[0].organization_id
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post('objects_bulk_archive', {'organization': organization, 'reason': 'Расторгнут'},
+                                 content_type='application/json')
+        self.assertEqual(response.json()['counts'], {'ok': 6})
+        self.assertFalse(GuardedObject.objects.filter(is_deleted=False).exists())
+        self.assertEqual(AuditLog.objects.filter(action='archived').count(), 6)
+        response = self.post('objects_bulk_restore', {'ids': [self.objects[0].pk, self.objects[1].pk]})
+        self.assertEqual(response.json()['counts'], {'ok': 2})
+        self.assertEqual(GuardedObject.objects.filter(is_deleted=False).count(), 2)
+
+    def test_malformed_params(self):
+        self.client.force_login(self.admin)
+        for body in ({'ids': '1,2'}, {'ids': [{'id': 1}]}, {'organization': 'ООО'}, [1, 2]):
+            response = self.post('objects_bulk_archive', body, content_type='application/json')
+            self.assertEqual(response.status_code, 400, body)
+        response = self.post('objects_bulk_archive', b'{', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.post('objects_bulk_archive', {'organization': 'x'}).status_code, 400)
+        self.assertFalse(GuardedObject.objects.filter(is_deleted=True).exists())
+
+
+class AuditRetentionTests(FixturesMixin, TestCase):
+    def setUp(self):
+        self.enterContext(self.settings(AUDIT_ARCHIVE_ROOT=self.enterContext(TemporaryDirectory())))
+        AuditLog.objects.all().delete()
+
+    def log(self, days_ago, name):
+        entry = AuditLog.objects.create(
+            action='updated', entity=AuditLog.Entity.OBJECT, entity_id=str(self.objects[0].pk),
+            user=self.responsible, before={'name': 'Старое'}, after={'name': name},
+        )
+        AuditLog.objects.filter(pk=entry.pk).update(timestamp=timezone.now() - timedelta(days=days_ago))
+        return entry.pk
+
+    def archive(self, *args):
+        out = StringIO()
+        call_command('archive_audit_log', '--days', '365', *args, stdout=out)
+        return out.getvalue()
+
+    def test_round_trip(self):
+        ids = [self.log(days_ago, name) for days_ago, name in ((460, 'Первое'), (400, 'Второе'), (10, 'Новое'))]
+        self.assertIn('К переносу: 2', self.archive('--dry-run'))
+        self.assertIn('Перенесено в архив: 2', self.archive('--batch-size', '1'))
+        self.assertEqual(list(AuditLog.objects.values_list('pk', flat=True)), [ids[2]])
+        self.assertEqual(AuditArchive.objects.count(), 2)
+
+        entries = retention.history(AuditLog.Entity.OBJECT, self.objects[0].pk)
+        self.assertEqual([entry.pk for entry in entries], ids[::-1])
+        self.assertEqual([getattr(entry, 'archived', False) for entry in entries], [False, True, True])
+        self.assertEqual(entries[1].after, {'name': 'Второе'})
+        self.assertEqual(entries[1].user, self.responsible)
+        self.assertEqual(retention.archived_history(AuditLog.Entity.OBJECT, self.objects[1].pk), [])
+
+    def test_later_runs_append_to_the_month(self):
+        first = self.log(430, 'Первое')
+        self.archive()
+        second = self.log(430, 'Второе')
+        self.archive()
+        archive = AuditArchive.objects.get()
+        self.assertEqual(archive.entries, 2)
+        entries = retention.archived_history(AuditLog.Entity.OBJECT, self.objects[0].pk)
+        self.assertEqual({entry.pk for entry in entries}, {first, second})
+
+
+class FlakyBackend(EmailBackend):
+    """locmem backend that counts connections and fails recipients listed in ``failures``
+    (``n`` times each, ``None`` for always)."""
+
+    opened = 0
+    failures = {}
+
+    def open(self):
+        FlakyBackend.opened += 1
+        return super().open()
+
+    def send_messages(self, messages):
+        for message in messages:
+            left = self.failures.get(message.to[0], 0)
+            if left is None or left > 0:
+                if left:
+                    self.failures[message.to[0]] = left - 1
+                raise ConnectionError(f'rejected {message.to[0]}')
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND='guardsys.core.tests.FlakyBackend', ADMINS=[('Админ', 'admin@example.com')])
+class DailyReportTests(FixturesMixin, TestCase):
+    def setUp(self):
+        FlakyBackend.opened, FlakyBackend.failures = 0, {}
+
+    def report(self, *args):
+        out = StringIO()
+        call_command('send_daily_report', '--workers', '1', *args, stdout=out)
+        return out.getvalue()
+
+    def sent_to(self, subject_start):
+        return sorted(m.to[0] for m in outbox.outbox if m.subject.startswith(subject_start))
+
+    def test_one_digest_per_recipient(self):
+        GuardedObject.objects.filter(pk=self.objects[1].pk).update(main_responsible=self.deputy)
+        self.assertIn('писем 2, ошибок доставки 0', self.report())
+        digests = {m.to[0]: m for m in outbox.outbox if m.subject.startswith('Просрочено')}
+        self.assertEqual(sorted(digests), ['deputy@example.com', 'resp@example.com'])
+        self.assertEqual(digests['resp@example.com'].subject, 'Просрочено ТО по объектам: 2')
+        self.assertEqual(digests['resp@example.com'].body.count('Объект:'), 2)
+        # all three are overdue by more than three days
+        escalation, = [m for m in outbox.outbox if m.subject.startswith('Эскалация')]
+        self.assertEqual(escalation.to, ['admin@example.com'])
+        self.assertEqual(len(escalation.body.splitlines()), 3)
+
+    def test_failed_messages_are_retried(self):
+        GuardedObject.objects.filter(pk=self.objects[1].pk).update(main_responsible=self.deputy)
+        FlakyBackend.failures = {'deputy@example.com': 1}
+        with self.assertLogs('guardsys.core.mail', 'WARNING') as logs:
+            self.assertIn('писем 2, ошибок доставки 0', self.report())
+        self.assertEqual(len(logs.output), 1)
+        self.assertEqual(self.sent_to('Просрочено'), ['deputy@example.com', 'resp@example.com'])
+        self.assertFalse(self.sent_to('Ошибка доставки'))
+
+    def test_undeliverable_messages_are_reported(self):
+        FlakyBackend.failures = {'resp@example.com': None}
+        with self.assertLogs('guardsys.core.mail', 'WARNING') as logs:
+            self.assertIn('писем 0, ошибок доставки 1', self.report('--retries', '1'))
+        self.assertEqual(len(logs.output), 2)
+        self.assertEqual(self.sent_to('Просрочено'), [])
+        report, = [m for m in outbox.outbox if m.subject == 'Ошибка доставки отчёта']
+        self.assertIn('resp@example.com: rejected resp@example.com', report.body)
+
+    def test_batches_share_a_connection(self):
+        messages = [EmailMessage('Тема', 'Текст', None, [f'user{i}@example.com']) for i in range(5)]
+        FlakyBackend.failures = {'user3@example.com': 1}
+        with self.assertLogs('guardsys.core.mail', 'WARNING'):
+            sent, failed = mail.deliver(messages, workers=2, batch_size=2)
+        self.assertEqual((sent, failed), (5, []))
+        # three batches, then one retry batch for the failed message
+        self.assertEqual(FlakyBackend.opened, 4)
+        self.assertEqual(len(outbox.outbox), 5)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class BenchmarkTests(TestCase):
+    def test_small_run(self):
+        cache.clear()
+        counts = synthetic.generate(organizations=3, users=5, objects=30, batch_size=7)
+        self.assertEqual((counts['objects'], counts['maintenance'], counts['documents']), (30, 30, 30))
+        active = GuardedObject.objects.filter(is_deleted=False).count()
+        for scope in MaintenanceSummary.Scope:
+            rows = MaintenanceSummary.objects.filter(scope=scope)
+            self.assertEqual(sum(row.active for row in rows), active, scope)
+
+        results = benchmarks.run_scenarios(repeat=1)
+        self.assertIn('dashboard', results)
+        self.assertTrue(all(result['queries'] > 0 for result in results.values()))
+        previous = {'sizes': {'30': {'list': {'median_ms': 1.0}}}}
+        comparison = list(benchmarks.compare(previous, {'sizes': {'30': results}}))
+        self.assertEqual([(size, name) for size, name, *_ in comparison], [('30', 'list')])
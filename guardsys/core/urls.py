@@ -3,13 +3,33 @@ from . import views
 
 
 urlpatterns = [
-    path('', views.ObjectListView.as_view(), name='object_list'),
+    path('', views.AsyncObjectListView.as_view(), name='object_list'),
     path('objects/create/', views.ObjectCreateView.as_view(), name='object_create'),
-    path('objects/<int:pk>/', views.ObjectDetailView.as_view(), name='object_detail'),
+    path('objects/import/', views.object_import, name='object_import'),
+    path('autocomplete/<slug:kind>/', views.autocomplete, name='autocomplete'),
+    path('objects/bulk/archive/', views.objects_bulk_archive, name='objects_bulk_archive'),
+    path('objects/bulk/restore/', views.objects_bulk_restore, name='objects_bulk_restore'),
+    path('objects/bulk/mark_done/', views.objects_bulk_mark_done, name='objects_bulk_mark_done'),
+    path('objects/<int:pk>/', views.AsyncObjectDetailView.as_view(), name='object_detail'),
     path('objects/<int:pk>/edit/', views.ObjectUpdateView.as_view(), name='object_edit'),
     path('objects/<int:pk>/archive/', views.object_archive, name='object_archive'),
     path('objects/<int:pk>/restore/', views.object_restore, name='object_restore'),
     path('objects/<int:pk>/mark_done/', views.mark_maintenance_done, name='mark_maintenance_done'),
     path('objects/<int:object_id>/upload/', views.upload_document, name='upload_document'),
+    path('objects/<int:object_id>/uploads/', views.upload_session_start, name='upload_session_start'),
+    path('uploads/<uuid:session_id>/', views.upload_session, name='upload_session'),
+    path('uploads/<uuid:session_id>/finalize/', views.upload_session_finalize, name='upload_session_finalize'),
+    path('documents/<int:pk>/download/', views.download_document, name='document_download'),
+    path('documents/<int:pk>/thumbnail/', views.document_thumbnail, name='document_thumbnail'),
+    path('api/objects/', views.api_objects, name='api_objects'),
+    path('api/objects/<int:pk>/', views.api_object, name='api_object'),
+    path('api/maintenance/', views.api_maintenance, name='api_maintenance'),
+    path('api/documents/', views.api_documents, name='api_documents'),
+    path('api/sync/', views.api_sync, name='api_sync'),
+    path('api/sync/mark-done/', views.api_sync_mark_done, name='api_sync_mark_done'),
+    path('stats/queries/', views.query_stats, name='query_stats'),
+    path('audit/', views.AuditLogListView.as_view(), name='audit_log'),
+    path('maintenance/dashboard/', views.maintenance_dashboard, name='maintenance_dashboard'),
+    path('maintenance/export.csv', views.export_monthly_csv, name='maintenance_export'),
 ]
 
@@ -1,70 +1,217 @@
+import inspect
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import require_POST
 from django.views.generic import ListView, DetailView, CreateView, UpdateView
 from django.urls import reverse_lazy
-from django.db.models import Q
+from django.db.models import Exists, F, OuterRef, Prefetch, Q
 
-from .models import GuardedObject, Organization
+from .models import AuditLog, GuardedObject, Organization
 from guardsys.maintenance.models import MaintenanceEvent
-from guardsys.maintenance.models import PeriodicityTemplate
 from .forms import GuardedObjectForm
-from .permissions import ensure_can_edit_object, ensure_can_archive
-from guardsys.documents.views import upload_document  # re-export for url include
+from .permissions import ensure_can_edit_object, ensure_can_archive, object_permissions, permission_scope
+from . import bulk, fragments, refdata, retention, search as object_search
+from .importer import ImportFormatError, import_file
+from .pagination import InvalidCursor, apaginate, paginate
+from .querystats import collector
+from guardsys.documents.views import (  # re-export for url include
+    upload_document, upload_session_start, upload_session, upload_session_finalize, download_document,
+    document_thumbnail,
+)
+from .api import (  # re-export for url include
+    api_documents, api_maintenance, api_object, api_objects, api_sync, api_sync_mark_done,
+)
+from guardsys.maintenance.views import dashboard as maintenance_dashboard, export_monthly_csv  # re-export for url include
+
+
+class KeysetPaginationMixin:
+    """Replaces ListView's OFFSET paginator with cursor pagination (``?cursor=``)."""
+
+    def paginate_queryset(self, queryset, page_size):
+        try:
+            page = paginate(queryset, cursor=self.request.GET.get('cursor'), per_page=page_size)
+        except InvalidCursor:
+            raise Http404("Некорректный курсор страницы")
+        return None, page, page.object_list, page.has_next() or page.has_previous()
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        params = self.request.GET.copy()
+        params.pop('cursor', None)
+        ctx['page_query'] = params.urlencode()
+        return ctx
+
 
+COUNT_LIMIT = 1000
 
-class ObjectListView(LoginRequiredMixin, ListView):
+
+class ObjectListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = GuardedObject
     template_name = 'core/object_list.html'
     context_object_name = 'objects'
+    paginate_by = 50
 
     def get_queryset(self):
         qs = (
             GuardedObject.objects.select_related('organization', 'main_responsible', 'deputy_responsible')
             .filter(is_deleted=False)
+            .prefetch_related(Prefetch(
+                'maintenances', queryset=MaintenanceEvent.objects.order_by('pk'), to_attr='maintenance_list'
+            ))
+            .order_by('name', 'pk')
         )
         search = self.request.GET.get('q')
         filter_my = self.request.GET.get('my')
         filter_overdue = self.request.GET.get('overdue')
-        if search:
-            qs = qs.filter(
-                Q(name__icontains=search)
-                | Q(address__icontains=search)
-                | Q(organization__name__icontains=search)
-                | Q(notes__icontains=search)
-            )
         if filter_my == '1':
             user = self.request.user
             qs = qs.filter(Q(main_responsible=user) | Q(deputy_responsible=user))
         if filter_overdue == '1':
-            qs = qs.filter(maintenances__is_overdue=True).distinct()
+            # semi-join on maintenance_overdue_idx instead of JOIN + DISTINCT
+            qs = qs.filter(Exists(MaintenanceEvent.objects.filter(object=OuterRef('pk'), is_overdue=True)))
+        if search:
+            # last: the relevance cut-off must see the other filters
+            qs = object_search.search(qs, search)
+        if self.request.GET.get('sort') == 'due':
+            # objects without a schedule go last
+            qs = qs.order_by(F('next_due_at').asc(nulls_last=True), 'pk')
         return qs
 
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        ctx['editable_ids'], ctx['archivable_ids'] = object_permissions(self.request.user, list(ctx['objects']))
+        if not hasattr(self, 'total'):
+            self.total = self.object_list[:COUNT_LIMIT + 1].count()
+        ctx['total'], ctx['total_more'] = min(self.total, COUNT_LIMIT), self.total > COUNT_LIMIT
+        return ctx
+
+
+class AuditLogListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
+    model = AuditLog
+    template_name = 'core/auditlog_list.html'
+    context_object_name = 'entries'
+    paginate_by = 100
+
+    def dispatch(self, request, *args, **kwargs):
+        user = request.user
+        if user.is_authenticated and not (user.is_superuser or getattr(user, 'role', None) == 'ADMIN'):
+            raise PermissionDenied("Журнал аудита доступен только администраторам")
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_queryset(self):
+        qs = AuditLog.objects.select_related('user').order_by('-timestamp', '-pk')
+        entity = self.request.GET.get('entity')
+        entity_id = self.request.GET.get('entity_id')
+        if entity:
+            qs = qs.filter(entity=entity)
+        if entity_id:
+            qs = qs.filter(entity_id=entity_id)
+        return qs
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        ctx['entity_choices'] = AuditLog.Entity.choices
+        entity, entity_id = self.request.GET.get('entity'), self.request.GET.get('entity_id')
+        page = ctx.get('page_obj')
+        # The history of one entity continues in the archive after the last live page
+        if entity and entity_id and not (page and page.has_next()):
+            ctx['archived_entries'] = retention.archived_history(entity, entity_id)
+        return ctx
+
 
 class ObjectDetailView(LoginRequiredMixin, DetailView):
     model = GuardedObject
     template_name = 'core/object_detail.html'
     context_object_name = 'object'
 
+    def get_queryset(self):
+        return GuardedObject.objects.select_related('organization', 'main_responsible', 'deputy_responsible')
+
+    def get_object(self, queryset=None):
+        # Repeat views come from the fragment cache; the maintenance block and
+        # the documents below are lazy and only queried on a cache miss.
+        pk = self.kwargs['pk']
+        self.fragment_version = fragments.version(pk)
+        return fragments.cached_object(pk, self.fragment_version, lambda: super(ObjectDetailView, self).get_object(queryset))
+
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        ctx['maintenance'] = MaintenanceEvent.objects.filter(object=self.object).first()
-        ctx['documents'] = self.object.documents.all()
+        ctx['maintenance'] = lambda: MaintenanceEvent.objects.filter(object=self.object).first()
+        ctx['documents'] = self.object.documents.defer('extracted_text')
+        ctx['fragment_version'] = self.fragment_version
+        ctx['fragment_cache'] = getattr(settings, 'FRAGMENT_CACHE_ALIAS', 'default')
+        ctx['fragment_timeout'] = fragments.timeout()
         return ctx
 
 
+class AsyncUserMixin:
+    """For async handlers: the user is loaded with ``auser()`` up front, so
+    the sync permission mixins and the templates do not hit the database."""
+
+    async def dispatch(self, request, *args, **kwargs):
+        request.user = await request.auser()
+        response = super().dispatch(request, *args, **kwargs)
+        if inspect.isawaitable(response):
+            response = await response
+        return response
+
+
+class AsyncObjectListView(AsyncUserMixin, ObjectListView):
+    async def get(self, request, *args, **kwargs):
+        # get_queryset() may run the FTS ranking query right away
+        queryset = await sync_to_async(self.get_queryset)()
+        try:
+            self.page = await apaginate(queryset, cursor=request.GET.get('cursor'), per_page=self.paginate_by)
+        except InvalidCursor:
+            raise Http404("Некорректный курсор страницы")
+        self.object_list = queryset
+        # capped, so the count reads at most COUNT_LIMIT rows of the same index
+        self.total = await queryset[:COUNT_LIMIT + 1].acount()
+        await sync_to_async(permission_scope)(request.user)
+        return self.render_to_response(self.get_context_data())
+
+    def paginate_queryset(self, queryset, page_size):
+        page = self.page
+        return None, page, page.object_list, page.has_next() or page.has_previous()
+
+
+class AsyncObjectDetailView(AsyncUserMixin, ObjectDetailView):
+    async def get(self, request, *args, **kwargs):
+        pk = self.kwargs['pk']
+        self.fragment_version = await fragments.aversion(pk)
+
+        async def load():
+            try:
+                return await self.get_queryset().aget(pk=pk)
+            except GuardedObject.DoesNotExist:
+                raise Http404("Объект не найден")
+
+        self.object = await fragments.acached_object(pk, self.fragment_version, load)
+        # The lazy maintenance/documents context is only evaluated on a
+        # fragment cache miss, while the TemplateResponse renders in a thread.
+        return self.render_to_response(self.get_context_data(object=self.object))
+
+
 class ObjectCreateView(LoginRequiredMixin, CreateView):
     model = GuardedObject
     form_class = GuardedObjectForm
     template_name = 'core/object_form.html'
     success_url = reverse_lazy('object_list')
 
+    @transaction.atomic  # one summary refresh for the object and its schedule
     def form_valid(self, form):
         response = super().form_valid(form)
         # Create maintenance schedule record based on selected periodicity
-        periodicity_id = self.request.POST.get('periodicity_id')
-        if periodicity_id:
-            pt = PeriodicityTemplate.objects.get(pk=periodicity_id)
+        pt = refdata.periodicity(self.request.POST.get('periodicity_id'))
+        if pt:
             MaintenanceEvent.objects.create(
                 object=self.object,
                 periodicity=pt,
@@ -75,7 +222,7 @@ class ObjectCreateView(LoginRequiredMixin, CreateView):
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        ctx['periodicities'] = PeriodicityTemplate.objects.all()
+        ctx['periodicities'] = refdata.periodicities()
         return ctx
 
 
@@ -87,7 +234,7 @@ class ObjectUpdateView(LoginRequiredMixin, UpdateView):
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        ctx['periodicities'] = PeriodicityTemplate.objects.all()
+        ctx['periodicities'] = refdata.periodicities()
         return ctx
 
     def dispatch(self, request, *args, **kwargs):
@@ -96,6 +243,109 @@ class ObjectUpdateView(LoginRequiredMixin, UpdateView):
         return super().dispatch(request, *args, **kwargs)
 
 
+@login_required
+def query_stats(request):
+    if not (request.user.is_superuser or getattr(request.user, 'role', None) == 'ADMIN'):
+        raise PermissionDenied
+    if request.method == 'POST' and request.POST.get('reset'):
+        collector.reset()
+    return JsonResponse(collector.snapshot(), json_dumps_params={'ensure_ascii': False})
+
+
+@login_required
+def autocomplete(request, kind):
+    if kind not in (refdata.ORGANIZATIONS, refdata.USERS):
+        raise Http404("Неизвестный справочник")
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 20)), 100))
+    except ValueError:
+        limit = 20
+    results = refdata.search(kind, request.GET.get('q', ''), limit)
+    return JsonResponse({'results': results}, json_dumps_params={'ensure_ascii': False})
+
+
+@login_required
+def object_import(request):
+    user = request.user
+    if not (user.is_superuser or getattr(user, 'role', None) == 'ADMIN'):
+        raise PermissionDenied("Импорт доступен только администраторам")
+    ctx = {}
+    if request.method == 'POST' and request.FILES.get('file'):
+        upload = request.FILES['file']
+        ctx['dry_run'] = bool(request.POST.get('dry_run'))
+        try:
+            ctx['result'] = import_file(upload, upload.name, user=user, dry_run=ctx['dry_run'])
+        except ImportFormatError as exc:
+            ctx['error'] = str(exc)
+    return render(request, 'core/object_import.html', ctx)
+
+
+def _bulk_params(request):
+    """``ids`` (repeated or comma separated) and/or ``organization``; JSON or form body.
+
+    Raises ``ValueError`` with a message for the client on a malformed body.
+    """
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            raise ValueError("Некорректный JSON")
+        if not isinstance(data, dict):
+            raise ValueError("Ожидается JSON-объект")
+        ids, organization, reason = data.get('ids') or [], data.get('organization'), data.get('reason', '')
+        if not isinstance(ids, list) or not all(isinstance(pk, (int, str)) for pk in ids):
+            raise ValueError("ids должен быть списком целых чисел")
+    else:
+        ids = [part for value in request.POST.getlist('ids') for part in value.split(',')]
+        organization, reason = request.POST.get('organization'), request.POST.get('reason', '')
+    ids = bulk.parse_ids(ids)
+    if organization not in (None, ''):
+        try:
+            organization = int(organization)
+        except (TypeError, ValueError):
+            raise ValueError("organization должен быть целым числом")
+        ids += [pk for pk in GuardedObject.objects.filter(organization=organization).values_list('pk', flat=True)
+                if pk not in ids]
+    return ids, str(reason)
+
+
+def _bulk_response(outcomes):
+    counts = {}
+    for outcome in outcomes.values():
+        counts[outcome] = counts.get(outcome, 0) + 1
+    return JsonResponse({'results': {str(pk): outcome for pk, outcome in outcomes.items()}, 'counts': counts})
+
+
+@login_required
+@require_POST
+def objects_bulk_archive(request):
+    try:
+        ids, reason = _bulk_params(request)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    return _bulk_response(bulk.archive_objects(request.user, ids, reason))
+
+
+@login_required
+@require_POST
+def objects_bulk_restore(request):
+    try:
+        ids, _ = _bulk_params(request)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    return _bulk_response(bulk.restore_objects(request.user, ids))
+
+
+@login_required
+@require_POST
+def objects_bulk_mark_done(request):
+    try:
+        ids, _ = _bulk_params(request)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    return _bulk_response(bulk.mark_done(request.user, ids))
+
+
 @login_required
 def object_archive(request, pk):
     obj = get_object_or_404(GuardedObject, pk=pk, is_deleted=False)
@@ -114,11 +364,12 @@ def object_restore(request, pk):
 
 
 @login_required
+@require_POST
 def mark_maintenance_done(request, pk):
+    # same rules as the bulk action: every schedule of the object, editors only
     obj = get_object_or_404(GuardedObject, pk=pk)
-    me = MaintenanceEvent.objects.filter(object=obj).first()
-    if me:
-        me.mark_done()
+    ensure_can_edit_object(request.user, obj)
+    bulk.mark_done(request.user, [obj.pk])
     return redirect('object_detail', pk=pk)
 
 
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Document
+from .models import Blob, Document, DocumentJob, UploadSession
 
 
 @admin.register(Document)
@@ -8,5 +8,26 @@ class DocumentAdmin(admin.ModelAdmin):
     list_display = ("object", "original_name", "uploaded_at")
     search_fields = ("original_name",)
     autocomplete_fields = ("object",)
+    raw_id_fields = ("blob",)
+
+
+@admin.register(Blob)
+class BlobAdmin(admin.ModelAdmin):
+    list_display = ("digest", "size", "ref_count", "created_at")
+    search_fields = ("digest",)
+    readonly_fields = ("digest", "size", "file", "ref_count", "created_at")
+
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ("original_name", "object", "user", "size", "created_at", "updated_at")
+    raw_id_fields = ("object", "user")
+
+@admin.register(DocumentJob)
+class DocumentJobAdmin(admin.ModelAdmin):
+    list_display = ("document", "status", "attempts", "created_at", "finished_at")
+    list_filter = ("status",)
+    raw_id_fields = ("document",)
+    readonly_fields = ("error", "started_at", "finished_at")
 
 # Register your models here.
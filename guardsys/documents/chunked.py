@@ -0,0 +1,144 @@
+"""Resumable chunked uploads.
+
+The client declares the file size up front (checked against the 100 MB
+limit before any byte is sent), then PUTs chunks at arbitrary offsets, in
+any order and in parallel. Chunks are written in place into a sparse part
+file of the declared size, so finalizing only verifies coverage, hashes the
+file and moves it into blob storage — no reassembly copy.
+
+A session whose name was taken by another document in the meantime cannot
+be finalized; it is discarded with its part file (``UploadConflict``).
+"""
+import os
+from datetime import timedelta
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Document, MAX_FILE_SIZE, UploadChunk, UploadSession
+from . import storage
+
+READ_SIZE = 1024 * 1024
+
+
+class UploadError(ValueError):
+    pass
+
+
+class UploadConflict(UploadError):
+    """The name is taken; the session is gone and must be started again."""
+
+    def __init__(self):
+        super().__init__("Файл с таким именем уже существует для этого объекта")
+
+
+def _name_taken(obj, original_name):
+    return Document.objects.filter(object=obj, original_name=original_name).exists()
+
+
+class PartFile(File):
+    """A finished part file; FileSystemStorage moves it instead of copying."""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def start(obj, user, original_name, size, content_type=''):
+    if size <= 0:
+        raise UploadError("Пустой файл")
+    if size > MAX_FILE_SIZE:
+        raise UploadError("Файл превышает 100 МБ")
+    if _name_taken(obj, original_name):
+        raise UploadConflict()
+    session = UploadSession.objects.create(
+        object=obj, user=user, original_name=original_name, size=size, content_type=content_type
+    )
+    path = default_storage.path(session.part_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as fh:
+        fh.truncate(size)  # sparse: no disk blocks until chunks arrive
+    return session
+
+
+def write_chunk(session, offset, length, stream):
+    """Copy ``length`` bytes from ``stream`` into the part file at ``offset``."""
+    if offset < 0 or length <= 0 or offset + length > session.size:
+        raise UploadError("Фрагмент выходит за границы файла")
+    written = 0
+    with open(default_storage.path(session.part_name), 'r+b') as fh:
+        fh.seek(offset)
+        while written < length:
+            data = stream.read(min(READ_SIZE, length - written))
+            if not data:
+                break
+            fh.write(data)
+            written += len(data)
+    if written != length:
+        raise UploadError("Фрагмент получен не полностью")
+    UploadChunk.objects.update_or_create(session=session, offset=offset, defaults={'length': length})
+    UploadSession.objects.filter(pk=session.pk).update(updated_at=timezone.now())
+    return written
+
+
+def received_ranges(session):
+    """Merged ``[start, end)`` ranges received so far."""
+    ranges = []
+    for offset, length in session.chunks.order_by('offset').values_list('offset', 'length'):
+        end = offset + length
+        if ranges and offset <= ranges[-1][1]:
+            ranges[-1][1] = max(ranges[-1][1], end)
+        else:
+            ranges.append([offset, end])
+    return ranges
+
+
+def _discard(session, path):
+    session.delete()
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def finish(session):
+    """Turn a fully received session into a Document."""
+    if received_ranges(session) != [[0, session.size]]:
+        raise UploadError("Получены не все фрагменты файла")
+    path = default_storage.path(session.part_name)
+    if _name_taken(session.object_id, session.original_name):
+        _discard(session, path)
+        raise UploadConflict()
+    try:
+        with open(path, 'rb') as fh:
+            part = PartFile(fh, name=path)
+            part.size  # noqa: B018 -- evaluate before the file is moved away
+            digest = storage.file_digest(part)
+            with transaction.atomic():
+                blob = storage.store(part, digest=digest)
+                document = Document.objects.create(
+                    object=session.object,
+                    file=blob.file.name,
+                    blob=blob,
+                    original_name=session.original_name,
+                    content_type=session.content_type,
+                )
+                session.delete()
+    except IntegrityError:
+        # the name was taken concurrently; the part may already be in blob
+        # storage without a Blob row, which collect_garbage() sweeps
+        _discard(session, path)
+        raise UploadConflict()
+    if os.path.exists(path):  # content was already stored, the part is a duplicate
+        os.remove(path)
+    return document
+
+
+def expire(max_age=timedelta(hours=24)):
+    """Delete sessions idle for longer than ``max_age``; returns how many."""
+    expired = UploadSession.objects.filter(updated_at__lt=timezone.now() - max_age)
+    count = 0
+    for session in expired.iterator():
+        default_storage.delete(session.part_name)
+        session.delete()
+        count += 1
+    return count
@@ -0,0 +1,172 @@
+"""Serving document files.
+
+Large files should not be pushed through Python: with
+``DOCUMENT_SENDFILE = 'x-sendfile'`` (Apache/lighttpd) or
+``'x-accel-redirect'`` (nginx, ``DOCUMENT_ACCEL_REDIRECT_PREFIX`` mapped to
+MEDIA_ROOT as an ``internal`` location) the view only checks permissions and
+hands the file off to the web server. Otherwise the file is streamed with
+single-range ``Range`` support so interrupted downloads can resume. Under
+ASGI the body is an async iterator: a slow client then holds no thread,
+each chunk is read in a short-lived worker thread.
+
+The stored ``content_type`` comes from the uploader, so it is never trusted:
+only types on ``INLINE_TYPES`` are sent as such (and shown inline on
+request, sandboxed by CSP); everything else is an ``application/octet-stream``
+attachment, so an uploaded HTML or SVG file cannot run on the app's origin.
+
+Thumbnails are PNGs rendered by ``processing`` and go through the same
+permission check (``serve_thumbnail``), never through MEDIA_URL.
+"""
+import re
+from urllib.parse import quote
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header, http_date, quote_etag
+
+CHUNK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+INLINE_TYPES = {
+    'application/pdf', 'text/plain',
+    'image/png', 'image/jpeg', 'image/gif', 'image/webp', 'image/bmp',
+}
+
+
+def document_etag(document):
+    if document.blob_id:
+        return quote_etag(document.blob_id)
+    return quote_etag(f'{document.pk}-{int(document.uploaded_at.timestamp())}')
+
+
+def safe_content_type(document):
+    """The type to send for ``document`` and whether it may be shown inline."""
+    content_type = (document.content_type or '').split(';')[0].strip().lower()
+    if content_type in INLINE_TYPES:
+        return content_type, True
+    return 'application/octet-stream', False
+
+
+def parse_range(header, size):
+    """``(start, end)`` inclusive for a single satisfiable range, ``None`` to
+    serve the whole file, or ``False`` when the range is unsatisfiable."""
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    first, last = match.groups()
+    if first == '':
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _file_chunks(fh, start, length):
+    try:
+        fh.seek(start)
+        while length > 0:
+            data = fh.read(min(CHUNK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        fh.close()
+
+
+async def _afile_chunks(fh, start, length):
+    read = sync_to_async(fh.read, thread_sensitive=False)
+    try:
+        await sync_to_async(fh.seek, thread_sensitive=False)(start)
+        while length > 0:
+            data = await read(min(CHUNK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        fh.close()
+
+
+def _sendfile_response(fieldfile, content_type):
+    # Content-Type is set explicitly: the web server would guess it from the
+    # file extension (.html, .svg) otherwise
+    backend = getattr(settings, 'DOCUMENT_SENDFILE', None)
+    if backend == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = fieldfile.path
+    elif backend == 'x-accel-redirect':
+        prefix = getattr(settings, 'DOCUMENT_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+        response = HttpResponse(content_type=content_type)
+        # percent-encoded: Django would MIME-encode a non-ASCII header value
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(fieldfile.name)
+    else:
+        return None
+    return response
+
+
+def serve(request, document):
+    content_type, inline_allowed = safe_content_type(document)
+    inline = inline_allowed and request.GET.get('inline') == '1'
+    disposition = content_disposition_header(not inline, document.original_name)
+    etag = document_etag(document)
+
+    response = _sendfile_response(document.file, content_type)
+    if response is None:
+        asynchronous = isinstance(request, ASGIRequest)
+        chunks = _afile_chunks if asynchronous else _file_chunks
+        fh = document.file.open('rb')
+        size = document.file.size
+        if_range = request.headers.get('If-Range')
+        byte_range = parse_range(request.headers.get('Range'), size)
+        if if_range and if_range != etag:
+            byte_range = None
+        if byte_range is False:
+            fh.close()
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+        elif byte_range:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                chunks(fh, start, end - start + 1),
+                status=206,
+                content_type=content_type,
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(end - start + 1)
+        elif asynchronous:
+            # FileResponse only has a sync iterator
+            response = StreamingHttpResponse(chunks(fh, 0, size), content_type=content_type)
+            response['Content-Length'] = str(size)
+        else:
+            response = FileResponse(fh, content_type=content_type)
+        response['Accept-Ranges'] = 'bytes'
+
+    response['Content-Disposition'] = disposition
+    response['X-Content-Type-Options'] = 'nosniff'
+    if inline:
+        response['Content-Security-Policy'] = 'sandbox'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(document.uploaded_at.timestamp())
+    response['Cache-Control'] = 'private, max-age=0, must-revalidate'
+    return response
+
+
+def thumbnail_etag(document):
+    return quote_etag(document.thumbnail.name)
+
+
+def serve_thumbnail(document):
+    response = _sendfile_response(document.thumbnail, 'image/png')
+    if response is None:
+        response = FileResponse(document.thumbnail.open('rb'), content_type='image/png')
+    response['X-Content-Type-Options'] = 'nosniff'
+    response['ETag'] = thumbnail_etag(document)
+    response['Cache-Control'] = 'private, max-age=3600'
+    return response
@@ -0,0 +1,111 @@
+"""Database-backed job queue for document post-processing.
+
+No broker: jobs are rows in ``DocumentJob``. A worker claims a job with a
+conditional UPDATE (``status = PENDING``), so several workers can share the
+table, and runs ``processing.process`` in a process pool. Results are written
+back on the Document by the parent process.
+"""
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Document, DocumentJob
+from . import processing
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+STALE_AFTER = timedelta(minutes=30)
+
+
+def enqueue(document):
+    return DocumentJob.objects.create(document=document)
+
+
+def requeue_stale(now=None):
+    """Put jobs of crashed workers back into the queue."""
+    now = now or timezone.now()
+    return DocumentJob.objects.filter(
+        status=DocumentJob.Status.RUNNING, started_at__lt=now - STALE_AFTER
+    ).update(status=DocumentJob.Status.PENDING)
+
+
+def claim(limit):
+    claimed = []
+    candidates = DocumentJob.objects.filter(status=DocumentJob.Status.PENDING).order_by('created_at', 'pk')
+    for pk in candidates.values_list('pk', flat=True)[:limit * 2]:
+        updated = DocumentJob.objects.filter(pk=pk, status=DocumentJob.Status.PENDING).update(
+            status=DocumentJob.Status.RUNNING, started_at=timezone.now(), attempts=F('attempts') + 1
+        )
+        if updated:
+            claimed.append(pk)
+        if len(claimed) >= limit:
+            break
+    return list(DocumentJob.objects.filter(pk__in=claimed).select_related('document'))
+
+
+def _copy_from_twin(document):
+    """Identical content was processed before: reuse its artifacts."""
+    if not document.blob_id:
+        return False
+    twin = (
+        Document.objects.filter(blob_id=document.blob_id, processed_at__isnull=False)
+        .exclude(pk=document.pk).first()
+    )
+    if twin is None:
+        return False
+    document.thumbnail = twin.thumbnail.name
+    document.extracted_text = twin.extracted_text
+    return True
+
+
+def _save_result(document, result):
+    if result['thumbnail']:
+        document.thumbnail.save(f'{document.pk}.png', ContentFile(result['thumbnail']), save=False)
+    document.extracted_text = result['text']
+
+
+def _finish(job, error=''):
+    document = job.document
+    if not error:
+        document.processed_at = timezone.now()
+        document.save(update_fields=['thumbnail', 'extracted_text', 'processed_at', 'updated_at'])
+        status = DocumentJob.Status.DONE
+    else:
+        logger.warning("Document job %s failed: %s", job.pk, error)
+        status = DocumentJob.Status.FAILED if job.attempts >= MAX_ATTEMPTS else DocumentJob.Status.PENDING
+    DocumentJob.objects.filter(pk=job.pk).update(status=status, error=error, finished_at=timezone.now())
+
+
+def run_batch(pool, limit):
+    """Claim and process up to ``limit`` jobs; returns how many were handled."""
+    jobs = claim(limit)
+    futures = {}
+    for job in jobs:
+        document = job.document
+        if _copy_from_twin(document):
+            _finish(job)
+            continue
+        try:
+            path = document.file.path
+        except NotImplementedError:
+            _finish(job, "Хранилище не поддерживает локальные пути")
+            continue
+        futures[pool.submit(processing.process, path, document.content_type, document.original_name)] = job
+    for future in as_completed(futures):
+        job = futures[future]
+        try:
+            _save_result(job.document, future.result())
+        except Exception as exc:
+            _finish(job, f"{type(exc).__name__}: {exc}")
+        else:
+            _finish(job)
+    return len(jobs)
+
+
+def make_pool(concurrency):
+    return ProcessPoolExecutor(max_workers=concurrency)
@@ -0,0 +1,16 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from guardsys.documents.chunked import expire
+
+
+class Command(BaseCommand):
+    help = "Удаляет брошенные сессии загрузки по частям вместе с временными файлами"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help="Сколько часов бездействия считать брошенной сессией")
+
+    def handle(self, *args, **options):
+        count = expire(timedelta(hours=options['hours']))
+        self.stdout.write(self.style.SUCCESS(f"Удалено сессий: {count}"))
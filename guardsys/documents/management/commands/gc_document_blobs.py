@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from guardsys.documents.storage import collect_garbage
+
+
+class Command(BaseCommand):
+    help = "Удаляет файлы документов, на которые больше не ссылается ни один документ"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Только показать, что будет удалено")
+
+    def handle(self, *args, **options):
+        deleted, freed = collect_garbage(dry_run=options['dry_run'])
+        verb = "Будет удалено" if options['dry_run'] else "Удалено"
+        self.stdout.write(self.style.SUCCESS(f"{verb} файлов: {deleted}, освобождено {freed / 1024 / 1024:.1f} МБ"))
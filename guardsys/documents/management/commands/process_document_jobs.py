@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from guardsys.documents import jobs
+
+
+class Command(BaseCommand):
+    help = "Обрабатывает очередь документов: превью и извлечение текста"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=getattr(settings, 'DOCUMENT_WORKER_CONCURRENCY', 2),
+                            help="Число рабочих процессов")
+        parser.add_argument('--once', action='store_true', help="Обработать очередь и завершиться")
+        parser.add_argument('--poll-interval', type=float, default=5, help="Пауза (сек) при пустой очереди")
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        total = 0
+        with jobs.make_pool(concurrency) as pool:
+            while True:
+                jobs.requeue_stale()
+                handled = jobs.run_batch(pool, concurrency * 2)
+                total += handled
+                if handled:
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+        self.stdout.write(self.style.SUCCESS(f"Обработано заданий: {total}"))
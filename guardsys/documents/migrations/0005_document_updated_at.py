@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:38
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_updated_at(apps, schema_editor):
+    Document = apps.get_model('documents', 'Document')
+    Document.objects.update(updated_at=Coalesce('processed_at', 'uploaded_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_sync_indexes'),
+        ('documents', '0004_document_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['updated_at', 'id'], name='document_updated_idx'),
+        ),
+    ]
@@ -1,24 +1,47 @@
+import uuid
+
 from django.db import models
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 
 from guardsys.core.models import GuardedObject
 
+MAX_FILE_SIZE = 100 * 1024 * 1024  # 100 MB
+
 
 def validate_file_size(value):
-    max_bytes = 100 * 1024 * 1024  # 100 MB
-    if value.size > max_bytes:
+    if value.size > MAX_FILE_SIZE:
         raise ValidationError(_("Файл превышает 100 МБ"))
 
 
+class Blob(models.Model):
+    """Stored file content, shared by every Document with the same SHA-256."""
+
+    digest = models.CharField(max_length=64, primary_key=True)
+    size = models.PositiveBigIntegerField()
+    file = models.FileField(max_length=255)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"{self.digest[:12]}… ({self.ref_count})"
+
+
 class Document(models.Model):
     object = models.ForeignKey(GuardedObject, on_delete=models.CASCADE, related_name="documents")
     file = models.FileField(upload_to="documents/%Y/%m/", validators=[validate_file_size])
+    blob = models.ForeignKey(Blob, on_delete=models.PROTECT, null=True, blank=True, related_name="documents")
     original_name = models.CharField(max_length=255)
     content_type = models.CharField(max_length=128, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    thumbnail = models.FileField(upload_to="thumbnails/%Y/%m/", blank=True)
+    extracted_text = models.TextField(blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
+        indexes = [models.Index(fields=["updated_at", "id"], name="document_updated_idx")]
         constraints = [
             models.UniqueConstraint(
                 fields=["object", "original_name"],
@@ -29,4 +52,62 @@ class Document(models.Model):
     def __str__(self) -> str:
         return self.original_name
 
+
+class DocumentJob(models.Model):
+    """Post-processing of an uploaded document (thumbnail, text), see ``jobs.py``."""
+
+    class Status(models.TextChoices):
+        PENDING = "PENDING", "В очереди"
+        RUNNING = "RUNNING", "Выполняется"
+        DONE = "DONE", "Готово"
+        FAILED = "FAILED", "Ошибка"
+
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name="jobs")
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "created_at"], name="documentjob_status_idx")]
+
+    def __str__(self) -> str:
+        return f"{self.document} — {self.get_status_display()}"
+
+
+class UploadSession(models.Model):
+    """A resumable upload: chunks are written in place into a preallocated part file."""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    object = models.ForeignKey(GuardedObject, on_delete=models.CASCADE, related_name="upload_sessions")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="upload_sessions")
+    original_name = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=128, blank=True)
+    size = models.PositiveBigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["updated_at"], name="uploadsession_updated_idx")]
+
+    @property
+    def part_name(self) -> str:
+        return f"uploads/partial/{self.pk}.part"
+
+    def __str__(self) -> str:
+        return f"{self.original_name} ({self.size} байт)"
+
+
+class UploadChunk(models.Model):
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name="chunks")
+    offset = models.PositiveBigIntegerField()
+    length = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["session", "offset"], name="uq_uploadchunk_session_offset"),
+        ]
+
 # Create your models here.
@@ -0,0 +1,75 @@
+"""Document post-processing: thumbnails and text extraction.
+
+These functions run in worker processes and must not touch the database:
+they get a file path and return bytes/text. Images are read with Pillow;
+poppler-utils (``pdftoppm``/``pdftotext``) are optional, without them PDFs
+simply get no thumbnail or text.
+"""
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+
+from PIL import Image
+
+THUMBNAIL_SIZE = (320, 320)
+MAX_TEXT = 1024 * 1024
+TIMEOUT = 120
+
+
+def _image_thumbnail(path):
+    with Image.open(path) as image:
+        image.thumbnail(THUMBNAIL_SIZE)
+        out = io.BytesIO()
+        image.convert('RGB').save(out, format='PNG', optimize=True)
+        return out.getvalue()
+
+
+def _pdf_thumbnail(path):
+    if not shutil.which('pdftoppm'):
+        return None
+    with tempfile.TemporaryDirectory() as tmp:
+        target = os.path.join(tmp, 'page')
+        subprocess.run(
+            ['pdftoppm', '-png', '-singlefile', '-f', '1', '-l', '1', '-scale-to', str(THUMBNAIL_SIZE[0]), path, target],
+            check=True, capture_output=True, timeout=TIMEOUT,
+        )
+        with open(target + '.png', 'rb') as fh:
+            return fh.read()
+
+
+def _pdf_text(path):
+    if not shutil.which('pdftotext'):
+        return ''
+    result = subprocess.run(
+        ['pdftotext', '-l', '50', '-enc', 'UTF-8', path, '-'],
+        check=True, capture_output=True, timeout=TIMEOUT,
+    )
+    return result.stdout[:MAX_TEXT].decode('utf-8', errors='ignore')
+
+
+def _plain_text(path):
+    with open(path, 'rb') as fh:
+        raw = fh.read(MAX_TEXT)
+    for encoding in ('utf-8', 'cp1251'):
+        try:
+            return raw.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return raw.decode('utf-8', errors='ignore')
+
+
+def process(path, content_type, name):
+    """Return ``{'thumbnail': bytes | None, 'text': str}`` for one file."""
+    content_type = content_type or ''
+    lower = name.lower()
+    thumbnail, text = None, ''
+    if content_type == 'application/pdf' or lower.endswith('.pdf'):
+        thumbnail = _pdf_thumbnail(path)
+        text = _pdf_text(path)
+    elif content_type.startswith('image/'):
+        thumbnail = _image_thumbnail(path)
+    elif content_type.startswith('text/') or lower.endswith(('.txt', '.csv', '.md')):
+        text = _plain_text(path)
+    return {'thumbnail': thumbnail, 'text': text.replace('\x00', '')}
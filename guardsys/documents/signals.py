@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Document
+from . import jobs, storage
+
+
+@receiver(post_save, sender=Document)
+def document_enqueue_processing(sender, instance: Document, created, **kwargs):
+    if created:
+        jobs.enqueue(instance)
+
+
+@receiver(post_delete, sender=Document)
+def document_post_delete(sender, instance: Document, **kwargs):
+    if instance.blob_id:
+        storage.release(instance.blob_id)
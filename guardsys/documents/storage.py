@@ -0,0 +1,141 @@
+"""Content-addressed storage for document files.
+
+Uploads are hashed (SHA-256) chunk by chunk while Django streams them to
+disk, and every distinct content is stored once under
+``blobs/<aa>/<bb>/<digest>``. Documents point at their ``Blob``; the blob
+keeps a reference count and ``gc_document_blobs`` removes unreferenced ones.
+
+``store`` writes the file before the ``Blob`` row, so a rolled back upload
+leaves a file without a row; the garbage collector also sweeps those once
+they are older than any upload transaction can be.
+"""
+import hashlib
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import FileUploadHandler
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Blob
+
+CHUNK_SIZE = 1024 * 1024
+BLOB_ROOT = 'blobs'
+
+
+def blob_path(digest):
+    return f"{BLOB_ROOT}/{digest[:2]}/{digest[2:4]}/{digest}"
+
+
+class HashingUploadHandler(FileUploadHandler):
+    """Hashes file chunks on their way to the next upload handler.
+
+    Must be first in ``request.upload_handlers``; digests are left in
+    ``request.upload_digests`` keyed by form field name.
+    """
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        if not hasattr(self.request, 'upload_digests'):
+            self.request.upload_digests = {}
+        self.request.upload_digests[self.field_name] = self.hasher.hexdigest()
+        return None
+
+
+def file_digest(fileobj):
+    hasher = hashlib.sha256()
+    for chunk in fileobj.chunks(CHUNK_SIZE):
+        hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def store(fileobj, digest=None):
+    """Store ``fileobj`` once and take a reference on its blob.
+
+    A temporary upload is moved into place rather than copied. Call inside
+    the transaction that creates the referencing Document.
+    """
+    digest = digest or file_digest(fileobj)
+    if Blob.objects.filter(pk=digest).update(ref_count=F('ref_count') + 1):
+        return Blob.objects.get(pk=digest)
+
+    name = blob_path(digest)
+    if not default_storage.exists(name):
+        saved = default_storage.save(name, fileobj)
+        if saved != name:  # lost a race with a concurrent upload of the same content
+            default_storage.delete(saved)
+    try:
+        with transaction.atomic():
+            return Blob.objects.create(digest=digest, size=fileobj.size, file=name, ref_count=1)
+    except IntegrityError:
+        Blob.objects.filter(pk=digest).update(ref_count=F('ref_count') + 1)
+        return Blob.objects.get(pk=digest)
+
+
+def release(digest):
+    Blob.objects.filter(pk=digest, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+
+
+def _blob_files(path=BLOB_ROOT):
+    """``(digest, name)`` of every file under ``path``, one directory at a time."""
+    try:
+        dirs, files = default_storage.listdir(path)
+    except FileNotFoundError:
+        return
+    for directory in sorted(dirs):
+        yield from _blob_files(f"{path}/{directory}")
+    if files:
+        yield [(digest, f"{path}/{digest}") for digest in files]
+
+
+def _sweep_orphan_files(max_age, dry_run):
+    """Delete blob files that have no ``Blob`` row and are older than ``max_age``."""
+    cutoff = timezone.now() - max_age
+    deleted = freed = 0
+    for batch in _blob_files():
+        known = set(Blob.objects.filter(pk__in=[digest for digest, _ in batch]).values_list('pk', flat=True))
+        for digest, name in batch:
+            if digest in known or default_storage.get_modified_time(name) >= cutoff:
+                continue
+            size = default_storage.size(name)
+            if not dry_run:
+                default_storage.delete(name)
+            deleted += 1
+            freed += size
+    return deleted, freed
+
+
+def collect_garbage(dry_run=False, orphan_age=timedelta(hours=24)):
+    """Fix reference counts and delete blobs nothing points to.
+
+    Files under ``blobs/`` without a row (left by rolled back uploads) are
+    removed once they are ``orphan_age`` old. Returns ``(deleted_count,
+    freed_bytes)``.
+    """
+    for digest, actual in Blob.objects.annotate(actual=Count('documents')).exclude(
+        ref_count=F('actual')
+    ).values_list('pk', 'actual'):
+        if not dry_run:
+            Blob.objects.filter(pk=digest).update(ref_count=actual)
+
+    deleted = freed = 0
+    orphans = Blob.objects.filter(documents__isnull=True)
+    for blob in orphans.iterator():
+        if not dry_run:
+            with transaction.atomic():
+                # Re-check in the same statement: an upload may have just reused it
+                if not Blob.objects.filter(pk=blob.pk, ref_count=0, documents__isnull=True).delete()[0]:
+                    continue
+                default_storage.delete(blob.file.name)
+        deleted += 1
+        freed += blob.size
+    files, size = _sweep_orphan_files(orphan_age, dry_run)
+    return deleted + files, freed + size
@@ -1,3 +1,219 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from PIL import Image
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
 from django.test import TestCase
+from django.urls import reverse
+
+from guardsys.core.tests import FixturesMixin
+from .models import Blob, Document, UploadSession
+from . import chunked, jobs, storage
+
+
+class DocumentTestMixin(FixturesMixin):
+    def setUp(self):
+        super().setUp()
+        self.enterContext(self.settings(MEDIA_ROOT=self.enterContext(TemporaryDirectory())))
+        self.client.force_login(self.responsible)
+
+    def upload(self, name, content, content_type='text/plain', obj=None):
+        obj = obj or self.objects[0]
+        upload = SimpleUploadedFile(name, content, content_type=content_type)
+        self.client.post(reverse('upload_document', args=[obj.pk]), {'file': upload})
+        return Document.objects.get(object=obj, original_name=name)
+
+
+class DownloadTests(DocumentTestMixin, TestCase):
+    def download(self, document, inline=False, **headers):
+        url = reverse('document_download', args=[document.pk]) + ('?inline=1' if inline else '')
+        return self.client.get(url, headers=headers)
+
+    def test_allowed_type_inline_is_sandboxed(self):
+        document = self.upload('manual.txt', b'manual')
+        response = self.download(document, inline=True)
+        self.assertEqual(response['Content-Type'], 'text/plain')
+        self.assertTrue(response['Content-Disposition'].startswith('inline'))
+        self.assertEqual(response['Content-Security-Policy'], 'sandbox')
+        self.assertEqual(b''.join(response.streaming_content), b'manual')
+
+    def test_active_content_is_always_an_attachment(self):
+        for name, content_type in (('page.html', 'text/html'), ('logo.svg', 'image/svg+xml')):
+            document = self.upload(name, b'<script>alert(1)</script>', content_type)
+            response = self.download(document, inline=True)
+            self.assertEqual(response['Content-Type'], 'application/octet-stream')
+            self.assertTrue(response['Content-Disposition'].startswith('attachment'))
+            self.assertEqual(response['X-Content-Type-Options'], 'nosniff')
+
+    def test_range_and_etag(self):
+        document = self.upload('data.txt', b'0123456789')
+        response = self.download(document, Range='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+        self.assertEqual(self.download(document, Range='bytes=20-').status_code, 416)
+        etag = response['ETag']
+        self.assertEqual(self.download(document, If_None_Match=etag).status_code, 304)
+        # a stale If-Range gets the whole file
+        response = self.download(document, Range='bytes=2-5', If_Range='"other"')
+        self.assertEqual(response.status_code, 200)
+
+    async def test_async_streaming(self):
+        document = await sync_to_async(self.upload)('data.txt', b'0123456789')
+        await self.async_client.aforce_login(self.responsible)
+        url = reverse('document_download', args=[document.pk])
+        response = await self.async_client.get(url, headers={'Range': 'bytes=-3'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), b'789')
+        response = await self.async_client.get(url)
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), b'0123456789')
+
+    def test_accel_redirect_path_is_quoted(self):
+        document = self.upload('manual.txt', b'manual')
+        Document.objects.filter(pk=document.pk).update(file='documents/акт №1.pdf')
+        with self.settings(DOCUMENT_SENDFILE='x-accel-redirect'):
+            response = self.download(document)
+        self.assertEqual(
+            response['X-Accel-Redirect'], '/protected-media/documents/%D0%B0%D0%BA%D1%82%20%E2%84%961.pdf'
+        )
+        self.assertEqual(response['Content-Type'], 'text/plain')
+
+
+class BlobStorageTests(DocumentTestMixin, TestCase):
+    def test_same_content_is_stored_once(self):
+        first = self.upload('a.txt', b'same content')
+        second = self.upload('b.txt', b'same content', obj=self.objects[1])
+        self.assertEqual(first.blob_id, second.blob_id)
+        self.assertEqual(Blob.objects.get().ref_count, 2)
+        self.assertEqual(first.file.name, storage.blob_path(first.blob_id))
+
+    def test_gc_removes_unreferenced_blobs(self):
+        document = self.upload('a.txt', b'content')
+        kept = self.upload('b.txt', b'other')
+        document.delete()
+        self.assertEqual(storage.collect_garbage(dry_run=True), (1, 7))
+        self.assertTrue(default_storage.exists(document.file.name))
+        self.assertEqual(storage.collect_garbage(), (1, 7))
+        self.assertFalse(default_storage.exists(document.file.name))
+        self.assertEqual(list(Blob.objects.values_list('pk', flat=True)), [kept.blob_id])
+
+    def test_gc_sweeps_files_of_rolled_back_uploads(self):
+        digest = storage.file_digest(ContentFile(b'lost'))
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            storage.store(ContentFile(b'lost', name='lost.txt'), digest=digest)
+            raise RuntimeError
+        name = storage.blob_path(digest)
+        self.assertTrue(default_storage.exists(name))
+        self.assertFalse(Blob.objects.exists())
+        # too recent: the upload might still be in its transaction
+        self.assertEqual(storage.collect_garbage(), (0, 0))
+        self.assertEqual(storage.collect_garbage(orphan_age=timedelta(0)), (1, 4))
+        self.assertFalse(default_storage.exists(name))
+
+
+class ChunkedUploadTests(DocumentTestMixin, TestCase):
+    content = b'0123456789abcdef'
+
+    def start(self, name='big.bin', size=None):
+        response = self.client.post(reverse('upload_session_start', args=[self.objects[0].pk]), {
+            'name': name, 'size': len(self.content) if size is None else size,
+            'content_type': 'application/octet-stream',
+        })
+        return response.status_code, response.json()
+
+    def put(self, session, offset, data):
+        return self.client.put(f"{session['chunk_url']}?offset={offset}", data,
+                               content_type='application/octet-stream')
+
+    def test_chunks_in_any_order_are_finalized_into_a_blob(self):
+        status, session = self.start()
+        self.assertEqual(status, 201)
+        self.assertEqual(self.put(session, 8, self.content[8:]).json()['received'], [[8, 16]])
+        self.assertEqual(self.client.post(session['finalize_url']).status_code, 409)
+        self.assertEqual(self.put(session, 0, self.content[:8]).json()['received'], [[0, 16]])
+        response = self.client.post(session['finalize_url'])
+        self.assertEqual(response.status_code, 201)
+        document = Document.objects.get(pk=response.json()['id'])
+        self.assertEqual(document.blob_id, storage.file_digest(ContentFile(self.content)))
+        with document.file.open('rb') as fh:
+            self.assertEqual(fh.read(), self.content)
+
+    def test_finalize_reuses_existing_content(self):
+        existing = self.upload('small.bin', self.content)
+        _, session = self.start()
+        self.put(session, 0, self.content)
+        response = self.client.post(session['finalize_url'])
+        self.assertEqual(response.json()['digest'], existing.blob_id)
+        self.assertEqual(Blob.objects.get().ref_count, 2)
+
+    def test_name_taken_after_start(self):
+        _, session = self.start(name='dup.bin')
+        self.put(session, 0, self.content)
+        part = default_storage.path(UploadSession.objects.get().part_name)
+        self.upload('dup.bin', b'other content')
+        self.assertEqual(self.client.post(session['finalize_url']).status_code, 409)
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertFalse(default_storage.exists(part))
+        self.assertEqual(self.client.post(session['finalize_url']).status_code, 404)
+
+    def test_name_taken_concurrently(self):
+        _, session = self.start(name='dup.bin')
+        self.put(session, 0, self.content)
+        self.upload('dup.bin', b'other content')
+        with mock.patch.object(chunked, '_name_taken', return_value=False):
+            self.assertEqual(self.client.post(session['finalize_url']).status_code, 409)
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertEqual(self.client.post(session['finalize_url']).status_code, 404)
+        # the moved part has no Blob row and is swept
+        self.assertEqual(storage.collect_garbage(orphan_age=timedelta(0))[0], 1)
+
+    def test_invalid_sessions_and_chunks(self):
+        self.assertEqual(self.start(size=0)[0], 400)
+        self.assertEqual(self.start(size=200 * 1024 * 1024)[0], 400)
+        _, session = self.start()
+        self.assertEqual(self.put(session, 10, self.content).status_code, 400)
+        self.assertEqual(self.client.put(session['chunk_url'], b'x').status_code, 400)
+
+
+class ThumbnailTests(DocumentTestMixin, TestCase):
+    def test_thumbnail_requires_object_access(self):
+        document = self.upload('photo.png', b'png', 'image/png')
+        document.thumbnail.save('1.png', ContentFile(b'thumbnail'))
+        url = reverse('document_thumbnail', args=[document.pk])
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(b''.join(response.streaming_content), b'thumbnail')
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': response['ETag']}).status_code, 304)
+        detail = self.client.get(reverse('object_detail', args=[document.object_id]))
+        self.assertContains(detail, f'src="{url}"')
+        # archived objects are only visible to admins and their responsibles
+        self.objects[0].archive('Снят с охраны')
+        self.client.force_login(self.deputy)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.logout()
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+    def test_png_thumbnail_is_rendered(self):
+        png = BytesIO()
+        Image.new('RGBA', (640, 480), (255, 0, 0, 128)).save(png, format='PNG')
+        document = self.upload('photo.png', png.getvalue(), 'image/png')
+        with ThreadPoolExecutor(1) as pool:  # processing never touches the database
+            self.assertEqual(jobs.run_batch(pool, 10), 1)
+        document.refresh_from_db()
+        self.assertIsNotNone(document.processed_at)
+        response = self.client.get(reverse('document_thumbnail', args=[document.pk]))
+        with Image.open(BytesIO(b''.join(response.streaming_content))) as thumbnail:
+            self.assertEqual((thumbnail.format, thumbnail.size), ('PNG', (320, 240)))
 
-# Create your tests here.
+    def test_missing_thumbnail(self):
+        document = self.upload('manual.txt', b'manual')
+        self.assertEqual(self.client.get(reverse('document_thumbnail', args=[document.pk])).status_code, 404)
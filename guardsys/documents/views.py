@@ -1,32 +1,139 @@
-from django.shortcuts import get_object_or_404, redirect
+from django.shortcuts import aget_object_or_404, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from django.contrib import messages
+from django.http import Http404, JsonResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.views.decorators.http import require_http_methods, require_POST
 
 from guardsys.core.models import GuardedObject
-from .models import Document
+from guardsys.core.permissions import ensure_can_view_object
+from .models import Document, UploadSession
 from .forms import DocumentForm
+from . import chunked, downloads, storage
 
 
 @login_required
+@csrf_exempt
 def upload_document(request, object_id: int):
+    # Upload handlers can only be changed before the body is parsed, i.e.
+    # before CsrfViewMiddleware reads request.POST; CSRF is checked below.
+    request.upload_handlers.insert(0, storage.HashingUploadHandler(request))
+    return _upload_document(request, object_id)
+
+
+@csrf_protect
+def _upload_document(request, object_id: int):
     obj = get_object_or_404(GuardedObject, pk=object_id)
     if request.method == 'POST':
         form = DocumentForm(request.POST, request.FILES)
         if form.is_valid():
             f = form.cleaned_data['file']
+            digest = getattr(request, 'upload_digests', {}).get('file')
+            if Document.objects.filter(object=obj, original_name=f.name).exists():
+                messages.error(request, 'Файл с таким именем уже существует для этого объекта')
+                return redirect('object_detail', pk=obj.pk)
             try:
-                Document.objects.create(
-                    object=obj,
-                    file=f,
-                    original_name=f.name,
-                    content_type=getattr(f, 'content_type', '') or '',
-                )
+                with transaction.atomic():
+                    blob = storage.store(f, digest=digest)
+                    Document.objects.create(
+                        object=obj,
+                        file=blob.file.name,
+                        blob=blob,
+                        original_name=f.name,
+                        content_type=getattr(f, 'content_type', '') or '',
+                    )
                 messages.success(request, 'Файл загружен')
             except IntegrityError:
                 messages.error(request, 'Файл с таким именем уже существует для этого объекта')
     return redirect('object_detail', pk=obj.pk)
 
-from django.shortcuts import render
 
-# Create your views here.
+def _session_json(session, status=200):
+    return JsonResponse({
+        'id': str(session.pk),
+        'size': session.size,
+        'received': chunked.received_ranges(session),
+        'chunk_url': reverse('upload_session', args=[session.pk]),
+        'finalize_url': reverse('upload_session_finalize', args=[session.pk]),
+    }, status=status)
+
+
+@login_required
+@require_POST
+def upload_session_start(request, object_id: int):
+    obj = get_object_or_404(GuardedObject, pk=object_id)
+    try:
+        size = int(request.POST.get('size', ''))
+    except ValueError:
+        return JsonResponse({'error': 'Не указан размер файла'}, status=400)
+    name = request.POST.get('name', '').strip()
+    if not name:
+        return JsonResponse({'error': 'Не указано имя файла'}, status=400)
+    try:
+        session = chunked.start(obj, request.user, name, size, request.POST.get('content_type', ''))
+    except chunked.UploadError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    return _session_json(session, status=201)
+
+
+@login_required
+@require_http_methods(['GET', 'PUT'])
+def upload_session(request, session_id):
+    """GET: received ranges (to resume). PUT ?offset=N: raw chunk bytes."""
+    session = get_object_or_404(UploadSession, pk=session_id, user=request.user)
+    if request.method == 'PUT':
+        try:
+            offset = int(request.GET.get('offset', ''))
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+            chunked.write_chunk(session, offset, length, request)
+        except ValueError as exc:  # includes UploadError
+            return JsonResponse({'error': str(exc) or 'Некорректное смещение'}, status=400)
+    return _session_json(session)
+
+
+@login_required
+@require_POST
+def upload_session_finalize(request, session_id):
+    session = get_object_or_404(UploadSession.objects.select_related('object'), pk=session_id, user=request.user)
+    try:
+        document = chunked.finish(session)
+    except chunked.UploadConflict as exc:
+        return JsonResponse({'error': str(exc)}, status=409)
+    except chunked.UploadError as exc:
+        return JsonResponse({'error': str(exc), 'received': chunked.received_ranges(session)}, status=409)
+    return JsonResponse({'id': document.pk, 'name': document.original_name, 'digest': document.blob_id}, status=201)
+
+
+@login_required
+@require_http_methods(['GET', 'HEAD'])
+async def download_document(request, pk: int):
+    document = await aget_object_or_404(Document.objects.select_related('object'), pk=pk)
+    ensure_can_view_object(await request.auser(), document.object)
+    etag = downloads.document_etag(document)
+    not_modified = get_conditional_response(
+        request, etag=etag, last_modified=int(document.uploaded_at.timestamp())
+    )
+    if not_modified is not None:
+        not_modified['ETag'] = etag
+        not_modified['Last-Modified'] = http_date(document.uploaded_at.timestamp())
+        return not_modified
+    return downloads.serve(request, document)
+
+
+@login_required
+@require_http_methods(['GET', 'HEAD'])
+def document_thumbnail(request, pk: int):
+    document = get_object_or_404(Document.objects.select_related('object'), pk=pk)
+    ensure_can_view_object(request.user, document.object)
+    if not document.thumbnail:
+        raise Http404
+    etag = downloads.thumbnail_etag(document)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        not_modified['ETag'] = etag
+        return not_modified
+    return downloads.serve_thumbnail(document)
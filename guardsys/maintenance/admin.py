@@ -1,13 +1,32 @@
 from django.contrib import admin
 
-from .models import PeriodicityTemplate, MaintenanceEvent
+from .models import Holiday, PeriodicityTemplate, MaintenanceEvent, MaintenanceSummary, OverdueSweep
+from .scheduling import reschedule
 
 
 @admin.register(PeriodicityTemplate)
 class PeriodicityTemplateAdmin(admin.ModelAdmin):
-    list_display = ("name", "kind", "interval_days")
-    list_filter = ("kind",)
+    list_display = ("name", "kind", "interval_days", "business_day_shift")
+    list_filter = ("kind", "business_day_shift")
     search_fields = ("name",)
+    actions = ["reschedule_events", "rebase_events"]
+
+    @admin.action(description="Пересчитать даты ТО по выбранным шаблонам")
+    def reschedule_events(self, request, queryset):
+        changed = reschedule(MaintenanceEvent.objects.filter(periodicity__in=queryset))
+        self.message_user(request, f"Обновлено записей ТО: {changed}")
+
+    @admin.action(description="Пересчитать даты ТО, включая ни разу не проводившиеся")
+    def rebase_events(self, request, queryset):
+        changed = reschedule(MaintenanceEvent.objects.filter(periodicity__in=queryset), rebase=True)
+        self.message_user(request, f"Обновлено записей ТО: {changed}")
+
+
+@admin.register(Holiday)
+class HolidayAdmin(admin.ModelAdmin):
+    list_display = ("date", "name", "is_workday")
+    list_filter = ("is_workday",)
+    date_hierarchy = "date"
 
 
 @admin.register(MaintenanceEvent)
@@ -16,4 +35,17 @@ class MaintenanceEventAdmin(admin.ModelAdmin):
     list_filter = ("is_overdue",)
     autocomplete_fields = ("object", "periodicity")
 
+
+@admin.register(OverdueSweep)
+class OverdueSweepAdmin(admin.ModelAdmin):
+    list_display = ("processed_date", "flagged", "cleared", "full", "created_at")
+    list_filter = ("full",)
+
+
+@admin.register(MaintenanceSummary)
+class MaintenanceSummaryAdmin(admin.ModelAdmin):
+    list_display = ("label", "scope", "active", "overdue", "due_week", "due_month", "as_of")
+    list_filter = ("scope",)
+    search_fields = ("label",)
+
 # Register your models here.
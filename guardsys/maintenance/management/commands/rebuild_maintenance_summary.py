@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from guardsys.maintenance import summary
+from guardsys.maintenance.models import MaintenanceSummary
+
+
+class Command(BaseCommand):
+    help = "Полностью пересчитывает сводку по ТО для дашборда"
+
+    def handle(self, *args, **options):
+        summary.refresh()
+        self.stdout.write(self.style.SUCCESS(f"Строк сводки: {MaintenanceSummary.objects.count()}"))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from guardsys.maintenance.overdue import recalc_overdue
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает признак просрочки ТО (только записи, где он расходится с датой)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Запустить, даже если сегодняшняя дата уже обработана")
+
+    def handle(self, *args, **options):
+        sweep = recalc_overdue(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Дата: {sweep.processed_date}; просрочено: {sweep.flagged}; снято: {sweep.cleared}"
+        ))
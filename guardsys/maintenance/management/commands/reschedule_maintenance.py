@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from guardsys.maintenance.models import MaintenanceEvent
+from guardsys.maintenance.scheduling import reschedule
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает даты следующего ТО по шаблонам периодичности и производственному календарю"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--periodicity', type=int, action='append', default=[],
+                            help="ID шаблона периодичности (можно несколько); по умолчанию все")
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Размер пачки для bulk_update")
+        parser.add_argument('--rebase', action='store_true',
+                            help="Пересчитать и ни разу не проводившиеся ТО от даты создания записи")
+
+    def handle(self, *args, **options):
+        events = None
+        if options['periodicity']:
+            events = MaintenanceEvent.objects.filter(periodicity__in=options['periodicity'])
+        changed = reschedule(events, chunk_size=options['chunk_size'], rebase=options['rebase'])
+        self.stdout.write(self.style.SUCCESS(f"Обновлено записей ТО: {changed}"))
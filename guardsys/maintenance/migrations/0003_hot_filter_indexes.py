@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_hot_filter_indexes'),
+        ('maintenance', '0002_overduesweep'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='maintenanceevent',
+            index=models.Index(fields=['next_due_at'], name='maintenance_next_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenanceevent',
+            index=models.Index(fields=['is_overdue', 'object'], name='maintenance_overdue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='overduesweep',
+            index=models.Index(fields=['processed_date', 'id'], name='overduesweep_date_idx'),
+        ),
+    ]
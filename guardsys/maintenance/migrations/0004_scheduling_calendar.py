@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maintenance', '0003_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Holiday',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('name', models.CharField(blank=True, max_length=128)),
+                ('is_workday', models.BooleanField(default=False, help_text='Рабочий выходной (перенос)')),
+            ],
+            options={
+                'ordering': ['date'],
+            },
+        ),
+        migrations.AddField(
+            model_name='periodicitytemplate',
+            name='business_day_shift',
+            field=models.CharField(choices=[('NONE', 'Без переноса'), ('FORWARD', 'На следующий рабочий день'), ('BACKWARD', 'На предыдущий рабочий день')], default='NONE', help_text='Перенос даты ТО, выпавшей на выходной или праздник', max_length=16),
+        ),
+    ]
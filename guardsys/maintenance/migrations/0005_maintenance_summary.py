@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maintenance', '0004_scheduling_calendar'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaintenanceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('RESPONSIBLE', 'Ответственный'), ('ORGANIZATION', 'Организация')], max_length=16)),
+                ('key_id', models.BigIntegerField()),
+                ('label', models.CharField(max_length=255)),
+                ('active', models.PositiveIntegerField(default=0)),
+                ('overdue', models.PositiveIntegerField(default=0)),
+                ('due_week', models.PositiveIntegerField(default=0)),
+                ('due_month', models.PositiveIntegerField(default=0)),
+                ('as_of', models.DateField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['scope', '-overdue', 'label'],
+                'constraints': [models.UniqueConstraint(fields=('scope', 'key_id'), name='maintenancesummary_scope_key_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_sync_indexes'),
+        ('maintenance', '0005_maintenance_summary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='maintenanceevent',
+            index=models.Index(fields=['updated_at', 'id'], name='maintenance_updated_idx'),
+        ),
+    ]
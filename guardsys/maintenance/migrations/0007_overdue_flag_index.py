@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_object_next_due'),
+        ('maintenance', '0006_sync_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='maintenanceevent',
+            index=models.Index(fields=['is_overdue', 'next_due_at'], name='maintenance_flag_due_idx'),
+        ),
+    ]
@@ -11,21 +11,42 @@ class PeriodicityTemplate(models.Model):
         QUARTERLY = "QUARTERLY", "Ежеквартально"
         CUSTOM = "CUSTOM", "Кастом"
 
+    class Shift(models.TextChoices):
+        NONE = "NONE", "Без переноса"
+        FORWARD = "FORWARD", "На следующий рабочий день"
+        BACKWARD = "BACKWARD", "На предыдущий рабочий день"
+
     name = models.CharField(max_length=128)
     kind = models.CharField(max_length=16, choices=Kind.choices, default=Kind.MONTHLY)
     interval_days = models.PositiveIntegerField(default=30)
+    business_day_shift = models.CharField(
+        max_length=16, choices=Shift.choices, default=Shift.NONE,
+        help_text="Перенос даты ТО, выпавшей на выходной или праздник",
+    )
+
+    def compute_next_date(self, from_date, calendar=None):
+        from .scheduling import next_date
 
-    def compute_next_date(self, from_date):
-        if self.kind == self.Kind.MONTHLY:
-            return from_date + timezone.timedelta(days=30)
-        if self.kind == self.Kind.QUARTERLY:
-            return from_date + timezone.timedelta(days=90)
-        return from_date + timezone.timedelta(days=self.interval_days)
+        return next_date(self, from_date, calendar)
 
     def __str__(self) -> str:
         return self.name
 
 
+class Holiday(models.Model):
+    """Production calendar: non-working days and working weekends."""
+
+    date = models.DateField(unique=True)
+    name = models.CharField(max_length=128, blank=True)
+    is_workday = models.BooleanField(default=False, help_text="Рабочий выходной (перенос)")
+
+    class Meta:
+        ordering = ["date"]
+
+    def __str__(self) -> str:
+        return f"{self.date} {self.name}".strip()
+
+
 class MaintenanceEvent(models.Model):
     object = models.ForeignKey(GuardedObject, on_delete=models.CASCADE, related_name="maintenances")
     periodicity = models.ForeignKey(PeriodicityTemplate, on_delete=models.PROTECT, related_name="events")
@@ -35,6 +56,14 @@ class MaintenanceEvent(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["next_due_at"], name="maintenance_next_due_idx"),
+            models.Index(fields=["is_overdue", "object"], name="maintenance_overdue_idx"),
+            models.Index(fields=["is_overdue", "next_due_at"], name="maintenance_flag_due_idx"),
+            models.Index(fields=["updated_at", "id"], name="maintenance_updated_idx"),
+        ]
+
     def recalc_overdue(self):
         today = timezone.localdate()
         self.is_overdue = self.next_due_at < today
@@ -50,4 +79,50 @@ class MaintenanceEvent(models.Model):
     def __str__(self) -> str:
         return f"ТО для {self.object.name}: след. {self.next_due_at}"
 
+
+class OverdueSweep(models.Model):
+    """One run of the bulk overdue recalculation (see ``overdue.py``)."""
+
+    processed_date = models.DateField()
+    flagged = models.PositiveIntegerField(default=0)
+    cleared = models.PositiveIntegerField(default=0)
+    full = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-processed_date", "-id"]
+        indexes = [
+            models.Index(fields=["processed_date", "id"], name="overduesweep_date_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.processed_date}: +{self.flagged} / -{self.cleared}"
+
+
+class MaintenanceSummary(models.Model):
+    """Dashboard counters per responsible / organization (see ``summary.py``)."""
+
+    class Scope(models.TextChoices):
+        RESPONSIBLE = "RESPONSIBLE", "Ответственный"
+        ORGANIZATION = "ORGANIZATION", "Организация"
+
+    scope = models.CharField(max_length=16, choices=Scope.choices)
+    key_id = models.BigIntegerField()
+    label = models.CharField(max_length=255)
+    active = models.PositiveIntegerField(default=0)
+    overdue = models.PositiveIntegerField(default=0)
+    due_week = models.PositiveIntegerField(default=0)
+    due_month = models.PositiveIntegerField(default=0)
+    as_of = models.DateField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["scope", "-overdue", "label"]
+        constraints = [
+            models.UniqueConstraint(fields=["scope", "key_id"], name="maintenancesummary_scope_key_uniq"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.get_scope_display()}: {self.label}"
+
 # Create your models here.
@@ -0,0 +1,41 @@
+"""Bulk recalculation of ``MaintenanceEvent.is_overdue``.
+
+``MaintenanceEvent.recalc_overdue()`` only runs for the row being saved, so
+events silently become overdue as days pass. ``recalc_overdue()`` flips the
+flag with two set-based UPDATEs that select only rows whose flag disagrees
+with ``next_due_at`` (an ``(is_overdue, next_due_at)`` index range each), so
+a daily run touches the events that fell due since yesterday plus any row
+changed behind the model's back (raw updates, imports, date edits), in both
+directions. Each run is recorded as an ``OverdueSweep``; a second run on the
+same day is skipped.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from guardsys.core import fragments
+from .models import MaintenanceEvent, OverdueSweep
+from . import summary
+
+
+def recalc_overdue(today=None, full=False):
+    """Bring ``is_overdue`` up to date for ``today``.
+
+    Returns the ``OverdueSweep`` describing the run. ``full=True`` runs even
+    if ``today`` was already processed.
+    """
+    today = today or timezone.localdate()
+    last = OverdueSweep.objects.first()
+    full = full or last is None
+    if not full and last.processed_date >= today:
+        return OverdueSweep(processed_date=last.processed_date)
+
+    now = timezone.now()
+    events = MaintenanceEvent.objects.all()
+    with transaction.atomic():
+        flagged = events.filter(is_overdue=False, next_due_at__lt=today).update(is_overdue=True, updated_at=now)
+        cleared = events.filter(is_overdue=True, next_due_at__gte=today).update(is_overdue=False, updated_at=now)
+        if flagged or cleared:
+            fragments.bump_all()
+        # the due this week/month windows move with the date
+        summary.refresh(today=today)
+        return OverdueSweep.objects.create(processed_date=today, flagged=flagged, cleared=cleared, full=full)
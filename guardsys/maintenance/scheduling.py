@@ -0,0 +1,145 @@
+"""Batch computation of ``MaintenanceEvent.next_due_at``.
+
+Monthly and quarterly rules are calendar based (31 Jan + 1 month = 28/29
+Feb), custom rules add ``interval_days``. Optionally the date is moved off
+weekends and ``Holiday`` days. ``reschedule()`` recomputes a whole queryset:
+templates and the holiday calendar are loaded once, each distinct
+(template, base date) pair is computed once, and rows are written back with
+``bulk_update`` in chunks.
+
+``GuardedObject.next_due_at`` is a copy of the earliest ``next_due_at`` of
+the object's events, kept for index-backed sorting of the object list;
+``update_object_due_dates()`` recomputes it after event writes.
+"""
+import calendar as _calendar
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Min, OuterRef, Subquery
+from django.utils import timezone
+
+from guardsys.core import fragments
+from guardsys.core.models import GuardedObject
+from .models import Holiday, MaintenanceEvent, PeriodicityTemplate
+from . import summary
+
+MONTHS = {
+    PeriodicityTemplate.Kind.MONTHLY: 1,
+    PeriodicityTemplate.Kind.QUARTERLY: 3,
+}
+MAX_SHIFT = 31
+
+
+def add_months(day, months):
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    return day.replace(year=year, month=month, day=min(day.day, _calendar.monthrange(year, month)[1]))
+
+
+class BusinessCalendar:
+    """Weekends plus ``Holiday`` rows; working weekends override the weekend."""
+
+    def __init__(self, holidays=(), workdays=()):
+        self.holidays = set(holidays)
+        self.workdays = set(workdays)
+
+    @classmethod
+    def load(cls):
+        rows = Holiday.objects.values_list('date', 'is_workday')
+        return cls(
+            holidays=[day for day, is_workday in rows if not is_workday],
+            workdays=[day for day, is_workday in rows if is_workday],
+        )
+
+    def is_business_day(self, day):
+        if day in self.workdays:
+            return True
+        return day.weekday() < 5 and day not in self.holidays
+
+    def shift(self, day, step):
+        for _ in range(MAX_SHIFT):
+            if self.is_business_day(day):
+                return day
+            day += timedelta(days=step)
+        return day
+
+
+def raw_next_date(template, from_date):
+    months = MONTHS.get(template.kind)
+    if months:
+        return add_months(from_date, months)
+    return from_date + timedelta(days=template.interval_days)
+
+
+def next_date(template, from_date, calendar=None):
+    due = raw_next_date(template, from_date)
+    if template.business_day_shift == PeriodicityTemplate.Shift.NONE:
+        return due
+    calendar = calendar or BusinessCalendar.load()
+    step = 1 if template.business_day_shift == PeriodicityTemplate.Shift.FORWARD else -1
+    return calendar.shift(due, step)
+
+
+def update_object_due_dates(object_ids=None):
+    """Copy the earliest event due date onto the objects (all of them if ``None``)."""
+    earliest = (
+        MaintenanceEvent.objects.filter(object=OuterRef('pk')).order_by()
+        .values('object').annotate(earliest=Min('next_due_at')).values('earliest')
+    )
+    objects = GuardedObject.objects.all()
+    if object_ids is not None:
+        object_ids = {pk for pk in object_ids if pk}
+        if not object_ids:
+            return 0
+        objects = objects.filter(pk__in=object_ids)
+    # a plain UPDATE: no signals, no audit entry and updated_at stays as is
+    return objects.update(next_due_at=Subquery(earliest))
+
+
+def reschedule(events=None, chunk_size=1000, today=None, rebase=False):
+    """Recompute ``next_due_at`` (and ``is_overdue``) for ``events``.
+
+    The base date is ``last_done_at``. Events never done keep their
+    ``next_due_at`` (it was set by hand or by the import) unless ``rebase``
+    is given; then it is computed from the day the event was created.
+    Returns the number of rows changed.
+    """
+    full = events is None
+    events = MaintenanceEvent.objects.all() if full else events
+    if not rebase:
+        events = events.filter(last_done_at__isnull=False)
+    today = today or timezone.localdate()
+    templates = PeriodicityTemplate.objects.in_bulk()
+    calendar = BusinessCalendar.load()
+    computed = {}
+    changed = 0
+    touched = set()
+    now = timezone.now()
+
+    rows = events.only('pk', 'object_id', 'periodicity_id', 'last_done_at', 'created_at', 'next_due_at', 'is_overdue').order_by('pk')
+    batch = []
+    with transaction.atomic():
+        for event in rows.iterator(chunk_size=chunk_size):
+            base = event.last_done_at or timezone.localdate(event.created_at)
+            key = (event.periodicity_id, base)
+            if key not in computed:
+                computed[key] = next_date(templates[event.periodicity_id], base, calendar)
+            due = computed[key]
+            if due == event.next_due_at and event.is_overdue == (due < today):
+                continue
+            event.next_due_at, event.is_overdue, event.updated_at = due, due < today, now
+            batch.append(event)
+            touched.add(event.object_id)
+            if len(batch) >= chunk_size:
+                MaintenanceEvent.objects.bulk_update(batch, ['next_due_at', 'is_overdue', 'updated_at'])
+                changed += len(batch)
+                batch = []
+        if batch:
+            MaintenanceEvent.objects.bulk_update(batch, ['next_due_at', 'is_overdue', 'updated_at'])
+            changed += len(batch)
+        if changed:
+            update_object_due_dates(None if full else touched)
+    if changed:
+        fragments.bump_all()
+        summary.refresh(today=today)
+    return changed
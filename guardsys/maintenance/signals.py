@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from guardsys.core.models import GuardedObject, Organization
+from .models import MaintenanceEvent
+from . import summary
+from .scheduling import update_object_due_dates
+
+SUMMARY_FIELDS = {'is_deleted', 'main_responsible', 'main_responsible_id', 'organization', 'organization_id'}
+
+
+@receiver(post_save, sender=GuardedObject)
+def guardobj_summary(sender, instance: GuardedObject, update_fields=None, **kwargs):
+    if update_fields and not set(update_fields) & SUMMARY_FIELDS:
+        return
+    summary.refresh_for_objects([instance])
+
+
+@receiver(post_delete, sender=GuardedObject)
+def guardobj_summary_delete(sender, instance: GuardedObject, **kwargs):
+    summary.refresh_for_objects([instance])
+
+
+@receiver(post_save, sender=MaintenanceEvent)
+@receiver(post_delete, sender=MaintenanceEvent)
+def maintenance_summary(sender, instance: MaintenanceEvent, **kwargs):
+    update_object_due_dates([instance.object_id])
+    summary.refresh_for_objects(GuardedObject.objects.filter(pk=instance.object_id).only(
+        'pk', 'main_responsible', 'organization'))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_summary_label(sender, instance, created: bool, update_fields=None, **kwargs):
+    if created or (update_fields and set(update_fields) <= {'last_login', 'password'}):
+        return
+    label = f'{instance.last_name} {instance.first_name}'.strip() or instance.username
+    summary.relabel(summary.Scope.RESPONSIBLE, instance.pk, label)
+
+
+@receiver(post_save, sender=Organization)
+def organization_summary_label(sender, instance: Organization, created: bool, **kwargs):
+    if not created:
+        summary.relabel(summary.Scope.ORGANIZATION, instance.pk, instance.name)
@@ -0,0 +1,127 @@
+"""Materialized dashboard counters.
+
+``MaintenanceSummary`` holds, per main responsible and per organization, the
+number of active objects and of those overdue, due this week and due this
+month. Changes to one object only recount the keys it belongs to
+(``refresh_for_objects``), with an aggregate over that key's objects; the
+keys touched in a transaction are collected and recounted once, when it
+commits. The date windows move every day, so the overdue sweep rebuilds
+everything (``refresh()``). Renaming a user or an organization only updates
+the label (``relabel``). The dashboard reads this table only.
+"""
+import calendar
+import threading
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from guardsys.core.models import GuardedObject
+from .models import MaintenanceSummary
+
+Scope = MaintenanceSummary.Scope
+COUNTERS = ('active', 'overdue', 'due_week', 'due_month')
+SCOPES = {
+    Scope.RESPONSIBLE: ('main_responsible', ('main_responsible__last_name', 'main_responsible__first_name',
+                                             'main_responsible__username')),
+    Scope.ORGANIZATION: ('organization', ('organization__name',)),
+}
+
+
+def _label(row, label_fields):
+    if len(label_fields) == 1:
+        return row[label_fields[0]] or ''
+    last, first, username = (row[f] for f in label_fields)
+    return f'{last} {first}'.strip() or username
+
+
+def _windows(today):
+    week_end = today + timedelta(days=6 - today.weekday())
+    month_end = today.replace(day=calendar.monthrange(today.year, today.month)[1])
+    return week_end, month_end
+
+
+def _refresh_scope(scope, ids, today):
+    field, label_fields = SCOPES[scope]
+    week_end, month_end = _windows(today)
+    due = Q(maintenances__is_overdue=False, maintenances__next_due_at__gte=today)
+    objects = GuardedObject.objects.filter(is_deleted=False, **{f'{field}__isnull': False})
+    if ids is not None:
+        objects = objects.filter(**{f'{field}__in': ids})
+    rows = objects.values(field, *label_fields).annotate(
+        active=Count('pk', distinct=True),
+        overdue=Count('pk', filter=Q(maintenances__is_overdue=True), distinct=True),
+        due_week=Count('pk', filter=due & Q(maintenances__next_due_at__lte=week_end), distinct=True),
+        due_month=Count('pk', filter=due & Q(maintenances__next_due_at__lte=month_end), distinct=True),
+    ).order_by()
+
+    summaries = [
+        MaintenanceSummary(scope=scope, key_id=row[field], label=_label(row, label_fields), as_of=today,
+                           **{name: row[name] for name in COUNTERS})
+        for row in rows
+    ]
+    stale = MaintenanceSummary.objects.filter(scope=scope).exclude(key_id__in=[s.key_id for s in summaries])
+    if ids is not None:
+        stale = stale.filter(key_id__in=ids)
+    stale.delete()
+    MaintenanceSummary.objects.bulk_create(
+        summaries, update_conflicts=True, unique_fields=['scope', 'key_id'],
+        update_fields=['label', *COUNTERS, 'as_of', 'updated_at'],
+    )
+
+
+def refresh(responsible_ids=None, organization_ids=None, today=None):
+    """Recount the given keys; ``None`` for both rebuilds the whole table."""
+    today = today or timezone.localdate()
+    full = responsible_ids is None and organization_ids is None
+    if full or responsible_ids:
+        _refresh_scope(Scope.RESPONSIBLE, None if full else set(responsible_ids), today)
+    if full or organization_ids:
+        _refresh_scope(Scope.ORGANIZATION, None if full else set(organization_ids), today)
+
+
+class _Pending:
+    """Keys to recount when the current transaction commits."""
+
+    def __init__(self):
+        self.responsible_ids, self.organization_ids = set(), set()
+
+    def __call__(self):
+        refresh(self.responsible_ids, self.organization_ids)
+
+
+_local = threading.local()
+
+
+def refresh_on_commit(responsible_ids=(), organization_ids=()):
+    """``refresh()`` the given keys once the transaction commits (now outside one)."""
+    responsible_ids, organization_ids = set(responsible_ids) - {None}, set(organization_ids) - {None}
+    if not (responsible_ids or organization_ids):
+        return
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        refresh(responsible_ids, organization_ids)
+        return
+    pending = getattr(_local, 'pending', None)
+    # a rolled back savepoint drops the hook; recounting its keys anyway is harmless
+    if pending is None or not any(func is pending for _, func, _ in connection.run_on_commit):
+        pending = _local.pending = _Pending()
+        transaction.on_commit(pending)
+    pending.responsible_ids |= responsible_ids
+    pending.organization_ids |= organization_ids
+
+
+def refresh_for_objects(objects):
+    """Recount the keys ``objects`` (GuardedObject instances) belong to, on commit."""
+    responsible_ids, organization_ids = set(), set()
+    for obj in objects:
+        loaded = getattr(obj, '_loaded_values', None) or {}
+        responsible_ids |= {obj.main_responsible_id, loaded.get('main_responsible_id')}
+        organization_ids |= {obj.organization_id, loaded.get('organization_id')}
+    refresh_on_commit(responsible_ids, organization_ids)
+
+
+def relabel(scope, key_id, label):
+    """Rename one key without recounting it."""
+    MaintenanceSummary.objects.filter(scope=scope, key_id=key_id).exclude(label=label).update(label=label)
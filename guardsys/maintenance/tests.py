@@ -1,3 +1,115 @@
+from datetime import date, timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import transaction
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from guardsys.core.tests import FixturesMixin
+from .models import MaintenanceEvent, MaintenanceSummary, OverdueSweep
+from . import summary
+from .overdue import recalc_overdue
+from .scheduling import add_months, reschedule
+
+Scope = MaintenanceSummary.Scope
+
+
+class RescheduleTests(FixturesMixin, TestCase):
+    def test_never_done_events_keep_their_dates(self):
+        before = dict(MaintenanceEvent.objects.values_list('pk', 'next_due_at'))
+        self.assertEqual(reschedule(), 0)
+        self.assertEqual(dict(MaintenanceEvent.objects.values_list('pk', 'next_due_at')), before)
+
+    def test_done_events_are_computed_from_last_done(self):
+        event = MaintenanceEvent.objects.get(object=self.objects[0])
+        MaintenanceEvent.objects.filter(pk=event.pk).update(last_done_at=date(2024, 1, 31))
+        self.assertEqual(reschedule(), 1)
+        event.refresh_from_db()
+        self.assertEqual(event.next_due_at, date(2024, 2, 29))
+        self.assertTrue(event.is_overdue)
+        self.objects[0].refresh_from_db()
+        self.assertEqual(self.objects[0].next_due_at, date(2024, 2, 29))
+
+    def test_rebase_uses_creation_date(self):
+        call_command('reschedule_maintenance', '--rebase', stdout=StringIO())
+        for event in MaintenanceEvent.objects.all():
+            self.assertEqual(event.next_due_at, add_months(timezone.localdate(event.created_at), 1))
+            self.assertFalse(event.is_overdue)
+
+
+class OverdueSweepTests(FixturesMixin, TestCase):
+    def setUp(self):
+        self.today = timezone.localdate()
+        recalc_overdue(self.today - timedelta(days=1), full=True)
+
+    def overdue(self):
+        return set(MaintenanceEvent.objects.filter(is_overdue=True).values_list('object_id', flat=True))
+
+    def test_incremental_run_flags_and_clears(self):
+        # next_due_at is today - 25, -15, -5, +5... days for objects 0..5
+        events = MaintenanceEvent.objects.filter
+        events(object=self.objects[0]).update(next_due_at=self.today + timedelta(days=30))
+        events(object=self.objects[4]).update(next_due_at=self.today - timedelta(days=100), is_overdue=False)
+        events(object=self.objects[5]).update(next_due_at=self.today)
+        sweep = recalc_overdue(self.today)
+        self.assertFalse(sweep.full)
+        self.assertEqual((sweep.flagged, sweep.cleared), (1, 1))
+        self.assertEqual(self.overdue(), {self.objects[1].pk, self.objects[2].pk, self.objects[4].pk})
+
+    def test_same_day_is_skipped_unless_full(self):
+        recalc_overdue(self.today)
+        MaintenanceEvent.objects.update(is_overdue=False)
+        self.assertIsNone(recalc_overdue(self.today).pk)
+        self.assertEqual(self.overdue(), set())
+        recalc_overdue(self.today, full=True)
+        self.assertEqual(self.overdue(), {obj.pk for obj in self.objects[:3]})
+        self.assertEqual(OverdueSweep.objects.count(), 3)
+
+
+class SummaryTests(FixturesMixin, TestCase):
+    def setUp(self):
+        # the fixture's refresh stays scheduled in the class transaction, which never commits
+        summary._local.pending = None
+
+    def row(self, scope, key_id):
+        return MaintenanceSummary.objects.get(scope=scope, key_id=key_id)
+
+    def test_refreshed_once_per_transaction(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks, transaction.atomic():
+            for obj in self.objects[:3]:
+                obj.main_responsible = self.deputy
+                obj.save()
+            MaintenanceEvent.objects.filter(object=self.objects[0]).delete()
+            self.assertEqual(self.row(Scope.RESPONSIBLE, self.responsible.pk).active, 6)
+        self.assertEqual(sum(isinstance(callback, summary._Pending) for callback in callbacks), 1)
+        self.assertEqual(self.row(Scope.RESPONSIBLE, self.responsible.pk).active, 3)
+        deputy = self.row(Scope.RESPONSIBLE, self.deputy.pk)
+        self.assertEqual((deputy.active, deputy.overdue), (3, 2))
+
+    def test_rename_updates_labels(self):
+        self.responsible.first_name, self.responsible.last_name = 'Иван', 'Петров'
+        self.responsible.save()
+        organization = self.objects[0].organization
+        organization.name = 'ООО Охрана-2'
+        organization.save()
+        self.assertEqual(self.row(Scope.RESPONSIBLE, self.responsible.pk).label, 'Петров Иван')
+        self.assertEqual(self.row(Scope.ORGANIZATION, organization.pk).label, 'ООО Охрана-2')
+
+
+class ExportTests(FixturesMixin, TestCase):
+    def export(self, **params):
+        self.client.force_login(self.responsible)
+        return self.client.get(reverse('maintenance_export'), params)
+
+    def test_month_rows(self):
+        today = timezone.localdate()
+        response = self.export(year=today.year, month=today.month)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        due = MaintenanceEvent.objects.filter(next_due_at__year=today.year, next_due_at__month=today.month)
+        self.assertEqual(len(lines), 1 + due.count())
 
-# Create your tests here.
+    def test_invalid_period(self):
+        for params in ({'month': 13}, {'month': 'май'}, {'year': 0}, {'year': 9999, 'month': 12}):
+            self.assertEqual(self.export(**params).status_code, 400, params)
@@ -1,3 +1,38 @@
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import render
+from django.utils import timezone
 
-# Create your views here.
+from .exports import csv_lines, month_bounds, monthly_rows
+from .models import MaintenanceSummary
+
+
+@login_required
+def export_monthly_csv(request):
+    today = timezone.localdate()
+    try:
+        year = int(request.GET.get('year', today.year))
+        month = int(request.GET.get('month', today.month))
+        # fail here, not inside the stream after the 200 has been sent
+        month_bounds(year, month)
+    except (ValueError, OverflowError):
+        return HttpResponseBadRequest("Некорректный год или месяц")
+
+    response = StreamingHttpResponse(csv_lines(monthly_rows(year, month)), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="maintenance-{year}-{month:02d}.csv"'
+    return response
+
+
+@login_required
+def dashboard(request):
+    # Reads the materialized counters only: one query, O(responsibles + organizations)
+    rows = list(MaintenanceSummary.objects.all())
+    sections = [
+        (label, [row for row in rows if row.scope == scope])
+        for scope, label in (
+            (MaintenanceSummary.Scope.RESPONSIBLE, "По ответственным"),
+            (MaintenanceSummary.Scope.ORGANIZATION, "По организациям"),
+        )
+    ]
+    as_of = min((row.as_of for row in rows), default=None)
+    return render(request, 'maintenance/dashboard.html', {'sections': sections, 'as_of': as_of})
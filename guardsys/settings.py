@@ -46,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'guardsys.core.middleware.QueryStatsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -138,3 +139,72 @@ AUTH_USER_MODEL = 'accounts.User'
 # Email (dev defaults)
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 ADMINS = [('Admin', 'admin@example.com')]
+
+# Cross-request cache of per-user permission scopes, seconds (0 disables;
+# ignored with a per-process default cache, see guardsys.core.permissions)
+PERMISSION_CACHE_TIMEOUT = 300
+
+# Per-view SQL query budgets (URL name -> max queries), checked by
+# QueryStatsMiddleware and enforced in tests
+QUERY_BUDGETS = {
+    'object_list': 8,
+    'object_detail': 8,
+    'object_edit': 8,
+    'object_archive': 16,
+    'object_restore': 18,
+    'upload_document': 12,
+    'maintenance_dashboard': 3,
+    'api_objects': 5,
+    'api_maintenance': 5,
+    'api_documents': 5,
+}
+# A query signature repeated more often than this within a request is an N+1
+QUERY_DUPLICATE_LIMIT = 3
+
+# Document downloads: None streams from Django, 'x-sendfile' (Apache/lighttpd)
+# or 'x-accel-redirect' (nginx, internal location at the prefix below)
+DOCUMENT_SENDFILE = None
+DOCUMENT_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+
+# Object detail page fragments (see guardsys.core.fragments); any cache alias
+# from CACHES works. It must be shared by all workers and management commands,
+# since invalidation is a cache write (locmem is per process: check
+# guardsys.W001 warns about it).
+#
+# The cache holds about two entries per object (fragment version token and
+# rendered fragment) plus one permission scope per user, and an evicted
+# version token silently invalidates its data, so MAX_ENTRIES must cover the
+# whole table (Django's default of 300 does not: guardsys.W002). The file
+# backend lists its directory on every set(); it suits a single host with up
+# to some ten thousand objects. Beyond that, or with several hosts, use Redis
+# (requires the redis package):
+#
+#     CACHES = {'default': {
+#         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+#         'LOCATION': 'redis://127.0.0.1:6379/1',
+#     }}
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
+}
+FRAGMENT_CACHE_ALIAS = 'default'
+FRAGMENT_CACHE_TIMEOUT = 3600
+# Reference data (periodicity templates, organizations, users), see
+# guardsys.core.refdata
+REFDATA_CACHE_ALIAS = 'default'
+REFDATA_VERSION_TIMEOUT = 300
+
+# AuditLog retention: entries older than this many days are moved by
+# `archive_audit_log` into monthly gzip JSONL files under AUDIT_ARCHIVE_ROOT
+AUDIT_RETENTION_DAYS = 365
+AUDIT_ARCHIVE_ROOT = BASE_DIR / 'audit_archive'
+
+# Offline sync feed (/api/sync/): rows updated within the last seconds are
+# held back until concurrent transactions have committed
+SYNC_SETTLE_SECONDS = 2
+
+# Worker processes used by `process_document_jobs` (thumbnails, text extraction)
+DOCUMENT_WORKER_CONCURRENCY = 2